@@ -0,0 +1,119 @@
+"""Compare the median-split, binned-SAH and linear (Morton) BVH builders.
+
+For each reference scene and builder this reports build time, node count
+(internal nodes + leaves), tree depth and the average number of BVH nodes
+visited and primitives tested per ray, using the same traversal order as
+BVHNode.intersect_full.
+
+Usage:  python benchmarks/bvh_builders.py [--rays N] [--spheres N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from core.bvh import BVHNode, BVHLeaf, _intersect_aabb
+from core.objects.sphere import Sphere
+from core.ray import Ray
+from utils.obj_loader import OBJLoader
+from utils.vector import Vector3D
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.8, 0.8, 0.8),
+       "specular": (1.0, 1.0, 1.0), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+
+
+def tree_shape(node, depth=0):
+    """Return (node_count, max_depth) of a BVH; bare primitives count as leaves."""
+    if isinstance(node, BVHNode):
+        nl, dl = tree_shape(node._left, depth + 1)
+        nr, dr = tree_shape(node._right, depth + 1)
+        return 1 + nl + nr, max(dl, dr)
+    return 1, depth
+
+
+def count_visits(node, ray, counts):
+    """Replay BVHNode.intersect_full, counting visited nodes and primitive tests."""
+    if isinstance(node, BVHNode):
+        counts[0] += 1
+        if not _intersect_aabb(node.aabb_min, node.aabb_max, ray):
+            return
+        count_visits(node._left, ray, counts)
+        count_visits(node._right, ray, counts)
+    elif isinstance(node, BVHLeaf):
+        counts[0] += 1
+        if _intersect_aabb(node.aabb_min, node.aabb_max, ray):
+            counts[1] += len(node.objects)
+    else:
+        counts[1] += 1
+
+
+def random_rays(objects, n, seed=0):
+    """Rays from a sphere around the scene bounds aimed at points inside them."""
+    root = BVHNode.build(objects, method="median")
+    lo = np.array([root.aabb_min.x, root.aabb_min.y, root.aabb_min.z])
+    hi = np.array([root.aabb_max.x, root.aabb_max.y, root.aabb_max.z])
+    center, radius = (lo + hi) / 2, np.linalg.norm(hi - lo)
+    rng = np.random.default_rng(seed)
+    rays = []
+    for _ in range(n):
+        d = rng.normal(size=3)
+        origin = center + radius * d / np.linalg.norm(d)
+        target = rng.uniform(lo, hi)
+        rays.append(Ray(Vector3D(*origin.tolist(), 1), Vector3D(*(target - origin).tolist(), 0)))
+    return rays
+
+
+def many_spheres(n, seed=0):
+    """Unevenly clustered spheres: a dense core plus a sparse halo."""
+    rng = np.random.default_rng(seed)
+    dense = rng.normal(0.0, 1.0, size=(n * 3 // 4, 3))
+    sparse = rng.uniform(-20.0, 20.0, size=(n - len(dense), 3))
+    radii = rng.uniform(0.02, 0.3, size=n)
+    return [Sphere(Vector3D(*p.tolist(), 1), float(r), MAT)
+            for p, r in zip(np.vstack([dense, sparse]), radii)]
+
+
+def compare(name, objects, rays, builders):
+    print(f"\n{name}: {len(objects)} primitives, {len(rays)} rays")
+    print(f"{'builder':<22}{'build s':>9}{'nodes':>8}{'depth':>7}{'visits/ray':>12}{'prims/ray':>11}")
+    for label, kwargs in builders:
+        start = time.perf_counter()
+        root = BVHNode.build(objects, **kwargs)
+        build_time = time.perf_counter() - start
+        nodes, depth = tree_shape(root)
+        counts = [0, 0]
+        for ray in rays:
+            count_visits(root, ray, counts)
+        print(f"{label:<22}{build_time:>9.3f}{nodes:>8}{depth:>7}"
+              f"{counts[0] / len(rays):>12.1f}{counts[1] / len(rays):>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rays", type=int, default=2000)
+    parser.add_argument("--spheres", type=int, default=2000)
+    parser.add_argument("--bins", type=int, default=16)
+    args = parser.parse_args()
+
+    builders = [
+        ("median", {"method": "median", "leaf_size": 1}),
+        ("sah", {"method": "sah", "bins": args.bins, "leaf_size": 1}),
+        ("sah leaf<=4", {"method": "sah", "bins": args.bins, "leaf_size": 4}),
+        ("lbvh", {"method": "lbvh", "leaf_size": 1}),
+    ]
+
+    bunny = OBJLoader.load(BUNNY, MAT, 30.0)
+    compare("bunny.obj", bunny.triangles, random_rays(bunny.triangles, args.rays), builders)
+
+    spheres = many_spheres(args.spheres)
+    compare("many spheres", spheres, random_rays(spheres, args.rays), builders)
+
+
+if __name__ == "__main__":
+    main()
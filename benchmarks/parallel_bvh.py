@@ -0,0 +1,80 @@
+"""Parallel BVH build speedup per worker count.
+
+Builds the BVH of one large mesh with Mesh.build_bvh for 1, 2, 4, ...
+worker processes (up to the CPU count unless --workers is given) and
+reports the build time, the speedup over the serial build and whether the
+tree is identical to it. The mesh is an OBJ file, or a synthetic triangle
+soup of --triangles random triangles.
+
+Usage:  python benchmarks/parallel_bvh.py [--obj FILE | --triangles N]
+                                           [--method median|sah] [--workers 1 2 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from core.objects.mesh import BVH_ARRAYS, Mesh
+from utils.obj_parser import load_obj
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.8, 0.8, 0.8),
+       "specular": (1.0, 1.0, 1.0), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def triangle_soup(n, seed=0):
+    """n small random triangles in a unit cube, clustered unevenly."""
+    rng = np.random.default_rng(seed)
+    centers = np.vstack([rng.normal(0.5, 0.1, (n // 2, 3)), rng.uniform(0, 1, (n - n // 2, 3))])
+    vertices = (centers[:, None, :] + rng.normal(0, 0.002, (n, 3, 3))).reshape(-1, 3)
+    mesh = Mesh(MAT, "soup")
+    mesh.add_arrays(vertices, np.arange(3 * n, dtype=np.int32).reshape(-1, 3))
+    return mesh
+
+
+def worker_counts():
+    counts, w = [], 1
+    while w < multiprocessing.cpu_count():
+        counts.append(w)
+        w *= 2
+    return counts + [multiprocessing.cpu_count()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--obj", help="OBJ file to build (default: triangle soup)")
+    parser.add_argument("--triangles", type=int, default=1_000_000)
+    parser.add_argument("--method", choices=("median", "sah"), default="median")
+    parser.add_argument("--leaf-size", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", help="worker counts to time")
+    args = parser.parse_args()
+
+    if args.obj:
+        vertices, _, tris, _, _ = load_obj(args.obj)
+        mesh = Mesh(MAT, os.path.basename(args.obj))
+        mesh.add_arrays(vertices, tris)
+    else:
+        mesh = triangle_soup(args.triangles)
+    print(f"{mesh.name}: {mesh.get_triangle_count()} triangles, {args.method}, "
+          f"leaf size {args.leaf_size}, {multiprocessing.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'build s':>10}{'speedup':>9}{'identical':>11}")
+
+    serial = None
+    for workers in args.workers or worker_counts():
+        start = time.perf_counter()
+        mesh.build_bvh(args.method, leaf_size=args.leaf_size, workers=workers)
+        elapsed = time.perf_counter() - start
+        arrays = [getattr(mesh._bvh, name) for name in BVH_ARRAYS]
+        if serial is None:
+            serial = (elapsed, arrays)
+        same = all(np.array_equal(a, b) for a, b in zip(arrays, serial[1]))
+        print(f"{workers:>8}{elapsed:>10.2f}{serial[0] / elapsed:>9.2f}{str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Standard benchmark suite with regression tracking.
+
+Times a fixed set of reference scenes:
+
+- bunny: the Stanford bunny OBJ over a plane
+- spheres: a 10 x 10 x 10 grid of 1000 spheres
+- glass: reflective and refractive spheres over a reflective plane
+- lights8: a few objects lit by 8 lights
+
+and for each reports BVH build time, rays per second per ray type
+(primary, shadow, reflection, refraction) for every engine, and full-frame
+render time per engine, plus the OBJ load time of the bunny (parsed and
+from a warm mesh cache). Results are written as JSON with flat metric
+names ("<scene>.<engine>.<metric>"); metrics ending in "_s" are times
+(lower is better), "_per_s" rates (higher is better).
+
+Ray-type throughput traces fixed ray sets through the engine's closest-hit
+(or, for shadow rays, any-hit) query: camera rays through pixel centers,
+shadow rays from their hits to every light, and mirror and refracted
+(index 1.5) rays from the same hits.
+
+Usage:
+    python benchmarks/suite.py -o results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.15
+
+With --baseline the run exits with status 1 when any metric is worse than
+the baseline by more than the threshold (a fraction, default 0.10).
+Baselines only make sense on the machine that recorded them, and the
+threshold has to sit above that machine's run-to-run noise (shared or
+single-core VMs easily vary by 20%).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+import config
+from core.bvh import FlatBVH
+from core.objects.mesh import Mesh
+from core.objects.plane import Plane
+from core.ray import Ray
+from renderer import packet
+from renderer.headless import ENGINES, render_image
+from renderer.raytracer import closest_hit
+from renderer.ui.scene_builder import build_object, build_scene, make_material
+from utils.obj_loader import OBJLoader
+from utils.vector import Vector3D
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+RAY_TYPES = ("primary", "shadow", "reflection", "refraction")
+WHITE = {"color": (1, 1, 1), "intensity": 1.0}
+
+
+def reference_scenes():
+    """name -> (object specs, light specs, camera position, look-at point)."""
+    glass = dict(make_material((0.9, 0.9, 0.9), 0.1), transparency=0.8, refractive_index=1.5)
+    floor = {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+             "material": make_material((0.6, 0.6, 0.6), 0.2)}
+    grid = [{"type": "sphere", "position": (x * 0.5 - 2.25, y * 0.5 - 1.0, z * 0.5 - 2.25),
+             "radius": 0.2, "material": make_material((0.2 + x * 0.07, 0.5, 0.9 - z * 0.07), 0.0)}
+            for x in range(10) for y in range(10) for z in range(10)]
+    lights8 = [dict(WHITE, position=(4 * np.cos(a), 3 + (i % 2), 4 * np.sin(a)), intensity=0.2)
+               for i, a in enumerate(np.linspace(0, 2 * np.pi, 8, endpoint=False).tolist())]
+    return {
+        "bunny": ([{"type": "obj", "path": BUNNY, "scale": 30.0, "position": (0, -1, 0),
+                    "material": make_material((0.8, 0.7, 0.6), 0.1)}, floor],
+                  [dict(WHITE, position=(3, 5, 2))], (0, 3, 8), (0, 1, 0)),
+        "spheres": (grid, [dict(WHITE, position=(6, 8, 6))], (7, 5, 9), (0, 1, 0)),
+        "glass": ([{"type": "sphere", "position": (-1.2, 0, 0), "radius": 1.0,
+                    "material": make_material((0.9, 0.9, 0.9), 0.8)},
+                   {"type": "sphere", "position": (1.2, 0, 0.5), "radius": 1.0, "material": glass},
+                   {"type": "sphere", "position": (0, -0.5, 2), "radius": 0.5, "material": glass},
+                   {"type": "cube", "center": (0, 0, -2), "size": 1.5,
+                    "material": make_material((0.8, 0.2, 0.2), 0.3)},
+                   dict(floor, material=make_material((0.6, 0.6, 0.6), 0.5))],
+                  [dict(WHITE, position=(3, 5, 4))], (0, 2, 7), (0, 0, 0)),
+        "lights8": ([{"type": "sphere", "position": (0, 0, 0), "radius": 1.0,
+                      "material": make_material((0.8, 0.8, 0.8), 0.2)},
+                     {"type": "cube", "center": (2, -0.5, 0), "size": 1.0,
+                      "material": make_material((0.2, 0.8, 0.2), 0.0)},
+                     {"type": "tetra", "center": (-2, -0.5, 0), "size": 1.0,
+                      "material": make_material((0.8, 0.2, 0.2), 0.0)}, floor],
+                    lights8, (0, 3, 8), (0, 0, 0)),
+    }
+
+
+def best_of(fn, repeat, min_time=0.1):
+    """Smallest per-call wall time of fn over repeat measurements.
+
+    Like timeit's autorange, each measurement loops fn until it lasts at
+    least min_time, so short timings are not dominated by noise.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def _quiet(fn, *args, **kwargs):
+    # OBJLoader prints progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def ray_sets(camera, objects, lights, width, height):
+    """Ray sets per type as (origins, directions, max distances or None)."""
+    scene = packet.PacketScene(objects, lights)
+    ys, xs = np.mgrid[0:height, 0:width]
+    u = ((xs.ravel() + 0.5) / width) * 2 - 1
+    v = 1 - ((ys.ravel() + 0.5) / height) * 2
+    origins, directions = camera.get_rays(u, v)
+    sets = {"primary": (origins, directions, None)}
+
+    hits = scene.intersect(origins, directions)
+    idx = np.nonzero(hits.kind != packet.MISS)[0]
+    d = directions[idx]
+    points = origins[idx] + d * hits.t[idx][:, None]
+    normal = scene.normals(hits, idx, points)
+    # Shading normals face the camera side for the secondary rays
+    normal = np.where((packet._dot(d, normal) > 0)[:, None], -normal, normal)
+
+    shadow = [(points + normal * 0.001, light_pos - points) for light_pos in scene.light_position]
+    so = np.concatenate([o for o, _ in shadow]).reshape(-1, 3)
+    sd = np.concatenate([to for _, to in shadow]).reshape(-1, 3)
+    distance = np.sqrt(packet._dot(sd, sd))
+    sets["shadow"] = (so, packet._normalize(sd), distance)
+
+    reflected = packet._normalize(d - normal * 2 * packet._dot(d, normal)[:, None])
+    sets["reflection"] = (points + normal * 0.001, reflected, None)
+
+    eta, cos_i = 1.0 / 1.5, -packet._dot(normal, d)
+    sin2_t = eta * eta * (1.0 - cos_i * cos_i)
+    cos_t = np.sqrt(np.maximum(1.0 - sin2_t, 0.0))
+    refracted = packet._normalize(d * eta + normal * (eta * cos_i - cos_t)[:, None])
+    sets["refraction"] = (points - normal * 0.001, refracted, None)
+    return scene, sets
+
+
+def ray_throughput(engine, scene, objects, sets, max_rays, repeat):
+    """Rays per second of each ray set through the engine's intersection queries."""
+    rates = {}
+    for kind in RAY_TYPES:
+        origins, directions, distances = sets[kind]
+        if engine == "packet":
+            if distances is None:
+                def run():
+                    scene.intersect(origins, directions)
+            else:
+                def run():
+                    scene.occluded(origins, directions, distances)
+            count = len(origins)
+        else:
+            # The scalar engine is slow: trace an evenly spread subset
+            step = max(1, len(origins) // max_rays)
+            rays = [Ray(Vector3D(*o, 1), Vector3D(*dd, 0))
+                    for o, dd in zip(origins[::step].tolist(), directions[::step].tolist())]
+            count = len(rays)
+            if distances is None:
+                def run():
+                    for ray in rays:
+                        closest_hit(ray, objects)
+            else:
+                limits = distances[::step].tolist()
+
+                def run():
+                    for ray, t_max in zip(rays, limits):
+                        any(obj.occluded(ray, t_max) for obj in objects)
+        if count == 0:
+            continue
+        elapsed = best_of(run, repeat)
+        rates[f"{kind}_rays_per_s"] = count / elapsed
+    return rates
+
+
+def bvh_build_time(specs, repeat):
+    """Time to rebuild every mesh BVH and the scene BVH of a scene."""
+    finite = [obj for obj in (_quiet(build_object, spec) for spec in specs)
+              if not isinstance(obj, Plane)]
+
+    def build():
+        for obj in finite:
+            if isinstance(obj, Mesh):
+                obj.build_bvh()
+        FlatBVH.build(finite)
+
+    return best_of(build, repeat)
+
+
+def run_suite(scenes=None, engines=ENGINES, width=96, height=72, max_rays=2000, repeat=5):
+    """Run the benchmarks and return {"meta": ..., "metrics": {name: value}}."""
+    metrics = {}
+    load_bunny = lambda: _quiet(OBJLoader.load, BUNNY, make_material((1, 1, 1), 0.0), 30.0)
+    saved = config.MESH_CACHE_DIR
+    try:
+        # Parsing plus BVH build, then the same load from a warm mesh cache
+        config.MESH_CACHE_DIR = None
+        metrics["bunny.obj_load_s"] = best_of(load_bunny, repeat)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config.MESH_CACHE_DIR = cache_dir
+            load_bunny()
+            metrics["bunny.obj_cached_load_s"] = best_of(load_bunny, repeat)
+    finally:
+        config.MESH_CACHE_DIR = saved
+
+    for name, (specs, light_specs, eye, target) in reference_scenes().items():
+        if scenes and name not in scenes:
+            continue
+        metrics[f"{name}.bvh_build_s"] = bvh_build_time(specs, repeat)
+        camera, objects, lights = _quiet(build_scene, width, height, specs, light_specs, eye, target)
+        scene, sets = ray_sets(camera, objects, lights, width, height)
+        for engine in engines:
+            for key, value in ray_throughput(engine, scene, objects, sets, max_rays, repeat).items():
+                metrics[f"{name}.{engine}.{key}"] = value
+            metrics[f"{name}.{engine}.render_s"] = best_of(
+                lambda: render_image(width, height, camera, objects, lights, engine), repeat)
+        print(f"{name}: done", file=sys.stderr)
+
+    meta = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "width": width,
+        "height": height,
+        "max_rays": max_rays,
+        "repeat": repeat,
+        "aa_samples": config.AA_SAMPLES,
+        "bvh_method": config.BVH_METHOD,
+    }
+    return {"meta": meta, "metrics": metrics}
+
+
+def lower_is_better(name):
+    return not name.endswith("_per_s")
+
+
+def compare(results, baseline, threshold):
+    """Compare metrics against a baseline run.
+
+    Returns a list of (name, baseline value, new value, relative change)
+    for every shared metric, the change being positive when the new run is
+    worse, and the subset whose change exceeds threshold.
+    """
+    rows = []
+    for name, new in sorted(results["metrics"].items()):
+        old = baseline["metrics"].get(name)
+        if not old:
+            continue
+        change = (new - old) / old if lower_is_better(name) else (old - new) / old
+        rows.append((name, old, new, change))
+    return rows, [row for row in rows if row[3] > threshold]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown as a fraction of the baseline (default 0.10)")
+    parser.add_argument("--scenes", help="comma-separated subset of: "
+                        + ", ".join(reference_scenes()))
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--width", type=int, default=96)
+    parser.add_argument("--height", type=int, default=72)
+    parser.add_argument("--rays", type=int, default=2000,
+                        help="rays per type traced by the scalar engine")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing (best is kept)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scenes.split(",") if args.scenes else None,
+                        args.engines.split(","), args.width, args.height, args.rays, args.repeat)
+    print(f"{'metric':<44}{'value':>14}")
+    for name, value in sorted(results["metrics"].items()):
+        print(f"{name:<44}{value:>14.4g}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.threshold)
+    print(f"\n{'metric':<44}{'baseline':>12}{'now':>12}{'worse by':>10}")
+    for name, old, new, change in rows:
+        flag = "  REGRESSION" if change > args.threshold else ""
+        print(f"{name:<44}{old:>12.4g}{new:>12.4g}{change:>+10.1%}{flag}")
+    print(f"\n{len(regressions)} of {len(rows)} metrics regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,68 @@
+import os
+
 # Maximum depth limit for recursion
 MAX_DEPTH = 5
 # Anti-aliasing samples
 AA_SAMPLES = 1
+# BVH builder: "median" (widest-axis median split), "sah" (binned SAH) or
+# "lbvh" (linear Morton-code builder: near-linear build time for huge
+# meshes, somewhat slower trees)
+BVH_METHOD = "median"
+# Number of centroid bins per axis evaluated by the SAH builder
+BVH_BINS = 16
+# Maximum objects per BVH leaf (1 = single-object leaves)
+BVH_LEAF_SIZE = 1
+# Maximum triangles per mesh BVH leaf; a leaf's triangles are one contiguous
+# run tested in a single call, so small multi-triangle leaves are cheaper
+# than the extra nodes of single-triangle ones
+MESH_LEAF_SIZE = 4
+# Branching factor of BVH traversal: 2 (binary nodes) or 4 (binary trees
+# collapsed into 4-wide nodes whose child boxes are tested together)
+BVH_WIDTH = 4
+# A refitted BVH (moved objects or vertices, same topology) is rebuilt once
+# its SAH cost exceeds this multiple of its cost when it was built
+BVH_REBUILD_RATIO = 1.5
+# Processes that build median / SAH BVHs of 200,000 primitives or more
+# (None: CPU count, 1: always serial)
+BVH_BUILD_WORKERS = None
+# Processes that parse OBJ files of 64 MB or more (None: CPU count)
+OBJ_LOAD_WORKERS = None
+# Directory of the binary OBJ mesh cache (utils/mesh_cache.py); None disables it
+MESH_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "python-raytracer", "meshes")
+# Edge length in pixels of the tiles handed to render workers
+TILE_SIZE = 32
+# Tile order: "rows" (scanline) or "spiral" (outward from the image center)
+TILE_ORDER = "spiral"
+# Workers write tiles into a multiprocessing.shared_memory framebuffer and
+# only the dirty rectangle is reported back (False: tiles are pickled back)
+SHARED_FRAMEBUFFER = True
+# Progressive rendering: coarse preview passes (one sample per
+# PROGRESSIVE_START x PROGRESSIVE_START block, then finer) before full AA
+PROGRESSIVE = False
+PROGRESSIVE_START = 8
+# Adaptive anti-aliasing: one center sample per pixel, more (up to the
+# AA_SAMPLES x AA_SAMPLES grid) only where the image needs them
+ADAPTIVE_AA = False
+# Refine pixels whose center differs from a neighbor's by more than this
+# (0-255, any channel) or that hit a different object than a neighbor
+ADAPTIVE_CONTRAST = 16
+# ...and take the full grid where the samples' standard deviation exceeds this
+ADAPTIVE_VARIANCE = 8
+
+# Ray and traversal counters of this process, bumped while tracing. Render
+# workers reset them for every tile and send them back with its pixels.
+RAY_COUNTERS = ("primary_rays", "shadow_rays", "reflection_rays", "refraction_rays")
+TRACE_COUNTERS = RAY_COUNTERS + ("bvh_nodes", "aabb_tests", "primitive_tests")
+trace_stats = dict.fromkeys(TRACE_COUNTERS, 0)
 
 render_stats = {
     "ray_count": 0,
     "start_time": 0,
     "end_time": 0,
     "processed_pixels": 0,
-    "total_pixels": 0
+    "total_pixels": 0,
+    "samples": 0,
+    "border_samples": 0,
+    "tile_time": 0,
+    **dict.fromkeys(TRACE_COUNTERS, 0)
 }
\ No newline at end of file
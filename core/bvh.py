@@ -1,5 +1,15 @@
+import multiprocessing
+
+import numpy as np
+
+import config
 from utils.vector import Vector3D
 
+# Median / SAH builds of at least this many primitives use a process pool
+PARALLEL_PRIMITIVES = 200_000
+# Subtrees handed to each pool worker (more balance the load better)
+SUBTREES_PER_WORKER = 4
+
 
 def _compute_aabb(objects):
     """Return (min, max) AABB encompassing all objects."""
@@ -11,28 +21,153 @@ def _compute_aabb(objects):
     )
 
 
+def _aabb_entry(aabb_min, aabb_max, ray):
+    """Slab method AABB test. Returns the entry distance (negative when the
+    origin is inside the box), or None if the ray misses the box or leaves
+    it before ray.t_min.
+
+    Uses the ray's precomputed inverse direction, and its sign bits to pick
+    the near and far corner per axis, so no division or swap is needed.
+    """
+    config.trace_stats["aabb_tests"] += 1
+    o = ray.origin
+    ix, iy, iz = ray.inv_dir
+    sx, sy, sz = ray.sign
+    box = (aabb_min, aabb_max)
+    tmin, tmax = (box[sx].x - o.x) * ix, (box[1 - sx].x - o.x) * ix
+    t0, t1 = (box[sy].y - o.y) * iy, (box[1 - sy].y - o.y) * iy
+    if t0 > tmin:
+        tmin = t0
+    if t1 < tmax:
+        tmax = t1
+    t0, t1 = (box[sz].z - o.z) * iz, (box[1 - sz].z - o.z) * iz
+    if t0 > tmin:
+        tmin = t0
+    if t1 < tmax:
+        tmax = t1
+    if tmax < tmin or tmax <= ray.t_min:
+        return None
+    return tmin
+
+
 def _intersect_aabb(aabb_min, aabb_max, ray):
     """Slab method AABB test. Returns True if ray intersects the box."""
-    tmin, tmax = -1e18, 1e18
-
-    for attr in ('x', 'y', 'z'):
-        d = getattr(ray.direction, attr)
-        if d == 0.0:
-            # Ray parallel to slab — check if origin is inside
-            o = getattr(ray.origin, attr)
-            if o < getattr(aabb_min, attr) or o > getattr(aabb_max, attr):
-                return False
-            continue
-        inv_d = 1.0 / d
-        t0 = (getattr(aabb_min, attr) - getattr(ray.origin, attr)) * inv_d
-        t1 = (getattr(aabb_max, attr) - getattr(ray.origin, attr)) * inv_d
-        if inv_d < 0:
-            t0, t1 = t1, t0
-        tmin = max(tmin, t0)
-        tmax = min(tmax, t1)
-        if tmax < tmin:
+    return _aabb_entry(aabb_min, aabb_max, ray) is not None
+
+
+def _sah_split(lo, hi, centroids, bins):
+    """Pick the lowest-cost binned SAH split.
+
+    All three axes are binned at once. Returns a boolean mask selecting the
+    objects that go left, or None when the centroids cannot be separated on
+    any axis.
+    """
+    c_min, c_max = centroids.min(axis=0), centroids.max(axis=0)
+    extent = c_max - c_min
+    valid = extent > 0
+    if not valid.any():
+        return None
+    scale = np.where(valid, bins / np.where(valid, extent, 1.0), 0.0)
+    b = ((centroids - c_min) * scale).astype(np.int64)
+    np.clip(b, 0, bins - 1, out=b)
+
+    # Per (axis, bin) object counts and bounds, flattened to axis * bins + bin
+    flat = (b + np.arange(3) * bins).ravel()
+    counts = np.bincount(flat, minlength=3 * bins).reshape(3, bins)
+    bin_lo = np.full((3 * bins, 3), np.inf)
+    bin_hi = np.full((3 * bins, 3), -np.inf)
+    np.minimum.at(bin_lo, flat, np.repeat(lo, 3, axis=0))
+    np.maximum.at(bin_hi, flat, np.repeat(hi, 3, axis=0))
+    bin_lo = bin_lo.reshape(3, bins, 3)
+    bin_hi = bin_hi.reshape(3, bins, 3)
+
+    # Sweep: candidate k puts bins [0, k] left and (k, bins) right
+    left_n = np.cumsum(counts, axis=1)[:, :-1]
+    left_area = _surface_area(np.minimum.accumulate(bin_lo, axis=1)[:, :-1],
+                              np.maximum.accumulate(bin_hi, axis=1)[:, :-1])
+    right_n = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    right_area = _surface_area(np.minimum.accumulate(bin_lo[:, ::-1], axis=1)[:, ::-1][:, 1:],
+                               np.maximum.accumulate(bin_hi[:, ::-1], axis=1)[:, ::-1][:, 1:])
+    cost = left_n * left_area + right_n * right_area
+    cost[(left_n == 0) | (right_n == 0) | ~valid[:, None]] = np.inf
+
+    axis, k = np.unravel_index(int(np.argmin(cost)), cost.shape)
+    if not np.isfinite(cost[axis, k]):
+        return None
+    return b[:, axis] <= k
+
+
+def _surface_area(lo, hi):
+    """Surface area of boxes given (..., 3) min/max arrays; empty boxes give 0."""
+    e = np.maximum(hi - lo, 0.0)
+    return 2.0 * (e[..., 0] * e[..., 1] + e[..., 1] * e[..., 2] + e[..., 2] * e[..., 0])
+
+
+def sah_cost(bounds_min, bounds_max, right, prim_count):
+    """Surface area heuristic cost of a BVH in FlatBVH layout.
+
+    Expected work of a random ray that hits the root box: one unit per
+    inner node and per primitive test, weighted by the chance of entering
+    each node (its area over the root's). Refitting keeps the topology but
+    boxes grow as objects drift apart, so the cost relative to the cost at
+    build time measures how far a refitted tree has degraded.
+    """
+    area = _surface_area(np.asarray(bounds_min), np.asarray(bounds_max))
+    if area[0] <= 0:
+        return float(len(right) + prim_count[0])
+    weight = np.where(np.asarray(right) < 0, prim_count, 1)
+    return float((area * weight).sum() / area[0])
+
+
+def _inner_levels(right):
+    """Inner node indices of a FlatBVH grouped by depth, root level first."""
+    levels = []
+    frontier = np.array([0])
+    while frontier.size:
+        inner = frontier[right[frontier] >= 0]
+        if inner.size:
+            levels.append(inner)
+        frontier = np.concatenate((inner + 1, right[inner]))
+    return levels
+
+
+class BVHLeaf:
+    """Leaf holding several scene objects, tested linearly (see BVH_LEAF_SIZE)."""
+
+    def __init__(self, objects):
+        self.objects = list(objects)
+        self.aabb_min, self.aabb_max = _compute_aabb(self.objects)
+
+    def get_bounding_box(self):
+        return (self.aabb_min, self.aabb_max)
+
+    def refit(self):
+        """Recompute the box from the objects' current bounds."""
+        self.aabb_min, self.aabb_max = _compute_aabb(self.objects)
+
+    def intersect_full(self, ray):
+        """Return the HitRecord of the closest hit among the objects, or None."""
+        if not _intersect_aabb(self.aabb_min, self.aabb_max, ray):
+            return None
+        config.trace_stats["bvh_nodes"] += 1
+        closest = None
+        for obj in self.objects:
+            hit = obj.intersect_full(ray)
+            if hit is not None and (closest is None or hit.t < closest.t):
+                closest = hit
+        return closest
+
+    def intersect(self, ray):
+        hit = self.intersect_full(ray)
+        return hit.t if hit is not None else None
+
+    def occluded(self, ray, t_max):
+        """True if any object is hit closer than t_max (any-hit, stops early)."""
+        entry = _aabb_entry(self.aabb_min, self.aabb_max, ray)
+        if entry is None or entry >= t_max:
             return False
-    return tmax > 0
+        config.trace_stats["bvh_nodes"] += 1
+        return any(obj.occluded(ray, t_max) for obj in self.objects)
 
 
 class BVHNode:
@@ -41,19 +176,89 @@ class BVHNode:
         self.aabb_max = aabb_max
         self._left = left
         self._right = right
-        # Expose material=None so trace_ray's closest_obj.material access
-        # won't crash before the leaf-unwrap step.
-        self.material = None
+        self.build_cost = None  # sah_cost before the first refit
+
+    def get_bounding_box(self):
+        return (self.aabb_min, self.aabb_max)
+
+    def cost(self):
+        """sah_cost of the tree below this node."""
+        flat = FlatBVH.from_tree(self)
+        return sah_cost(flat.bounds_min, flat.bounds_max, flat.right, flat.prim_count)
+
+    def refit(self):
+        """Recompute every box bottom-up after objects moved, keeping the tree.
+
+        Returns the cost relative to the cost before the first refit; see
+        FlatBVH.refit.
+        """
+        if self.build_cost is None:
+            self.build_cost = self.cost()
+        self._refit_bounds()
+        return self.cost() / self.build_cost if self.build_cost > 0 else 1.0
+
+    def _refit_bounds(self):
+        for child in (self._left, self._right):
+            if isinstance(child, BVHNode):
+                child._refit_bounds()
+            elif isinstance(child, BVHLeaf):
+                child.refit()
+        self.aabb_min, self.aabb_max = _compute_aabb([c for c in (self._left, self._right)
+                                                      if c is not None])
 
     @classmethod
-    def build(cls, objects):
-        """Recursively build a BVH from a list of scene objects."""
+    def build(cls, objects, method=None, bins=None, leaf_size=None):
+        """Build a BVH from a list of scene objects.
+
+        method is "median" (widest-axis median split), "sah" (binned surface
+        area heuristic) or "lbvh" (linear Morton-code builder, see
+        _build_lbvh); bins is the SAH bin count per axis and leaf_size the
+        maximum number of objects per leaf. Unset arguments default to
+        config.BVH_METHOD / BVH_BINS / BVH_LEAF_SIZE.
+        """
+        method = method or config.BVH_METHOD
+        bins = bins or config.BVH_BINS
+        leaf_size = max(1, leaf_size or config.BVH_LEAF_SIZE)
+        if method == "median":
+            return cls._build_median(objects, leaf_size)
+        if method == "sah":
+            return cls._build_sah(objects, bins, leaf_size)
+        if method == "lbvh":
+            return cls._build_lbvh(objects, leaf_size)
+        raise ValueError(f"Unknown BVH method: {method}")
+
+    @classmethod
+    def _build_lbvh(cls, objects, leaf_size=1):
+        """Build the flat LBVH arrays, then link node objects bottom-up."""
+        if len(objects) == 0:
+            return None
+        boxes = [obj.get_bounding_box() for obj in objects]  # raises ValueError for empty mesh
+        lo = np.array([(b[0].x, b[0].y, b[0].z) for b in boxes], dtype=np.float64)
+        hi = np.array([(b[1].x, b[1].y, b[1].z) for b in boxes], dtype=np.float64)
+        bounds_min, bounds_max, right, start, count, order = _build_lbvh(lo, hi, leaf_size)
+        order = order.tolist()
+        nodes = [None] * len(right)
+        # Children follow their parent in depth-first order
+        for i in range(len(right) - 1, -1, -1):
+            if right[i] < 0:
+                leaf = [objects[k] for k in order[start[i]:start[i] + count[i]]]
+                nodes[i] = leaf[0] if len(leaf) == 1 else BVHLeaf(leaf)
+            else:
+                nodes[i] = cls(Vector3D(*bounds_min[i].tolist(), 1), Vector3D(*bounds_max[i].tolist(), 1),
+                               nodes[i + 1], nodes[right[i]])
+        return nodes[0]
+
+    @classmethod
+    def _build_median(cls, objects, leaf_size=1):
+        """Recursively build a BVH, splitting at the median of the widest axis."""
         if len(objects) == 0:
             return None
         if len(objects) == 1:
             if hasattr(objects[0], 'get_bounding_box'):
                 objects[0].get_bounding_box()  # validate — raises ValueError for empty mesh
             return objects[0]  # leaf — plain scene object
+        if len(objects) <= leaf_size:
+            return BVHLeaf(objects)
 
         aabb_min, aabb_max = _compute_aabb(objects)
 
@@ -73,31 +278,765 @@ class BVHNode:
         sorted_objs = sorted(objects, key=centroid)
         mid = len(sorted_objs) // 2
 
-        left = cls.build(sorted_objs[:mid])
-        right = cls.build(sorted_objs[mid:])
+        left = cls._build_median(sorted_objs[:mid], leaf_size)
+        right = cls._build_median(sorted_objs[mid:], leaf_size)
 
         return cls(aabb_min, aabb_max, left, right)
 
+    @classmethod
+    def _build_sah(cls, objects, bins=16, leaf_size=1):
+        """Build a BVH with binned SAH splits.
+
+        Object bounds are gathered into NumPy arrays once; each level then
+        bins centroids per axis (O(n)) instead of sorting, and picks the
+        plane with the lowest  A_L * N_L + A_R * N_R  cost.
+        """
+        if len(objects) == 0:
+            return None
+        boxes = [obj.get_bounding_box() for obj in objects]  # raises ValueError for empty mesh
+        lo = np.array([(b[0].x, b[0].y, b[0].z) for b in boxes], dtype=np.float64)
+        hi = np.array([(b[1].x, b[1].y, b[1].z) for b in boxes], dtype=np.float64)
+        return cls._build_sah_range(objects, lo, hi, (lo + hi) * 0.5,
+                                    np.arange(len(objects)), bins, leaf_size)
+
+    @classmethod
+    def _build_sah_range(cls, objects, lo, hi, centroids, idx, bins, leaf_size):
+        if len(idx) == 1:
+            return objects[idx[0]]
+        if len(idx) <= leaf_size:
+            return BVHLeaf([objects[i] for i in idx])
+
+        node_lo, node_hi = lo[idx].min(axis=0), hi[idx].max(axis=0)
+        mask = _sah_split(lo[idx], hi[idx], centroids[idx], bins)
+        if mask is None:
+            # All centroids coincide: no plane separates them, split in half
+            mask = np.arange(len(idx)) < len(idx) // 2
+
+        left = cls._build_sah_range(objects, lo, hi, centroids, idx[mask], bins, leaf_size)
+        right = cls._build_sah_range(objects, lo, hi, centroids, idx[~mask], bins, leaf_size)
+        return cls(Vector3D(*node_lo.tolist(), 1), Vector3D(*node_hi.tolist(), 1), left, right)
+
     def intersect_full(self, ray):
-        """Return (t, leaf_object) for closest hit, or (None, None) on miss."""
+        """Return the closest hit's HitRecord, or None on miss."""
         if not _intersect_aabb(self.aabb_min, self.aabb_max, ray):
-            return None, None
+            return None
+        config.trace_stats["bvh_nodes"] += 1
+
+        hit_left = self._left.intersect_full(ray) if self._left is not None else None
+        hit_right = self._right.intersect_full(ray) if self._right is not None else None
+
+        if hit_left is None:
+            return hit_right
+        if hit_right is None or hit_left.t <= hit_right.t:
+            return hit_left
+        return hit_right
+
+    def intersect(self, ray):
+        """Return closest hit distance, or None. Thin wrapper over intersect_full."""
+        hit = self.intersect_full(ray)
+        return hit.t if hit is not None else None
+
+    def occluded(self, ray, t_max):
+        """True if anything is hit closer than t_max.
+
+        Any-hit query for shadow rays: returns at the first hit instead of
+        searching for the closest one, and skips boxes entered at or beyond
+        t_max (e.g. past the light).
+        """
+        entry = _aabb_entry(self.aabb_min, self.aabb_max, ray)
+        if entry is None or entry >= t_max:
+            return False
+        config.trace_stats["bvh_nodes"] += 1
+        return self._left.occluded(ray, t_max) or self._right.occluded(ray, t_max)
+
+
+class FlatBVH:
+    """A BVH compiled into flat NumPy arrays with iterative traversal.
+
+    Nodes are stored in depth-first order, so a node's left child is always
+    the next node and every subtree covers a contiguous primitive range:
+
+    - bounds_min / bounds_max: (n, 3) float64 node boxes
+    - right: (n,) int32 index of the right child, -1 for leaves
+    - prim_start / prim_count: (n,) int32 range into primitives covered by
+      the node (for leaves, the primitives they test)
+    - prim_index: (m,) int32 original index of the primitive in each slot
+
+    Traversal uses an explicit stack, visits the nearer child first and skips
+    subtrees whose entry distance is beyond the closest hit so far. Pickling
+    ships only the arrays and the primitive list; the Python-list view used by
+    the traversal loop is rebuilt lazily in each process.
+    """
+
+    def __init__(self, bounds_min, bounds_max, right, prim_start, prim_count, primitives,
+                 prim_index=None):
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.right = right
+        self.prim_start = prim_start
+        self.prim_count = prim_count
+        self.primitives = primitives
+        # Slot -> original primitive index (identity when built from a tree)
+        if prim_index is None:
+            prim_index = np.arange(len(primitives), dtype=np.int32)
+        self.prim_index = prim_index
+        self.build_cost = None  # sah_cost before the first refit
+        self._nodes = None
+        self._wide = None
+        self._width = None
+        self._levels = None
+
+    @classmethod
+    def build(cls, objects, method=None, bins=None, leaf_size=None):
+        """Build a flat BVH over scene objects.
+
+        Takes the same options as BVHNode.build and produces the same tree,
+        but builds the node arrays directly from the object bounds. Like
+        BVHNode.build, returns None for no objects and the bare object when
+        there is only one.
+        """
+        if len(objects) == 0:
+            return None
+        if len(objects) == 1:
+            if hasattr(objects[0], 'get_bounding_box'):
+                objects[0].get_bounding_box()  # validate — raises ValueError for empty mesh
+            return objects[0]
+        boxes = [obj.get_bounding_box() for obj in objects]
+        lo = np.array([(b[0].x, b[0].y, b[0].z) for b in boxes], dtype=np.float64)
+        hi = np.array([(b[1].x, b[1].y, b[1].z) for b in boxes], dtype=np.float64)
+        arrays = build_flat_arrays(lo, hi, method, bins, leaf_size)
+        order = arrays[-1]
+        return cls(*arrays[:-1], [objects[i] for i in order.tolist()], order)
+
+    @classmethod
+    def from_tree(cls, root):
+        """Flatten a BVHNode / BVHLeaf tree into depth-first node arrays."""
+        lo, hi, right, start, count = [], [], [], [], []
+        primitives = []
+        stack = [(root, None)]
+        while stack:
+            node, parent = stack.pop()
+            i = len(right)
+            if parent is not None:
+                right[parent] = i
+            if isinstance(node, BVHNode):
+                box = (node.aabb_min, node.aabb_max)
+            else:
+                box = node.get_bounding_box()
+            lo.append((box[0].x, box[0].y, box[0].z))
+            hi.append((box[1].x, box[1].y, box[1].z))
+            right.append(-1)
+            start.append(len(primitives))
+            count.append(0)
+            if isinstance(node, BVHNode):
+                # Left is popped (and numbered) first, so it lands at i + 1;
+                # the right child records its own index into right[i].
+                stack.append((node._right, i))
+                stack.append((node._left, None))
+            elif isinstance(node, BVHLeaf):
+                primitives.extend(node.objects)
+            else:
+                primitives.append(node)
+
+        # Subtree ranges: each node covers its primitives up to the next node
+        # that is not its descendant; fill counts bottom-up.
+        n = len(right)
+        for i in range(n - 1, -1, -1):
+            if right[i] >= 0:
+                count[i] = count[i + 1] + count[right[i]]
+            else:
+                count[i] = _leaf_size(primitives, start, i, n)
+
+        return cls(np.array(lo, dtype=np.float64), np.array(hi, dtype=np.float64),
+                   np.array(right, dtype=np.int32), np.array(start, dtype=np.int32),
+                   np.array(count, dtype=np.int32), primitives)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_nodes"] = None
+        state["_wide"] = None
+        state["_width"] = None
+        state["_levels"] = None
+        return state
+
+    def _prepare(self):
+        """Build the per-node tuple view used by the traversal loop, and the
+        4-wide view when config.BVH_WIDTH is 4.
+
+        Traversal takes a set _nodes as "ready", and other threads may be
+        traversing meanwhile, so every other view is built and assigned
+        first and _nodes last.
+        """
+        nodes = list(zip(self.bounds_min.tolist(), self.bounds_max.tolist(),
+                         self.right.tolist(), self.prim_start.tolist(),
+                         self.prim_count.tolist()))
+        width = config.BVH_WIDTH
+        wide = None
+        if width == 4 and nodes[0][2] >= 0:
+            areas = _surface_area(self.bounds_min, self.bounds_max).tolist()
+            wide = _collapse_wide(nodes, areas)
+        self._wide = wide
+        self._width = width
+        self._nodes = nodes
+
+    def node_count(self):
+        return len(self.right)
+
+    def cost(self):
+        """sah_cost of the current node boxes."""
+        return sah_cost(self.bounds_min, self.bounds_max, self.right, self.prim_count)
+
+    def refit(self):
+        """Recompute the node boxes from the primitives' current bounds.
+
+        The topology (node order, primitive slots) is kept, so moving or
+        deforming objects costs O(n) instead of a rebuild: leaves take the
+        union of their primitives' boxes, then inner nodes the union of
+        their children's, one depth level at a time from the bottom up.
+        Returns the SAH cost relative to the cost before the first refit
+        (1.0 = as good as built); see needs_rebuild.
+        """
+        if self.build_cost is None:
+            self.build_cost = self.cost()
+        lo, hi = self._slot_bounds()
+        # Copies: the arrays may be read-only memory maps (see mesh_cache)
+        bounds_min, bounds_max = np.array(self.bounds_min), np.array(self.bounds_max)
+        leaves = np.nonzero(self.right < 0)[0]
+        # Depth-first order: leaves partition the slots in ascending order
+        starts = self.prim_start[leaves]
+        bounds_min[leaves] = np.minimum.reduceat(lo, starts, axis=0)
+        bounds_max[leaves] = np.maximum.reduceat(hi, starts, axis=0)
+        if self._levels is None:
+            self._levels = _inner_levels(self.right)
+        for inner in reversed(self._levels):
+            r = self.right[inner]
+            bounds_min[inner] = np.minimum(bounds_min[inner + 1], bounds_min[r])
+            bounds_max[inner] = np.maximum(bounds_max[inner + 1], bounds_max[r])
+        self.bounds_min, self.bounds_max = bounds_min, bounds_max
+        self._nodes = None
+        return self.quality()
+
+    def quality(self):
+        """SAH cost relative to the cost before the first refit (1.0 if never refitted)."""
+        if self.build_cost is None or self.build_cost <= 0:
+            return 1.0
+        return self.cost() / self.build_cost
+
+    def needs_rebuild(self, ratio=None):
+        """True once refits have degraded the tree past ratio (default
+        config.BVH_REBUILD_RATIO) times its build cost."""
+        return self.quality() > (ratio or config.BVH_REBUILD_RATIO)
+
+    def _slot_bounds(self):
+        """(m, 3) min / max bounds of the primitive in each slot."""
+        boxes = [obj.get_bounding_box() for obj in self.primitives]
+        lo = np.array([(b[0].x, b[0].y, b[0].z) for b in boxes], dtype=np.float64)
+        hi = np.array([(b[1].x, b[1].y, b[1].z) for b in boxes], dtype=np.float64)
+        return lo, hi
+
+    def get_bounding_box(self):
+        lo, hi = self.bounds_min[0].tolist(), self.bounds_max[0].tolist()
+        return (Vector3D(*lo, 1), Vector3D(*hi, 1))
+
+    def intersect_full(self, ray):
+        """Return the closest hit's HitRecord, or None on miss."""
+        if self._nodes is None or self._width != config.BVH_WIDTH:
+            self._prepare()
+        if self._wide is not None:
+            return self._intersect_wide(ray)
+        nodes = self._nodes
+        ox, oy, oz = ray.origin.x, ray.origin.y, ray.origin.z
+        ix, iy, iz = ray.inv_dir
+        t_min = ray.t_min
+        t_limit = t_max = ray.t_max
 
-        t_left, leaf_left = None, None
-        if self._left is not None:
-            t_left, leaf_left = self._left.intersect_full(ray)
+        stats = config.trace_stats
 
-        t_right, leaf_right = None, None
-        if self._right is not None:
-            t_right, leaf_right = self._right.intersect_full(ray)
+        def entry(i):
+            stats["aabb_tests"] += 1
+            return _node_entry(nodes[i], ox, oy, oz, ix, iy, iz, t_min)
 
-        if t_left is None and t_right is None:
-            return None, None
-        if t_left is not None and (t_right is None or t_left <= t_right):
-            return t_left, leaf_left
-        return t_right, leaf_right
+        closest = None
+        t_root = entry(0)
+        if t_root is None or t_root > t_max:
+            return None
+        stack = [(0, t_root)]
+        while stack:
+            i, t_entry = stack.pop()
+            if t_entry > t_max:
+                continue  # a closer hit was found since this node was pushed
+            stats["bvh_nodes"] += 1
+            _, _, right, start, count = nodes[i]
+            if right < 0:
+                hit = self._leaf_intersect(ray, start, count)
+                if hit is not None and hit.t < t_max:
+                    closest, t_max = hit, hit.t
+                    ray.t_max = t_max  # nested queries cull against it
+                continue
+
+            t_left, t_right = entry(i + 1), entry(right)
+            # Push the far child first so the near child is popped next.
+            if t_left is not None and t_right is not None:
+                if t_left <= t_right:
+                    stack.append((right, t_right))
+                    stack.append((i + 1, t_left))
+                else:
+                    stack.append((i + 1, t_left))
+                    stack.append((right, t_right))
+            elif t_left is not None:
+                stack.append((i + 1, t_left))
+            elif t_right is not None:
+                stack.append((right, t_right))
+        ray.t_max = t_limit
+        return closest
+
+    def _intersect_wide(self, ray):
+        """intersect_full over the 4-wide view: one pop tests all children of
+        a node, leaves are tested nearest first and inner children pushed
+        far to near."""
+        wide = self._wide
+        ox, oy, oz = ray.origin.x, ray.origin.y, ray.origin.z
+        ix, iy, iz = ray.inv_dir
+        t_min = ray.t_min
+        t_limit = t_max = ray.t_max
+
+        stats = config.trace_stats
+        stats["aabb_tests"] += 1
+        t_root = _node_entry(self._nodes[0], ox, oy, oz, ix, iy, iz, t_min)
+        if t_root is None or t_root > t_max:
+            return None
+        closest = None
+        stack = [(t_root, 0)]
+        while stack:
+            t_entry, j = stack.pop()
+            if t_entry > t_max:
+                continue
+            stats["bvh_nodes"] += 1
+            children = wide[j]
+            stats["aabb_tests"] += len(children)
+            entries = _wide_entries(children, ox, oy, oz, ix, iy, iz, t_min)
+            if not entries:
+                continue
+            entries.sort()
+            inner = []
+            for t, k in entries:
+                if t > t_max:
+                    break
+                child = children[k]
+                if child[6] >= 0:
+                    inner.append((t, child[6]))
+                    continue
+                stats["bvh_nodes"] += 1
+                hit = self._leaf_intersect(ray, child[7], child[8])
+                if hit is not None and hit.t < t_max:
+                    closest, t_max = hit, hit.t
+                    ray.t_max = t_max
+            inner.reverse()
+            stack.extend(inner)
+        ray.t_max = t_limit
+        return closest
+
+    def _occluded_wide(self, ray, t_max):
+        wide = self._wide
+        ox, oy, oz = ray.origin.x, ray.origin.y, ray.origin.z
+        ix, iy, iz = ray.inv_dir
+        t_min = ray.t_min
+
+        stats = config.trace_stats
+        stats["aabb_tests"] += 1
+        t_root = _node_entry(self._nodes[0], ox, oy, oz, ix, iy, iz, t_min)
+        if t_root is None or t_root >= t_max:
+            return False
+        stack = [0]
+        while stack:
+            children = wide[stack.pop()]
+            stats["bvh_nodes"] += 1
+            stats["aabb_tests"] += len(children)
+            for t, k in _wide_entries(children, ox, oy, oz, ix, iy, iz, t_min):
+                if t >= t_max:
+                    continue
+                child = children[k]
+                if child[6] >= 0:
+                    stack.append(child[6])
+                    continue
+                stats["bvh_nodes"] += 1
+                if self._leaf_occluded(ray, child[7], child[8], t_max):
+                    return True
+        return False
+
+    def _leaf_intersect(self, ray, start, count):
+        """Closest HitRecord among leaf slots [start, start + count), or None.
+
+        Subclasses that keep primitives in arrays (see Mesh) override this
+        and _leaf_occluded instead of storing one object per slot.
+        """
+        closest = None
+        for obj in self.primitives[start:start + count]:
+            hit = obj.intersect_full(ray)
+            if hit is not None and (closest is None or hit.t < closest.t):
+                closest = hit
+        return closest
+
+    def _leaf_occluded(self, ray, start, count, t_max):
+        return any(obj.occluded(ray, t_max) for obj in self.primitives[start:start + count])
 
     def intersect(self, ray):
         """Return closest hit distance, or None. Thin wrapper over intersect_full."""
-        t, _ = self.intersect_full(ray)
-        return t
+        hit = self.intersect_full(ray)
+        return hit.t if hit is not None else None
+
+    def occluded(self, ray, t_max):
+        """True if anything is hit closer than t_max.
+
+        Any-hit query for shadow rays: returns at the first primitive hit and
+        never descends into nodes entered at or beyond t_max.
+        """
+        if self._nodes is None or self._width != config.BVH_WIDTH:
+            self._prepare()
+        if self._wide is not None:
+            return self._occluded_wide(ray, t_max)
+        nodes = self._nodes
+        ox, oy, oz = ray.origin.x, ray.origin.y, ray.origin.z
+        ix, iy, iz = ray.inv_dir
+        t_min = ray.t_min
+
+        stats = config.trace_stats
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            node = nodes[i]
+            stats["aabb_tests"] += 1
+            t_entry = _node_entry(node, ox, oy, oz, ix, iy, iz, t_min)
+            if t_entry is None or t_entry >= t_max:
+                continue
+            stats["bvh_nodes"] += 1
+            _, _, right, start, count = node
+            if right < 0:
+                if self._leaf_occluded(ray, start, count, t_max):
+                    return True
+            else:
+                stack.append(right)
+                stack.append(i + 1)
+        return False
+
+
+def build_flat_arrays(lo, hi, method=None, bins=None, leaf_size=None, workers=None):
+    """Build a depth-first BVH directly from (n, 3) primitive bounds.
+
+    Produces the same tree as BVHNode.build for the same bounds and options,
+    without creating node objects. Returns (bounds_min, bounds_max, right,
+    prim_start, prim_count, order) in FlatBVH layout, where order maps each
+    primitive slot to its row in lo / hi. Needs at least one primitive.
+
+    Median and SAH builds of PARALLEL_PRIMITIVES or more primitives run on
+    a pool of workers processes (config.BVH_BUILD_WORKERS, default: CPU
+    count) when workers is not given: the top levels are split here until
+    every open range is small enough to be one of about SUBTREES_PER_WORKER
+    tasks per worker, the pool builds those subtrees, and they are stitched
+    in. Every split depends only on its own range, so the tree is identical
+    to the serial build.
+    """
+    method = method or config.BVH_METHOD
+    bins = bins or config.BVH_BINS
+    leaf_size = max(1, leaf_size or config.BVH_LEAF_SIZE)
+    if method == "lbvh":
+        return _build_lbvh(lo, hi, leaf_size)
+    if method not in ("median", "sah"):
+        raise ValueError(f"Unknown BVH method: {method}")
+    if workers is None:
+        workers = 1
+        if len(lo) >= PARALLEL_PRIMITIVES:
+            workers = config.BVH_BUILD_WORKERS or multiprocessing.cpu_count()
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return _build_ranges(lo, hi, method, bins, leaf_size)[:6]
+
+    defer = max(leaf_size + 1, -(-len(lo) // (workers * SUBTREES_PER_WORKER)))
+    top = _build_ranges(lo, hi, method, bins, leaf_size, defer)
+    order, deferred = top[5], top[6]
+    tasks = [(lo[order[a:b]], hi[order[a:b]], method, bins, leaf_size) for _, a, b in deferred]
+    with multiprocessing.Pool(min(workers, max(1, len(tasks)))) as pool:
+        subtrees = pool.map(_build_subtree, tasks)
+    return _stitch(top, subtrees)
+
+
+def _build_subtree(task):
+    """Pool task: serial build_flat_arrays of one deferred range."""
+    lo, hi, method, bins, leaf_size = task
+    return build_flat_arrays(lo, hi, method, bins, leaf_size, workers=1)
+
+
+def _stitch(top, subtrees):
+    """Splice subtrees (build_flat_arrays tuples) into the top-level tree
+    in place of its deferred nodes."""
+    bounds_min, bounds_max, right, start, count, order, deferred = top
+    extra = np.zeros(len(right), dtype=np.int64)
+    for (i, _, _), sub in zip(deferred, subtrees):
+        extra[i] = len(sub[2]) - 1
+    # Depth-first position of every top-level node once the subtrees are in
+    final = np.arange(len(right)) + np.cumsum(extra) - extra
+    total = len(right) + int(extra.sum())
+
+    out_min, out_max = np.empty((total, 3)), np.empty((total, 3))
+    out_right = np.empty(total, dtype=np.int32)
+    out_start, out_count = np.empty(total, dtype=np.int32), np.empty(total, dtype=np.int32)
+    out_min[final], out_max[final] = bounds_min, bounds_max
+    out_right[final] = np.where(right >= 0, final[right], -1)
+    out_start[final], out_count[final] = start, count
+    for (i, a, b), (sub_min, sub_max, sub_right, sub_start, sub_count, sub_order) in zip(deferred, subtrees):
+        f = final[i]
+        nodes = slice(f, f + len(sub_right))
+        out_min[nodes], out_max[nodes] = sub_min, sub_max
+        out_right[nodes] = np.where(sub_right >= 0, sub_right + f, -1)
+        out_start[nodes], out_count[nodes] = sub_start + a, sub_count
+        order[a:b] = order[a:b][sub_order]
+    return out_min, out_max, out_right, out_start, out_count, order
+
+
+def _build_ranges(lo, hi, method, bins, leaf_size, defer=None):
+    """The median / SAH build loop of build_flat_arrays.
+
+    With defer set, ranges of at most defer primitives (and more than
+    leaf_size) are not split but left as leaves and listed as deferred
+    (node, first slot, end slot). Returns build_flat_arrays' tuple with the
+    deferred list appended.
+    """
+    n = len(lo)
+    centroids = (lo + hi) * 0.5
+    order = np.arange(n)
+    node_lo, node_hi, right, start, count = [], [], [], [], []
+    deferred = []
+    # (first slot, end slot, parent whose right child this is)
+    stack = [(0, n, None)]
+    while stack:
+        a, b, parent = stack.pop()
+        i = len(right)
+        if parent is not None:
+            right[parent] = i
+        idx = order[a:b]
+        node_lo.append(lo[idx].min(axis=0))
+        node_hi.append(hi[idx].max(axis=0))
+        right.append(-1)
+        start.append(a)
+        count.append(b - a)
+        if b - a == 1 or b - a <= leaf_size:
+            continue
+        if defer is not None and b - a <= defer:
+            deferred.append((i, a, b))
+            continue
+
+        if method == "median":
+            axis = int(np.argmax(node_hi[i] - node_lo[i]))
+            order[a:b] = idx[np.argsort(centroids[idx, axis], kind="stable")]
+            mid = a + (b - a) // 2
+        else:
+            mask = _sah_split(lo[idx], hi[idx], centroids[idx], bins)
+            if mask is None:
+                # All centroids coincide: no plane separates them, split in half
+                mid = a + (b - a) // 2
+            else:
+                order[a:b] = np.concatenate((idx[mask], idx[~mask]))
+                mid = a + int(mask.sum())
+        # Left is popped (and numbered) first, so it lands at i + 1.
+        stack.append((mid, b, i))
+        stack.append((a, mid, None))
+
+    return (np.array(node_lo, dtype=np.float64), np.array(node_hi, dtype=np.float64),
+            np.array(right, dtype=np.int32), np.array(start, dtype=np.int32),
+            np.array(count, dtype=np.int32), order.astype(np.int32), deferred)
+
+
+def _spread_bits(v):
+    """Insert two zero bits between each of the low 10 bits of uint32 v."""
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    return (v | (v << 2)) & 0x09249249
+
+
+def morton_codes(points):
+    """30-bit Morton codes of (n, 3) points on a 1024^3 grid over their bounds."""
+    p_min = points.min(axis=0)
+    extent = points.max(axis=0) - p_min
+    scale = np.where(extent > 0, 1023.0 / np.where(extent > 0, extent, 1.0), 0.0)
+    q = ((points - p_min) * scale).astype(np.uint32)
+    return (_spread_bits(q[:, 0]) << 2) | (_spread_bits(q[:, 1]) << 1) | _spread_bits(q[:, 2])
+
+
+def _radix_argsort(codes):
+    """Stable argsort of 30-bit codes: LSD radix sort on three 10-bit digits.
+
+    Each pass sorts uint16 digits with NumPy's stable sort, which is itself
+    a radix sort for integers that small, so the whole sort is linear.
+    """
+    order = np.arange(len(codes))
+    for shift in (0, 10, 20):
+        digit = ((codes[order] >> shift) & 1023).astype(np.uint16)
+        order = order[np.argsort(digit, kind="stable")]
+    return order
+
+
+def _build_lbvh(lo, hi, leaf_size):
+    """Linear BVH over (n, 3) primitive bounds (Morton-code radix tree).
+
+    Primitives are sorted along the Z-order curve of their centroids. Every
+    node covers a range of that order and splits where the highest bit that
+    differs between its first and last code flips, found with one
+    searchsorted per tree level for all nodes of the level (ranges of
+    identical codes split in half). Boxes are then filled in bottom-up, one
+    level at a time. Nothing recurses and each level is a few NumPy passes,
+    so huge meshes build in near-linear time, in exchange for a tree
+    somewhat worse than the median or SAH builders give. Returns
+    build_flat_arrays' tuple.
+    """
+    n = len(lo)
+    codes = morton_codes((lo + hi) * 0.5)
+    order = _radix_argsort(codes)
+    codes = codes[order].astype(np.int64)
+
+    # Nodes in breadth-first order: slot range [start, end) and children
+    start, end = [np.array([0])], [np.array([n])]
+    left, right, levels = [], [], []
+    frontier, count = np.array([0]), 1
+    while frontier.size:
+        s, e = start[-1], end[-1]
+        inner = (e - s) > leaf_size
+        k = np.count_nonzero(inner)
+        child = np.full(len(frontier), -1)
+        child[inner] = count + np.arange(k)
+        left.append(child)
+        right.append(np.where(inner, child + k, -1))
+        if k:
+            levels.append(frontier[inner])
+        s, e = s[inner], e[inner]
+        first, last = codes[s], codes[e - 1]
+        bit = np.frexp((first ^ last).astype(np.float64))[1] - 1  # highest differing bit
+        pivot = ((first >> np.maximum(bit, 0)) | 1) << np.maximum(bit, 0)
+        mid = np.where(bit >= 0, np.searchsorted(codes, pivot), (s + e) // 2)
+        mid = np.clip(mid, s + 1, e - 1)
+        start.append(np.concatenate((s, mid)))
+        end.append(np.concatenate((mid, e)))
+        frontier = count + np.arange(2 * k)
+        count += 2 * k
+    start, end = np.concatenate(start[:-1]), np.concatenate(end[:-1])
+    left, right = np.concatenate(left), np.concatenate(right)
+
+    # Boxes bottom-up: leaves reduce their slot ranges, inner nodes their children
+    slot_lo, slot_hi = lo[order], hi[order]
+    node_lo, node_hi = np.empty((count, 3)), np.empty((count, 3))
+    leaves = np.nonzero(left < 0)[0]
+    leaves = leaves[np.argsort(start[leaves])]
+    node_lo[leaves] = np.minimum.reduceat(slot_lo, start[leaves], axis=0)
+    node_hi[leaves] = np.maximum.reduceat(slot_hi, start[leaves], axis=0)
+    size = np.ones(count, dtype=np.int64)
+    for inner in reversed(levels):
+        l, r = left[inner], right[inner]
+        node_lo[inner] = np.minimum(node_lo[l], node_lo[r])
+        node_hi[inner] = np.maximum(node_hi[l], node_hi[r])
+        size[inner] = 1 + size[l] + size[r]
+
+    # Depth-first positions: left child next, right child after the left subtree
+    pos = np.zeros(count, dtype=np.int64)
+    for inner in levels:
+        pos[left[inner]] = pos[inner] + 1
+        pos[right[inner]] = pos[inner] + 1 + size[left[inner]]
+    flat_right = np.full(count, -1, dtype=np.int32)
+    inner = left >= 0
+    flat_right[pos[inner]] = pos[right[inner]]
+    flat_lo, flat_hi = np.empty_like(node_lo), np.empty_like(node_hi)
+    flat_lo[pos], flat_hi[pos] = node_lo, node_hi
+    flat_start, flat_count = np.empty(count, dtype=np.int32), np.empty(count, dtype=np.int32)
+    flat_start[pos], flat_count[pos] = start, end - start
+    return flat_lo, flat_hi, flat_right, flat_start, flat_count, order.astype(np.int32)
+
+
+def _node_entry(node, ox, oy, oz, ix, iy, iz, t_min=0.0):
+    """Slab test of a flattened node tuple against a ray given by its origin
+    and inverse direction (Ray.inv_dir). Returns the entry distance, or None
+    on a miss or when the ray leaves the box before t_min."""
+    lo, hi = node[0], node[1]
+    t0, t1 = (lo[0] - ox) * ix, (hi[0] - ox) * ix
+    tmin, tmax = (t0, t1) if t0 < t1 else (t1, t0)
+    t0, t1 = (lo[1] - oy) * iy, (hi[1] - oy) * iy
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > tmin:
+        tmin = t0
+    if t1 < tmax:
+        tmax = t1
+    t0, t1 = (lo[2] - oz) * iz, (hi[2] - oz) * iz
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > tmin:
+        tmin = t0
+    if t1 < tmax:
+        tmax = t1
+    if tmax < tmin or tmax <= t_min:
+        return None
+    return tmin
+
+
+def _collapse_wide(nodes, areas, width=4):
+    """Collapse a binary FlatBVH node view into a width-ary one.
+
+    Each wide node stands for a binary inner node and takes its two
+    children, then repeatedly replaces the inner child with the largest
+    surface area by that child's own two children until it has width
+    children (or only leaves left). Returns a list of wide nodes, the root
+    first; a wide node is a tuple of children packed as flat tuples
+    (lo x, y, z, hi x, y, z, wide index or -1 for a leaf, start, count).
+    """
+    wide = []
+    queue = [0]
+    for b in queue:  # grows as inner children are numbered
+        children = [b + 1, nodes[b][2]]
+        while len(children) < width:
+            inner = [c for c in children if nodes[c][2] >= 0]
+            if not inner:
+                break
+            c = max(inner, key=areas.__getitem__)
+            k = children.index(c)
+            children[k:k + 1] = [c + 1, nodes[c][2]]
+        packed = []
+        for c in children:
+            lo, hi, right, start, count = nodes[c]
+            if right >= 0:
+                packed.append((*lo, *hi, len(queue), start, count))
+                queue.append(c)
+            else:
+                packed.append((*lo, *hi, -1, start, count))
+        wide.append(tuple(packed))
+    return wide
+
+
+def _wide_entries(children, ox, oy, oz, ix, iy, iz, t_min=0.0):
+    """Slab test of all children of a wide node in one call. Returns
+    (entry distance, child position) pairs for the children the ray hits
+    (and does not leave before t_min)."""
+    entries = []
+    for k, (lx, ly, lz, hx, hy, hz, _, _, _) in enumerate(children):
+        t0, t1 = (lx - ox) * ix, (hx - ox) * ix
+        tmin, tmax = (t0, t1) if t0 < t1 else (t1, t0)
+        t0, t1 = (ly - oy) * iy, (hy - oy) * iy
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > tmin:
+            tmin = t0
+        if t1 < tmax:
+            tmax = t1
+        t0, t1 = (lz - oz) * iz, (hz - oz) * iz
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > tmin:
+            tmin = t0
+        if t1 < tmax:
+            tmax = t1
+        if tmax >= tmin and tmax > t_min:
+            entries.append((tmin, k))
+    return entries
+
+
+def _leaf_size(primitives, start, i, n):
+    """Primitive count of leaf i: up to the next node's start (or the end)."""
+    end = start[i + 1] if i + 1 < n else len(primitives)
+    return end - start[i]
+
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from utils.vector import Vector3D
 from .ray import Ray
 
@@ -24,4 +25,22 @@ class Camera:
         horizontal = 2 * self.half_width * self.right * u
         vertical = 2 * self.half_height * self.up * v
         direction = (self.direction + horizontal + vertical).normalize()
-        return Ray(self.position, direction)
\ No newline at end of file
+        return Ray(self.position, direction, normalize=False)
+
+    def get_rays(self, u, v):
+        """Vectorized get_ray for the packet engine.
+
+        u, v are (N,) NDC coordinate arrays. Returns (origins, directions) as
+        (N, 3) float64 arrays; directions are normalized.
+        """
+        u = np.asarray(u, dtype=np.float64)[:, None]
+        v = np.asarray(v, dtype=np.float64)[:, None]
+        d, r, up = self.direction, self.right, self.up
+        directions = (np.array([d.x, d.y, d.z])
+                      + 2 * self.half_width * np.array([r.x, r.y, r.z]) * u
+                      + 2 * self.half_height * np.array([up.x, up.y, up.z]) * v)
+        directions /= np.linalg.norm(directions, axis=1)[:, None]
+        origins = np.broadcast_to(
+            np.array([self.position.x, self.position.y, self.position.z],
+                     dtype=np.float64), directions.shape).copy()
+        return origins, directions
@@ -0,0 +1,15 @@
+from typing import Any, NamedTuple
+
+
+class HitRecord(NamedTuple):
+    """Result of a closest-hit query, returned by every intersect_full.
+
+    Shading reads everything it needs from the record, so intersection keeps
+    no per-ray state on shared scene objects and a scene can be traced from
+    several threads (or by shadow rays mid-shade) safely.
+    """
+    t: float          # distance along the ray
+    obj: Any          # hit object: provides .material and get_normal_at_intersection
+    prim_id: int = 0  # primitive index inside obj (triangle index for meshes)
+    u: float = 0.0    # barycentric coordinates (triangles only)
+    v: float = 0.0
@@ -0,0 +1,89 @@
+from typing import Union
+
+import numpy as np
+
+from utils.vector import Vector3D
+from utils.matrix import Matrix3D
+from core.ray import Ray
+from core.hit import HitRecord
+
+
+class Instance:
+    """A placement of a shared Mesh: the mesh plus an object-to-world transform.
+
+    The mesh keeps its triangles and BVH in object space and can be shared
+    by any number of instances, so ten thousand copies of a model cost one
+    copy of its arrays and BVH plus a few matrices each. Rays are moved into
+    object space instead of the vertices into world space; the direction is
+    transformed but not normalized, so hit distances stay world distances.
+    The scene BVH built over instances is the top level of the hierarchy and
+    each mesh BVH the bottom level.
+
+    material overrides the mesh's material (instances of one mesh may differ
+    in color).
+    """
+
+    def __init__(self, mesh, transform: Matrix3D = None, material=None, name: str = None):
+        self.mesh = mesh
+        self.material = mesh.material if material is None else material
+        self.name = name or mesh.name
+        self.set_transform(transform if transform is not None else Matrix3D.identity())
+
+    def set_transform(self, transform: Matrix3D):
+        """Move the instance. Refit the scene BVH afterwards (FlatBVH.refit)."""
+        self.transform = transform
+        to_world = transform.to_array()
+        to_object = np.linalg.inv(to_world)
+        # Rows of the world-to-object transform and of the normal matrix
+        # (inverse transpose), as plain floats for the scalar tracing loop
+        self._to_object = tuple(to_object[:3].ravel().tolist())
+        self._normal_matrix = tuple(to_object[:3, :3].T.ravel().tolist())
+
+        lo, hi = self.mesh.get_bounding_box()
+        corners = np.array([(x, y, z, 1.0) for x in (lo.x, hi.x) for y in (lo.y, hi.y)
+                            for z in (lo.z, hi.z)])
+        world = corners @ to_world[:3].T
+        self._bbox = (Vector3D(*world.min(axis=0).tolist(), 1), Vector3D(*world.max(axis=0).tolist(), 1))
+
+    def world_to_object(self) -> np.ndarray:
+        """The (3, 4) world-to-object matrix rows."""
+        return np.array(self._to_object).reshape(3, 4)
+
+    def normal_matrix(self) -> np.ndarray:
+        """The (3, 3) matrix taking object-space normals to world space."""
+        return np.array(self._normal_matrix).reshape(3, 3)
+
+    def _object_ray(self, ray: Ray) -> Ray:
+        a, b, c, d, e, f, g, h, i, j, k, l = self._to_object
+        o, r = ray.origin, ray.direction
+        # Unnormalized, so t_min / t_max carry over as world distances
+        return Ray(Vector3D(a * o.x + b * o.y + c * o.z + d, e * o.x + f * o.y + g * o.z + h,
+                            i * o.x + j * o.y + k * o.z + l, 1),
+                   Vector3D(a * r.x + b * r.y + c * r.z, e * r.x + f * r.y + g * r.z,
+                            i * r.x + j * r.y + k * r.z, 0),
+                   normalize=False, t_min=ray.t_min, t_max=ray.t_max)
+
+    def intersect(self, ray: Ray) -> Union[float, None]:
+        hit = self.intersect_full(ray)
+        return hit.t if hit is not None else None
+
+    def intersect_full(self, ray) -> Union[HitRecord, None]:
+        """The mesh's closest hit with obj=self (prim_id, u and v unchanged)."""
+        hit = self.mesh.intersect_full(self._object_ray(ray))
+        return hit._replace(obj=self) if hit is not None else None
+
+    def occluded(self, ray: Ray, t_max: float) -> bool:
+        return self.mesh.occluded(self._object_ray(ray), t_max)
+
+    def get_normal_at_intersection(self, hit_point: Vector3D, hit: HitRecord) -> Vector3D:
+        """The mesh's shading normal taken to world space by the normal matrix."""
+        n = self.mesh.get_normal_at_intersection(hit_point, hit)
+        a, b, c, d, e, f, g, h, i = self._normal_matrix
+        return Vector3D(a * n.x + b * n.y + c * n.z, d * n.x + e * n.y + f * n.z,
+                        g * n.x + h * n.y + i * n.z, 0).normalize()
+
+    def get_triangle_count(self) -> int:
+        return self.mesh.get_triangle_count()
+
+    def get_bounding_box(self) -> tuple:
+        return self._bbox
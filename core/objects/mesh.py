@@ -1,123 +1,425 @@
+import hashlib
 from typing import List, Union
+
+import numpy as np
+
+import config
 from utils.vector import Vector3D
 from core.ray import Ray
 from core.objects.triangle import Triangle
-from core.bvh import BVHNode
+from core.bvh import FlatBVH, build_flat_arrays
+from core.hit import HitRecord
+
+EPSILON = 1e-8
+# MeshBVH node arrays, in constructor order
+BVH_ARRAYS = ("bounds_min", "bounds_max", "right", "prim_start", "prim_count", "prim_index")
 
 
 class Mesh:
+    """Indexed triangle mesh stored in NumPy arrays.
+
+    Geometry lives in shared arrays instead of one Triangle object per face:
+
+    - vertices: (V, 3) float64 positions, shared between faces
+    - normals: (N, 3) float64 vertex normals (may be empty)
+    - faces: (T, 3) int32 vertex indices per triangle
+    - face_normal_ids: (T, 3) int32 normal indices, -1 for flat-shaded faces
+    - edge1 / edge2 / face_normals: (T, 3) float64, precomputed per face
+
+    A triangle is addressed by its row, which is also its HitRecord.prim_id.
+    Triangles added one at a time with add_triangle are buffered and packed
+    into the arrays on first use.
+    """
+
     def __init__(self, material, name: str = "Mesh"):
-        self.triangles: List[Triangle] = []
         self.material = material
         self.name = name
-        self._bbox_min = None
-        self._bbox_max = None
-        self._bvh = None
-        self._last_hit_triangle = None
+        self._pending = []
+        self._bvh_options = None  # (method, bins, leaf_size) of the last build_bvh
+        self._set_arrays(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int32))
 
     def add_triangle(self, v0: Vector3D, v1: Vector3D, v2: Vector3D,
                      n0: Vector3D = None, n1: Vector3D = None, n2: Vector3D = None):
-        triangle = Triangle(v0, v1, v2, self.material, n0, n1, n2)
-        self.triangles.append(triangle)
-        self._update_bounding_box(v0, v1, v2)
-    
+        smooth = n0 is not None and n1 is not None and n2 is not None
+        self._pending.append(((v0.x, v0.y, v0.z), (v1.x, v1.y, v1.z), (v2.x, v2.y, v2.z),
+                              ((n0.x, n0.y, n0.z), (n1.x, n1.y, n1.z), (n2.x, n2.y, n2.z))
+                              if smooth else None))
+        self._bvh = None
+
     def from_vertices_and_faces(self, vertices: List[Vector3D], faces: List[tuple],
                                 normals: List[Vector3D] = None):
+        """Add faces indexing into a shared vertex list (polygons are fan-triangulated).
+
+        normals, if given, are per-vertex and indexed like vertices.
+        """
+        tris, smooth = [], []
         for face in faces:
-            if len(face) == 3:
-                v0, v1, v2 = vertices[face[0]], vertices[face[1]], vertices[face[2]]
-                
-                if normals and len(normals) > max(face):
-                    n0, n1, n2 = normals[face[0]], normals[face[1]], normals[face[2]]
-                    self.add_triangle(v0, v1, v2, n0, n1, n2)
-                else:
-                    self.add_triangle(v0, v1, v2)
-            else:
-                # For faces with more than 3 vertices, triangulate (simple fan triangulation)
-                v0 = vertices[face[0]]
-                for i in range(1, len(face) - 1):
-                    v1, v2 = vertices[face[i]], vertices[face[i + 1]]
-                    self.add_triangle(v0, v1, v2)
-    
-    def build_bvh(self):
-        """Build the internal triangle BVH. Call after all triangles are added."""
-        if self.triangles:
-            self._bvh = BVHNode.build(self.triangles)
+            for i in range(1, len(face) - 1):
+                tris.append((face[0], face[i], face[i + 1]))
+                smooth.append(len(face) == 3 and bool(normals) and len(normals) > max(face))
+        positions = np.array([(v.x, v.y, v.z) for v in vertices], dtype=np.float64).reshape(-1, 3)
+        tris = np.array(tris, dtype=np.int32).reshape(-1, 3)
+        normal_ids = np.where(np.array(smooth, dtype=bool)[:, None], tris, -1)
+        normal_array = None
+        if normals:
+            normal_array = np.array([(n.x, n.y, n.z) for n in normals], dtype=np.float64)
+        self.add_arrays(positions, tris, normal_array, normal_ids)
+
+    def add_arrays(self, vertices, faces, normals=None, face_normal_ids=None):
+        """Append indexed geometry: (V, 3) vertices, (T, 3) vertex indices and
+        optionally (N, 3) normals with (T, 3) normal indices (-1 = flat face)."""
+        self._flush()
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+        if normals is None or face_normal_ids is None:
+            normals = np.zeros((0, 3))
+            face_normal_ids = np.full(faces.shape, -1, dtype=np.int32)
+        normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+        face_normal_ids = np.asarray(face_normal_ids, dtype=np.int32).reshape(-1, 3)
+
+        v_off, n_off = len(self.vertices), len(self.normals)
+        self._set_arrays(
+            np.concatenate((self.vertices, vertices)),
+            np.concatenate((self.faces, faces + v_off)),
+            np.concatenate((self.normals, normals)),
+            np.concatenate((self.face_normal_ids,
+                            np.where(face_normal_ids >= 0, face_normal_ids + n_off, -1))))
+
+    def _flush(self):
+        """Pack triangles buffered by add_triangle into the arrays."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        smooth = [p[3] is not None for p in pending]
+        vertices = np.array([p[:3] for p in pending], dtype=np.float64).reshape(-1, 3)
+        faces = np.arange(len(vertices), dtype=np.int32).reshape(-1, 3)
+        normals = np.array([p[3] if p[3] is not None else ((0.0,) * 3,) * 3 for p in pending],
+                           dtype=np.float64).reshape(-1, 3)
+        normal_ids = np.where(np.array(smooth)[:, None], faces, -1)
+        self.add_arrays(vertices, faces, normals, normal_ids)
+
+    def _set_arrays(self, vertices, faces, normals=None, face_normal_ids=None):
+        self.vertices = vertices
+        self.faces = faces
+        self.normals = normals if normals is not None else np.zeros((0, 3))
+        self.face_normal_ids = (face_normal_ids if face_normal_ids is not None
+                                else np.full(faces.shape, -1, dtype=np.int32))
+
+        v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+        self.edge1 = v1 - v0
+        self.edge2 = v2 - v0
+        self.face_normals = _normalize_rows(_cross_rows(self.edge1, self.edge2))
+
+        self._bbox = None
+        if len(faces):
+            self._bbox = (np.minimum(np.minimum(v0, v1), v2).min(axis=0),
+                          np.maximum(np.maximum(v0, v1), v2).max(axis=0))
+        self._bvh = None
+        self._tri_data = None
+        self._hash = None
+
+    def content_hash(self) -> str:
+        """Hex digest of the geometry and BVH arrays (not the material).
+
+        Meshes with equal hashes trace identically, so render workers can
+        keep one resident copy per hash across scene updates.
+        """
+        if self._hash is None:
+            h = hashlib.sha1()
+            for a in self.arrays().values():
+                a = np.ascontiguousarray(a)
+                h.update(f"{a.dtype.str}{a.shape}".encode())
+                h.update(a.tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
+
+    def arrays(self) -> dict:
+        """The geometry arrays, plus the BVH's node arrays when it is built.
+
+        Mesh.from_arrays rebuilds an identical mesh from them without
+        rebuilding the BVH (see utils/mesh_cache.py).
+        """
+        self._flush()
+        arrays = {"vertices": self.vertices, "faces": self.faces, "normals": self.normals,
+                  "face_normal_ids": self.face_normal_ids}
+        if self._bvh is not None:
+            arrays.update({name: getattr(self._bvh, name) for name in BVH_ARRAYS})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, material, arrays: dict, name: str = "Mesh") -> 'Mesh':
+        """A mesh over arrays as returned by Mesh.arrays (used as they are,
+        so they may be read-only memory maps)."""
+        mesh = cls(material, name)
+        mesh._set_arrays(arrays["vertices"], arrays["faces"], arrays["normals"],
+                         arrays["face_normal_ids"])
+        if BVH_ARRAYS[0] in arrays:
+            mesh._bvh = MeshBVH(mesh, *(arrays[key] for key in BVH_ARRAYS))
+        return mesh
+
+    def with_material(self, material, name: str = None) -> 'Mesh':
+        """A mesh sharing this one's arrays, BVH and caches, with another material."""
+        self._flush()
+        mesh = Mesh.__new__(Mesh)
+        mesh.__dict__.update(self.__dict__)
+        mesh._pending = list(self._pending)  # add_triangle on the copy must not touch this mesh
+        mesh.material = material
+        mesh.name = name or self.name
+        if self._bvh is not None:
+            mesh._bvh = MeshBVH.__new__(MeshBVH)
+            mesh._bvh.__dict__.update(self._bvh.__dict__)
+            mesh._bvh.mesh = mesh
+        return mesh
+
+    def __getstate__(self):
+        self._flush()
+        state = self.__dict__.copy()
+        state["_tri_data"] = None
+        return state
+
+    @property
+    def triangles(self) -> List[Triangle]:
+        """The faces as standalone Triangle objects.
+
+        Built on every access for inspection and tests; tracing reads the
+        arrays directly.
+        """
+        self._flush()
+        result = []
+        for k in range(len(self.faces)):
+            corners = [Vector3D(*self.vertices[i].tolist(), 1) for i in self.faces[k]]
+            normals = [None] * 3
+            if self.face_normal_ids[k, 0] >= 0:
+                normals = [Vector3D(*self.normals[i].tolist(), 0) for i in self.face_normal_ids[k]]
+            triangle = Triangle(*corners, self.material, *normals)
+            triangle.prim_id = k
+            result.append(triangle)
+        return result
+
+    def build_bvh(self, method=None, bins=None, leaf_size=None, workers=None):
+        """Build the internal triangle BVH. Call after all triangles are added.
+
+        Builder options are those of BVHNode.build (config defaults if unset,
+        with config.MESH_LEAF_SIZE triangles per leaf); method="lbvh" builds
+        meshes of millions of triangles in near-linear time. Large median /
+        SAH builds use workers processes (see build_flat_arrays). The BVH
+        indexes triangle rows, so no per-triangle objects are made. A single
+        triangle is tested directly without a BVH. The options are kept for
+        rebuilds after set_vertices.
+        """
+        self._flush()
+        self._bvh_options = (method or config.BVH_METHOD, bins or config.BVH_BINS,
+                             leaf_size or config.MESH_LEAF_SIZE)
+        if len(self.faces) > 1:
+            corners = self.vertices[self.faces]
+            arrays = build_flat_arrays(corners.min(axis=1), corners.max(axis=1),
+                                       *self._bvh_options, workers)
+            self._bvh = MeshBVH(self, *arrays)
+            self._hash = None
+
+    def set_vertices(self, vertices, normals=None) -> bool:
+        """Move the vertices (same count and order) for animation or edits.
+
+        Faces are kept, so the BVH is refitted to the new positions instead
+        of rebuilt, unless the refit degrades it past
+        config.BVH_REBUILD_RATIO (see FlatBVH.refit); a rebuild uses the
+        options of the last build_bvh (config defaults for meshes loaded
+        with their BVH). normals, if given, replace the vertex normals (same
+        count). Returns True if the BVH was rebuilt.
+        """
+        self._flush()
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(self.vertices.shape)
+        if normals is not None:
+            normals = np.asarray(normals, dtype=np.float64).reshape(self.normals.shape)
+        bvh = self._bvh
+        self._set_arrays(vertices, self.faces, self.normals if normals is None else normals,
+                         self.face_normal_ids)
+        if bvh is None:
+            return False
+        self._bvh = bvh
+        bvh.refit()
+        if bvh.needs_rebuild():
+            self.build_bvh(*(self._bvh_options or ()))
+            return True
+        return False
+
+    def _triangle_data(self):
+        """Per-triangle (v0, edge1, edge2) tuples used by the scalar tests,
+        built lazily in each process (never pickled)."""
+        if self._tri_data is None:
+            self._flush()
+            v0 = self.vertices[self.faces[:, 0]]
+            self._tri_data = list(zip(map(tuple, v0.tolist()),
+                                      map(tuple, self.edge1.tolist()),
+                                      map(tuple, self.edge2.tolist())))
+        return self._tri_data
 
     def intersect(self, ray: Ray) -> Union[float, None]:
-        if not self.triangles:
-            return None
+        hit = self.intersect_full(ray)
+        return hit.t if hit is not None else None
+
+    def occluded(self, ray: Ray, t_max: float) -> bool:
+        """True if any triangle is hit closer than t_max (any-hit shadow query)."""
+        if self._pending:
+            self._flush()
+        if self._bvh is not None:
+            return self._bvh.occluded(ray, t_max)
+        return _occluded_triangles(self._triangle_data(), 0, len(self.faces), ray, t_max)
 
+    def intersect_full(self, ray) -> Union[HitRecord, None]:
+        """Closest hit as a HitRecord for this mesh (obj=self, prim_id=triangle
+        index, u/v=barycentrics), or None on miss."""
+        if self._pending:
+            self._flush()
         if self._bvh is not None:
-            # Both BVHNode and a bare single Triangle implement intersect_full.
-            t, tri = self._bvh.intersect_full(ray)
-        else:
-            # BVH not built — safety-net linear scan
-            t, tri = self._linear_intersect(ray)
-
-        if tri is not None:
-            self._last_hit_triangle = tri
-        return t
-
-    def _linear_intersect(self, ray):
-        """Fallback linear scan. Returns (closest_t, closest_triangle)."""
-        closest_t = None
-        closest_triangle = None
-        for triangle in self.triangles:
-            t = triangle.intersect(ray)
-            if t is not None and (closest_t is None or t < closest_t):
-                closest_t = t
-                closest_triangle = triangle
-        return closest_t, closest_triangle
-
-    def intersect_full(self, ray):
-        """Used by the scene-level BVH. Delegates to the BVH-aware intersect
-        and returns (t, self) so the ray tracer reads the normal via
-        self.get_normal_at_intersection (backed by _last_hit_triangle)."""
-        t = self.intersect(ray)
-        if t is None:
-            return None, None
-        return t, self
-
-    def get_normal_at_intersection(self, hit_point: Vector3D) -> Vector3D:
-        if self._last_hit_triangle is not None:
-            return self._last_hit_triangle.get_normal_at_intersection(hit_point)
-        return Vector3D(0, 1, 0, 0)  # Default up vector
-    
-    def _update_bounding_box(self, v0: Vector3D, v1: Vector3D, v2: Vector3D):
-        vertices = [v0, v1, v2]
-        
-        if self._bbox_min is None:
-            self._bbox_min = Vector3D(
-                min(v.x for v in vertices),
-                min(v.y for v in vertices),
-                min(v.z for v in vertices),
-                1
-            )
-            self._bbox_max = Vector3D(
-                max(v.x for v in vertices),
-                max(v.y for v in vertices),
-                max(v.z for v in vertices),
-                1
-            )
-        else:
-            self._bbox_min = Vector3D(
-                min(self._bbox_min.x, min(v.x for v in vertices)),
-                min(self._bbox_min.y, min(v.y for v in vertices)),
-                min(self._bbox_min.z, min(v.z for v in vertices)),
-                1
-            )
-            self._bbox_max = Vector3D(
-                max(self._bbox_max.x, max(v.x for v in vertices)),
-                max(self._bbox_max.y, max(v.y for v in vertices)),
-                max(self._bbox_max.z, max(v.z for v in vertices)),
-                1
-            )
-    
+            return self._bvh.intersect_full(ray)
+        # No BVH (single triangle or not built yet) — linear scan
+        hit = _intersect_triangles(self._triangle_data(), 0, len(self.faces), ray)
+        if hit is None:
+            return None
+        t, row, u, v = hit
+        return HitRecord(t, self, row, u, v)
+
+    def get_normal_at_intersection(self, hit_point: Vector3D, hit: HitRecord) -> Vector3D:
+        """Shading normal of triangle hit.prim_id: the interpolated vertex
+        normal for smooth faces, else the face normal."""
+        k = hit.prim_id
+        ids = self.face_normal_ids[k]
+        if ids[0] < 0:
+            return Vector3D(*self.face_normals[k].tolist(), 0)
+        (ax, ay, az), (bx, by, bz), (cx, cy, cz) = self.normals[ids].tolist()
+        u, v = hit.u, hit.v
+        w = 1.0 - u - v
+        normal = Vector3D(ax * w + bx * u + cx * v, ay * w + by * u + cy * v,
+                          az * w + bz * u + cz * v, 0)
+        return normal.normalize()
+
     def get_triangle_count(self) -> int:
-        return len(self.triangles)
-    
+        return len(self.faces) + len(self._pending)
+
     def get_bounding_box(self) -> tuple:
-        if self._bbox_min is None or self._bbox_max is None:
+        self._flush()
+        if self._bbox is None:
             raise ValueError(f"Mesh '{self.name}' has no triangles — cannot compute bounding box")
-        return (self._bbox_min, self._bbox_max)
\ No newline at end of file
+        return (Vector3D(*self._bbox[0].tolist(), 1), Vector3D(*self._bbox[1].tolist(), 1))
+
+
+class MeshBVH(FlatBVH):
+    """FlatBVH whose leaf slots name triangle rows of a Mesh.
+
+    primitives is unused; leaves look triangles up through prim_index. The
+    triangle data is copied into slot order when the traversal view is
+    built, so a leaf of any size (config.MESH_LEAF_SIZE) is one contiguous
+    run, tested in a single call.
+    """
+
+    def __init__(self, mesh, bounds_min, bounds_max, right, prim_start, prim_count, prim_index):
+        super().__init__(bounds_min, bounds_max, right, prim_start, prim_count, None, prim_index)
+        self.mesh = mesh
+        self._slots = None
+        self._tris = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_slots"] = None
+        state["_tris"] = None
+        return state
+
+    def _prepare(self):
+        # Leaf views before super()._prepare(), which publishes _nodes last
+        slots = self.prim_index.tolist()
+        data = self.mesh._triangle_data()
+        self._tris = [data[k] for k in slots]
+        self._slots = slots
+        super()._prepare()
+
+    def _slot_bounds(self):
+        mesh = self.mesh
+        corners = mesh.vertices[mesh.faces[self.prim_index]]
+        return corners.min(axis=1), corners.max(axis=1)
+
+    def _leaf_intersect(self, ray, start, count):
+        hit = _intersect_triangles(self._tris, start, count, ray)
+        if hit is None:
+            return None
+        t, slot, u, v = hit
+        return HitRecord(t, self.mesh, self._slots[slot], u, v)
+
+    def _leaf_occluded(self, ray, start, count, t_max):
+        return _occluded_triangles(self._tris, start, count, ray, t_max)
+
+
+def _intersect_triangles(tris, start, count, ray):
+    """Closest hit among (v0, edge1, edge2) tuples tris[start:start + count]
+    within (ray.t_min, ray.t_max), as (t, index into tris, u, v), or None.
+
+    Möller–Trumbore with the same arithmetic as Triangle._moller_trumbore,
+    inlined into one loop over the run so a leaf costs one call however
+    many triangles it holds.
+    """
+    config.trace_stats["primitive_tests"] += count
+    o, d = ray.origin, ray.direction
+    ox, oy, oz, dx, dy, dz = o.x, o.y, o.z, d.x, d.y, d.z
+    t_near = max(EPSILON, ray.t_min)
+    best = None
+    best_t = ray.t_max
+    for k in range(start, start + count):
+        (v0x, v0y, v0z), (e1x, e1y, e1z), (e2x, e2y, e2z) = tris[k]
+        px, py, pz = dy * e2z - dz * e2y, dz * e2x - dx * e2z, dx * e2y - dy * e2x
+        det = e1x * px + e1y * py + e1z * pz
+        if abs(det) < EPSILON:
+            continue
+        inv_det = 1.0 / det
+        tx, ty, tz = ox - v0x, oy - v0y, oz - v0z
+        u = (tx * px + ty * py + tz * pz) * inv_det
+        if u < 0.0 or u > 1.0:
+            continue
+        qx, qy, qz = ty * e1z - tz * e1y, tz * e1x - tx * e1z, tx * e1y - ty * e1x
+        v = (dx * qx + dy * qy + dz * qz) * inv_det
+        if v < 0.0 or u + v > 1.0:
+            continue
+        t = (e2x * qx + e2y * qy + e2z * qz) * inv_det
+        if t_near < t < best_t:
+            best, best_t = (t, k, u, v), t
+    return best
+
+
+def _occluded_triangles(tris, start, count, ray, t_max):
+    """True if any of tris[start:start + count] is hit closer than t_max."""
+    o, d = ray.origin, ray.direction
+    ox, oy, oz, dx, dy, dz = o.x, o.y, o.z, d.x, d.y, d.z
+    t_near = max(EPSILON, ray.t_min)
+    for k in range(start, start + count):
+        (v0x, v0y, v0z), (e1x, e1y, e1z), (e2x, e2y, e2z) = tris[k]
+        px, py, pz = dy * e2z - dz * e2y, dz * e2x - dx * e2z, dx * e2y - dy * e2x
+        det = e1x * px + e1y * py + e1z * pz
+        if abs(det) < EPSILON:
+            continue
+        inv_det = 1.0 / det
+        tx, ty, tz = ox - v0x, oy - v0y, oz - v0z
+        u = (tx * px + ty * py + tz * pz) * inv_det
+        if u < 0.0 or u > 1.0:
+            continue
+        qx, qy, qz = ty * e1z - tz * e1y, tz * e1x - tx * e1z, tx * e1y - ty * e1x
+        v = (dx * qx + dy * qy + dz * qz) * inv_det
+        if v < 0.0 or u + v > 1.0:
+            continue
+        t = (e2x * qx + e2y * qy + e2z * qz) * inv_det
+        if t_near < t < t_max:
+            config.trace_stats["primitive_tests"] += k - start + 1
+            return True
+    config.trace_stats["primitive_tests"] += count
+    return False
+
+
+def _cross_rows(a, b):
+    return np.stack((a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+                     a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+                     a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]), axis=1).reshape(-1, 3)
+
+
+def _normalize_rows(a):
+    """Row-wise Vector3D.normalize: multiply by 1/length, zero rows unchanged."""
+    length = np.sqrt(a[:, 0] ** 2 + a[:, 1] ** 2 + a[:, 2] ** 2)
+    safe = np.where(length > 0, length, 1.0)
+    return a * np.where(length > 0, 1.0 / safe, 1.0)[:, None]
@@ -1,6 +1,8 @@
 from typing import Union
+import config
 from utils.vector import Vector3D
 from core.ray import Ray
+from core.hit import HitRecord
 
 class Plane:
     def __init__(self, point: Vector3D, normal: Vector3D, material):
@@ -9,6 +11,7 @@ class Plane:
         self.material = material
     
     def intersect(self, ray: Ray) -> Union[float, None]:
+        config.trace_stats["primitive_tests"] += 1
         denom = self.normal.dot(ray.direction)
         
         # if ray is parallel to the plane, no intersection
@@ -20,12 +23,20 @@ class Plane:
         # intersection distance
         t = p0l0.dot(self.normal) / denom
         
-        # if t is negative, the plane is behind the ray
-        if t < 0:
+        # if t is negative (or before ray.t_min), the plane is behind the ray
+        if t < ray.t_min:
             return None
             
         return t
 
     def intersect_full(self, ray):
         t = self.intersect(ray)
-        return (t, self) if t is not None else (None, None)
\ No newline at end of file
+        return HitRecord(t, self) if t is not None else None
+
+    def get_normal_at_intersection(self, hit_point: Vector3D = None, hit: HitRecord = None) -> Vector3D:
+        return self.normal
+
+    def occluded(self, ray, t_max):
+        """True if the plane is hit closer than t_max (shadow-ray query)."""
+        t = self.intersect(ray)
+        return t is not None and t < t_max
@@ -1,6 +1,8 @@
 from typing import Union
+import config
 from utils.vector import Vector3D
 from core.ray import Ray
+from core.hit import HitRecord
 
 class Sphere:
     def __init__(self, center: Vector3D, radius: float, material):
@@ -9,6 +11,7 @@ class Sphere:
         self.material = material
 
     def intersect(self, ray: Ray) -> Union[float, None]:
+        config.trace_stats["primitive_tests"] += 1
         l = self.center - ray.origin
         tc = l.dot(ray.direction)
         if tc < 0:
@@ -19,11 +22,21 @@ class Sphere:
         thc = (self.radius * self.radius - d2) ** 0.5
         t1 = tc - thc
         t2 = tc + thc
-        return t1 if t1 > 0 else t2
+        if t1 > ray.t_min:
+            return t1
+        return t2 if t2 >= ray.t_min else None
 
     def intersect_full(self, ray):
         t = self.intersect(ray)
-        return (t, self) if t is not None else (None, None)
+        return HitRecord(t, self) if t is not None else None
+
+    def get_normal_at_intersection(self, hit_point: Vector3D, hit: HitRecord = None) -> Vector3D:
+        return (hit_point - self.center).normalize()
+
+    def occluded(self, ray, t_max):
+        """True if the sphere is hit closer than t_max (shadow-ray query)."""
+        t = self.intersect(ray)
+        return t is not None and t < t_max
 
     def get_bounding_box(self):
         offset = Vector3D(self.radius, self.radius, self.radius, 0)
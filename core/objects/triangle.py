@@ -1,6 +1,8 @@
 from typing import Union, Tuple
+import config
 from utils.vector import Vector3D
 from core.ray import Ray
+from core.hit import HitRecord
 
 
 class Triangle:
@@ -24,9 +26,14 @@ class Triangle:
         self.n2 = n2 if n2 else self.face_normal
         
         self.use_smooth_shading = (n0 is not None and n1 is not None and n2 is not None)
+
+        # Index inside the owning mesh, reported as HitRecord.prim_id
+        self.prim_id = 0
     
-    def intersect(self, ray: Ray) -> Union[float, None]:
+    def _moller_trumbore(self, ray: Ray) -> Union[Tuple[float, float, float], None]:
+        """Möller–Trumbore test. Returns (t, u, v) for a hit, or None."""
         EPSILON = 1e-8
+        config.trace_stats["primitive_tests"] += 1
         
         # Calculate determinant
         pvec = ray.direction.cross(self.edge2)
@@ -57,21 +64,26 @@ class Triangle:
         # Calculate t (distance along ray)
         t = self.edge2.dot(qvec) * inv_det
         
-        if t > EPSILON:
-            # Store barycentric coordinates for normal interpolation
-            self._last_u = u
-            self._last_v = v
-            return t
+        if t > EPSILON and t > ray.t_min:
+            return t, u, v
         
         return None
+
+    def intersect(self, ray: Ray) -> Union[float, None]:
+        hit = self._moller_trumbore(ray)
+        return hit[0] if hit is not None else None
+
+    def occluded(self, ray: Ray, t_max: float) -> bool:
+        """True if the triangle is hit closer than t_max."""
+        hit = self._moller_trumbore(ray)
+        return hit is not None and hit[0] < t_max
     
-    def get_normal_at_intersection(self, hit_point: Vector3D = None) -> Vector3D:
-        if not self.use_smooth_shading:
+    def get_normal_at_intersection(self, hit_point: Vector3D = None, hit: HitRecord = None) -> Vector3D:
+        if not self.use_smooth_shading or hit is None:
             return self.face_normal
         
-        # Interpolate vertex normals using barycentric coordinates
-        u = getattr(self, '_last_u', 0)
-        v = getattr(self, '_last_v', 0)
+        # Interpolate vertex normals using the hit's barycentric coordinates
+        u, v = hit.u, hit.v
         w = 1.0 - u - v
         
         # Barycentric interpolation
@@ -85,11 +97,12 @@ class Triangle:
         return self.edge1.cross(self.edge2).length() * 0.5
 
     def intersect_full(self, ray):
-        """Return (t, self) for a hit, or (None, None) on miss."""
-        t = self.intersect(ray)
-        if t is not None:
-            return t, self
-        return None, None
+        """Return a HitRecord (with barycentrics) for a hit, or None on miss."""
+        hit = self._moller_trumbore(ray)
+        if hit is None:
+            return None
+        t, u, v = hit
+        return HitRecord(t, self, self.prim_id, u, v)
 
     def get_bounding_box(self):
         xs = (self.v0.x, self.v1.x, self.v2.x)
@@ -1,4 +1,30 @@
+import math
+
+
 class Ray:
-    def __init__(self, origin, direction):
+    """A ray plus the per-ray data BVH traversal needs, computed once.
+
+    direction is normalized unless normalize=False: for callers whose
+    direction is already unit length (Camera.get_ray, shadow rays) or must
+    keep its scale (object-space rays of an Instance).
+
+    - inv_dir: per-axis 1/d; zero components map to a huge finite value so
+      the slab test degenerates to an inside/outside check instead of
+      producing NaNs
+    - sign: per axis, 1 where the direction is negative; a box's near
+      corner along that axis is (min, max)[sign], its far corner the other
+    - t_min / t_max: the distances a query accepts. Closest-hit traversal
+      narrows t_max to each hit it finds, so the nodes and nested objects
+      (instances, mesh leaves) it visits afterwards are culled against it,
+      and puts it back before returning.
+    """
+
+    def __init__(self, origin, direction, normalize=True, t_min=0.0, t_max=math.inf):
         self.origin = origin
-        self.direction = direction.normalize()
\ No newline at end of file
+        self.direction = direction.normalize() if normalize else direction
+        dx, dy, dz = self.direction.x, self.direction.y, self.direction.z
+        self.inv_dir = (1.0 / dx if dx != 0.0 else 1e300, 1.0 / dy if dy != 0.0 else 1e300,
+                        1.0 / dz if dz != 0.0 else 1e300)
+        self.sign = (int(dx < 0.0), int(dy < 0.0), int(dz < 0.0))
+        self.t_min = t_min
+        self.t_max = t_max
@@ -0,0 +1,115 @@
+"""Adaptive anti-aliasing.
+
+Fixed AA traces config.AA_SAMPLES² grid samples for every pixel. With
+config.ADAPTIVE_AA a tile is sampled in up to three rounds instead:
+
+1. one sample at every pixel center, plus a one-pixel border so pixels on
+   the tile edge can be compared with all of their neighbors. The border
+   pixels belong to neighboring tiles, which trace them again: they are
+   reported as a separate overhead, not as samples of this tile
+2. pixels whose center color differs from a 4-neighbor's by more than
+   config.ADAPTIVE_CONTRAST in any channel, or whose primary ray hit a
+   different object than a neighbor's, get the four corner samples of
+   the AA grid
+3. pixels whose samples so far have a standard deviation above
+   config.ADAPTIVE_VARIANCE in any channel get the rest of the grid
+
+A pixel that ends up with the whole grid is its mean, exactly like fixed
+AA; the others average the samples they took.
+"""
+import numpy as np
+
+import config
+from renderer.progressive import sample_offsets
+
+
+def sample_rounds(aa):
+    """Grid offsets of rounds 2 and 3 for an aa x aa grid: (corners, rest).
+
+    For odd aa the pixel center is itself a grid sample, so it is in
+    neither list.
+    """
+    grid = sample_offsets(aa)
+    corners = [sx * aa + sy for sx in (0, aa - 1) for sy in (0, aa - 1)]
+    taken = set(corners)
+    if aa % 2:
+        taken.add((aa // 2) * aa + aa // 2)
+    rest = [i for i in range(aa * aa) if i not in taken]
+    return grid[sorted(set(corners))], grid[rest]
+
+
+def edge_pixels(colors, ids, contrast):
+    """Mask of the pixels that differ from a 4-neighbor.
+
+    colors (H + 2, W + 2, 3) and ids (H + 2, W + 2) include a one-pixel
+    border; the mask covers the (H, W) interior.
+    """
+    inner = colors[1:-1, 1:-1]
+    inner_ids = ids[1:-1, 1:-1]
+    mask = np.zeros(inner_ids.shape, dtype=bool)
+    for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nc = colors[1 + dy:colors.shape[0] - 1 + dy, 1 + dx:colors.shape[1] - 1 + dx]
+        nid = ids[1 + dy:ids.shape[0] - 1 + dy, 1 + dx:ids.shape[1] - 1 + dx]
+        mask |= (np.abs(inner - nc).max(axis=2) > contrast) | (inner_ids != nid)
+    return mask
+
+
+def render_tile(tile, width, height, trace, aa=None):
+    """Adaptively sample tile = (x0, y0, x1, y1) of a width x height frame.
+
+    trace(xs, ys, ox, oy, object_ids) returns the (N, 3) colors of single
+    samples at pixels (xs, ys) + sub-pixel offsets (ox, oy), plus the
+    primary hit object ids (-1 for misses) when object_ids is True.
+
+    Returns (pixels, samples, border): the (y1 - y0, x1 - x0, 3) uint8
+    pixels, the number of primary samples traced for them and the number
+    of round-1 samples traced on the border around the tile.
+    """
+    aa = aa or config.AA_SAMPLES
+    x0, y0, x1, y1 = tile
+    th, tw = y1 - y0, x1 - x0
+
+    # Round 1: pixel centers of the tile and the border pixels in the frame
+    bx0, by0, bx1, by1 = max(0, x0 - 1), max(0, y0 - 1), min(width, x1 + 1), min(height, y1 + 1)
+    ys, xs = np.mgrid[by0:by1, bx0:bx1]
+    half = np.full(xs.size, 0.5)
+    colors, ids = trace(xs.ravel(), ys.ravel(), half, half, True)
+    samples, border = th * tw, xs.size - th * tw
+    # Border pixels outside the frame repeat the edge (no contrast there)
+    pad = ((1 - (y0 - by0), 1 - (by1 - y1)), (1 - (x0 - bx0), 1 - (bx1 - x1)))
+    colors = np.pad(colors.reshape(by1 - by0, bx1 - bx0, 3), pad + ((0, 0),), mode="edge")
+    ids = np.pad(ids.reshape(by1 - by0, bx1 - bx0), pad, mode="edge")
+
+    center = colors[1:-1, 1:-1]
+    total = center.copy()
+    count = np.ones((th, tw))
+    complete = np.zeros((th, tw), dtype=bool)
+    if aa == 1:
+        return center.astype(np.uint8), samples, border
+
+    corners, rest = sample_rounds(aa)
+    todo = edge_pixels(colors, ids, config.ADAPTIVE_CONTRAST)
+    for round_offsets, last in ((corners, not len(rest)), (rest, True)):
+        py, px = np.nonzero(todo)
+        if py.size == 0:
+            break
+        k = len(round_offsets)
+        round_colors = trace(np.repeat(px + x0, k), np.repeat(py + y0, k),
+                             np.tile(round_offsets[:, 0], py.size),
+                             np.tile(round_offsets[:, 1], py.size), False).reshape(py.size, k, 3)
+        samples += py.size * k
+        total[py, px] += round_colors.sum(axis=1)
+        count[py, px] += k
+        if last:
+            complete[py, px] = True
+            break
+        # Round 3 only where the center and corner samples disagree
+        spread = np.concatenate([center[py, px][:, None], round_colors], axis=1).std(axis=1)
+        todo = np.zeros_like(todo)
+        todo[py, px] = spread.max(axis=1) > config.ADAPTIVE_VARIANCE
+
+    pixels = total / count[..., None]
+    if aa % 2 == 0:
+        # The center is not a grid sample: full-grid pixels leave it out
+        pixels[complete] = (total[complete] - center[complete]) / (aa * aa)
+    return pixels.astype(np.uint8), samples, border
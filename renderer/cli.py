@@ -0,0 +1,163 @@
+"""Headless command-line renderer.
+
+    python -m renderer.cli scene.yaml -o out.png --engine packet --workers 4
+
+A scene file (JSON, or YAML when PyYAML is installed) holds the same object
+and light spec dicts that renderer/ui/scene_builder.build_scene takes:
+
+    {
+      "width": 400, "height": 300,
+      "camera": {"position": [0, 3, 8], "look_at": [0, 1, 0]},
+      "render": {"engine": "packet", "workers": 4, "aa": 2, "adaptive": true},
+      "objects": [{"type": "sphere", "position": [0, 1, 0], "radius": 1,
+                   "material": {"diffuse": [0.8, 0.2, 0.2], "reflectivity": 0.3}}],
+      "lights": [{"position": [3, 5, 2], "color": [1, 1, 1], "intensity": 1.0}]
+    }
+
+Materials may be partial: missing fields come from scene_builder.make_material.
+Relative OBJ paths are resolved against the scene file. Command-line options
+override the file. Writes the PNG plus a JSON file with timings and stats.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from PIL import Image
+
+import config
+from renderer import heatmap
+from renderer.headless import ENGINES, render_image
+from renderer.tiles import ORDERS
+from renderer.ui.scene_builder import build_scene, make_material
+
+
+def load_scene_file(path):
+    """Parse a JSON or YAML scene file into a dict."""
+    with open(path, "r") as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("PyYAML is required for YAML scene files (pip install pyyaml)")
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def resolve_specs(scene, base_dir):
+    """Object specs with full materials and OBJ paths relative to base_dir."""
+    specs = []
+    for spec in scene.get("objects", []):
+        spec = dict(spec)
+        material = dict(spec.get("material", {}))
+        full = make_material(tuple(material.pop("diffuse", (0.8, 0.8, 0.8))),
+                             material.pop("reflectivity", 0.0))
+        full.update(material)
+        spec["material"] = full
+        if spec["type"] == "obj":
+            spec["path"] = os.path.join(base_dir, spec["path"])
+        specs.append(spec)
+    return specs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render a scene file without the GUI.")
+    parser.add_argument("scene", help="scene file (.json, .yaml or .yml)")
+    parser.add_argument("-o", "--output", default="output.png", help="PNG to write")
+    parser.add_argument("--stats", help="stats JSON to write (default: <output>.json)")
+    parser.add_argument("--engine", choices=ENGINES)
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--aa", type=int, help="anti-aliasing grid size (aa x aa samples)")
+    parser.add_argument("--adaptive", action=argparse.BooleanOptionalAction,
+                        help="adaptive anti-aliasing (up to aa x aa samples where needed); "
+                             "--no-adaptive overrides the scene file")
+    parser.add_argument("--bvh", choices=("median", "sah", "lbvh"), help="BVH builder")
+    parser.add_argument("--tile-size", type=int)
+    parser.add_argument("--tile-order", choices=ORDERS)
+    parser.add_argument("--heatmap", action="store_true",
+                        help="also write per-pixel BVH cost heatmaps (<output>_nodes.png, "
+                             "_prims.png, _time.png)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    t_start = time.time()
+    scene = load_scene_file(args.scene)
+    settings = dict(scene.get("render", {}))
+
+    def option(name, default):
+        value = getattr(args, name)
+        return value if value is not None else settings.get(name, default)
+
+    width = option("width", scene.get("width", 400))
+    height = option("height", scene.get("height", 300))
+    engine = option("engine", "scalar")
+    workers = option("workers", multiprocessing.cpu_count())
+    config.AA_SAMPLES = option("aa", config.AA_SAMPLES)
+    config.ADAPTIVE_AA = bool(option("adaptive", config.ADAPTIVE_AA))
+    config.BVH_METHOD = option("bvh", config.BVH_METHOD)
+    tile_size = option("tile_size", config.TILE_SIZE)
+    tile_order = option("tile_order", config.TILE_ORDER)
+
+    camera_spec = scene.get("camera", {})
+    camera, objects, lights = build_scene(
+        width, height, resolve_specs(scene, os.path.dirname(os.path.abspath(args.scene))),
+        scene.get("lights", []),
+        tuple(camera_spec.get("position", (0, 3, 8))), tuple(camera_spec.get("look_at", (0, 1, 0))))
+    t_loaded = time.time()
+
+    counters = {}
+    cost_maps = {} if args.heatmap else None
+    img = render_image(width, height, camera, objects, lights, engine, workers,
+                       tile_size, tile_order, counters, cost_maps)
+    t_rendered = time.time()
+    Image.fromarray(img).save(args.output)
+
+    render_time = t_rendered - t_loaded
+    pixels = width * height
+    stats = {
+        "scene": args.scene,
+        "output": args.output,
+        "engine": engine,
+        "workers": workers,
+        "width": width,
+        "height": height,
+        "aa_samples": config.AA_SAMPLES,
+        "adaptive_aa": config.ADAPTIVE_AA,
+        "bvh_method": config.BVH_METHOD,
+        "tile_size": tile_size,
+        "tile_order": tile_order,
+        "objects": len(scene.get("objects", [])),
+        "lights": len(lights),
+        "load_time": t_loaded - t_start,
+        "render_time": render_time,
+        "total_time": time.time() - t_start,
+        "pixels": pixels,
+        "pixels_per_second": pixels / render_time if render_time > 0 else None,
+        "samples": counters["samples"],
+        "samples_per_pixel": counters["samples"] / pixels,
+        # Adaptive AA: tile-border pixels traced again by neighboring tiles
+        "border_samples": counters["border_samples"],
+        "ray_count": sum(counters[key] for key in config.RAY_COUNTERS),
+        # Per-kind ray counts and BVH work, summed over the tiles
+        **{key: counters[key] for key in config.TRACE_COUNTERS},
+    }
+    if cost_maps is not None:
+        stats["heatmaps"] = heatmap.save_heatmaps(cost_maps, args.output)
+        stats["pixel_costs"] = heatmap.summary(cost_maps)
+    stats_path = args.stats or os.path.splitext(args.output)[0] + ".json"
+    with open(stats_path, "w") as f:
+        json.dump(stats, f, indent=2)
+    print(f"Rendered {args.output} ({width}x{height}, {engine}, {workers} workers) "
+          f"in {render_time:.2f} seconds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
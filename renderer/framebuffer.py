@@ -0,0 +1,70 @@
+"""Frame buffer in multiprocessing shared memory.
+
+Render workers attach to the buffer by name and write their tiles straight
+into it, so finished pixels are never pickled back to the parent; the parent
+only learns which rectangle became dirty.
+"""
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+class SharedFramebuffer:
+    """A (height, width, 3) uint8 image backed by a SharedMemory block.
+
+    The creating process owns the block and must call release() once nothing
+    reads the array any more. Pickling sends only the block name; unpickling
+    (e.g. in a pool initializer) attaches to the same memory.
+    """
+
+    def __init__(self, width, height, name=None):
+        self.width = width
+        self.height = height
+        self.owner = name is None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, width * height * 3))
+        else:
+            self._shm = _attach(name)
+        self.array = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._shm.buf)
+        if self.owner:
+            self.array.fill(0)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        return (SharedFramebuffer, (self.width, self.height, self.name))
+
+    def write(self, tile, pixels):
+        x0, y0, x1, y1 = tile
+        self.array[y0:y1, x0:x1] = pixels
+
+    def release(self):
+        """Drop the array view and unmap; the owner also frees the block.
+
+        Views handed out from .array must be gone by then (copy what you keep).
+        """
+        if self._shm is None:
+            return
+        self.array = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def _attach(name):
+    """Open an existing block without registering it with the resource
+    tracker: workers share the owner's tracker, and a second registration
+    would be dropped (or the block unlinked) when a worker lets go of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
@@ -0,0 +1,66 @@
+"""Headless rendering entry point.
+
+Renders a whole frame with either engine:
+
+- "scalar": render_pixel_with_aa per pixel (the reference implementation)
+- "packet": vectorized NumPy ray packets (renderer/packet.py)
+
+The frame is rendered as tiles, on a process pool when workers > 1 (the
+same way the GUI does) and in this process otherwise.
+"""
+import multiprocessing
+
+import numpy as np
+
+from renderer.raytracer import init_worker, render_tile_task
+from renderer import packet
+from renderer.tiles import make_tiles, render_tiles
+
+ENGINES = ("scalar", "packet")
+
+
+def render_image(width, height, camera, objects, lights, engine="scalar", workers=1,
+                 tile_size=None, tile_order=None, stats=None, cost_maps=None):
+    """Render a (height, width, 3) uint8 image of the scene with the chosen engine.
+
+    workers > 1 renders tiles (config.TILE_SIZE / TILE_ORDER unless given)
+    on that many processes; a single process uses packet.TILE_SIZE tiles,
+    which suit the packet engine. The image is the same either way.
+    If stats is a dict, the tiles' counters are summed into it.
+
+    If cost_maps is a dict, it receives (height, width) float64 maps of
+    the per-pixel "bvh_nodes" and "primitive_tests" and of the "tile_time"
+    (each tile's render seconds spread over its pixels); see
+    renderer/heatmap.py.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    if cost_maps is not None:
+        for key in ("bvh_nodes", "primitive_tests", "tile_time"):
+            cost_maps[key] = np.zeros((height, width))
+
+    def collect(results):
+        for (x0, y0, x1, y1), pixels, counters in results:
+            img[y0:y1, x0:x1] = pixels
+            if cost_maps is not None:
+                nodes, prims = counters.pop("pixel_costs")
+                cost_maps["bvh_nodes"][y0:y1, x0:x1] = nodes
+                cost_maps["primitive_tests"][y0:y1, x0:x1] = prims
+                cost_maps["tile_time"][y0:y1, x0:x1] = counters["tile_time"] / nodes.size
+            if stats is not None:
+                for key, value in counters.items():
+                    stats[key] = stats.get(key, 0) + value
+
+    measure = cost_maps is not None
+    if workers > 1:
+        tiles = make_tiles(width, height, tile_size, tile_order)
+        with multiprocessing.Pool(workers, initializer=init_worker,
+                                  initargs=(width, height, camera, objects, lights, engine,
+                                            None, measure)) as pool:
+            collect(render_tiles(pool, tiles))
+    else:
+        init_worker(width, height, camera, objects, lights, engine, cost_maps=measure)
+        collect(map(render_tile_task, make_tiles(width, height, tile_size or packet.TILE_SIZE,
+                                                 tile_order)))
+    return img
@@ -0,0 +1,57 @@
+"""False-color heatmaps of per-pixel render cost.
+
+renderer.headless.render_image(..., cost_maps={}) measures, for every
+pixel, the BVH nodes visited and the primitive intersection tests of all
+its rays (shadow and secondary rays included), and each tile's render
+time. Bright areas show where the BVH does poorly: large overlapping
+boxes, long thin triangles, or leaves with too many primitives.
+"""
+import os
+
+import numpy as np
+from PIL import Image
+
+# Color ramp from cheap to expensive: black, blue, red, yellow, white
+RAMP = np.array([
+    (0, 0, 0),
+    (0, 0, 255),
+    (255, 0, 0),
+    (255, 255, 0),
+    (255, 255, 255),
+], dtype=np.float64)
+
+# Output file suffixes of the cost maps
+SUFFIXES = {"bvh_nodes": "_nodes", "primitive_tests": "_prims", "tile_time": "_time"}
+
+
+def false_color(values, percentile=99):
+    """(H, W, 3) uint8 false-color image of a (H, W) cost map.
+
+    Values are scaled so the given percentile maps to white, which keeps a
+    few very expensive pixels from washing out the rest of the image.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    top = np.percentile(values, percentile) if values.size else 0
+    if top <= 0:
+        top = values.max() if values.size and values.max() > 0 else 1
+    t = np.clip(values / top, 0, 1) * (len(RAMP) - 1)
+    i = np.minimum(t.astype(int), len(RAMP) - 2)
+    f = (t - i)[..., None]
+    return (RAMP[i] * (1 - f) + RAMP[i + 1] * f).astype(np.uint8)
+
+
+def save_heatmaps(cost_maps, output):
+    """Write <output>_nodes.png, _prims.png and _time.png; returns their paths."""
+    base = os.path.splitext(output)[0]
+    paths = []
+    for key, suffix in SUFFIXES.items():
+        path = base + suffix + ".png"
+        Image.fromarray(false_color(cost_maps[key])).save(path)
+        paths.append(path)
+    return paths
+
+
+def summary(cost_maps):
+    """Max and mean of every cost map, for the stats JSON."""
+    return {key: {"max": float(values.max()), "mean": float(values.mean())}
+            for key, values in cost_maps.items()}
@@ -0,0 +1,646 @@
+"""Vectorized NumPy ray-packet render engine.
+
+The scalar engine in renderer/raytracer.py traces one ray at a time through
+Vector3D objects, so a frame spends most of its time in interpreter overhead.
+This engine generates all primary rays of a tile as (N, 3) arrays, intersects
+spheres, planes and mesh triangles in batch and shades with array math.
+
+It follows trace_ray / render_pixel_with_aa step by step (including the uint8
+truncation after every bounce), so both engines produce the same image within
+a small tolerance.
+"""
+import numpy as np
+
+import config
+from core.bvh import BVHNode, BVHLeaf, FlatBVH, build_flat_arrays
+from core.objects.sphere import Sphere
+from core.objects.plane import Plane
+from core.objects.mesh import Mesh
+from core.objects.instance import Instance
+from core.objects.triangle import Triangle
+
+# Hit kinds
+MISS, SPHERE, PLANE, TRIANGLE = 0, 1, 2, 3
+
+EPSILON = 1e-8
+# Subtrees of a mesh BVH with at most this many triangles become one packet
+# leaf, tested brute-force against every ray that reaches it.
+LEAF_TRIANGLES = 16
+# Top-level nodes over mesh instances are kept down to the builder's leaves:
+# every instance in a leaf costs a ray transform and a mesh traversal.
+LEAF_INSTANCES = 1
+# Sphere leaves of the scene-level node list: a sphere test is cheap next to
+# the per-node overhead of stream traversal, so leaves stay fairly large.
+LEAF_SPHERES = 8
+# Tile edge used by render_image when rendering a whole frame.
+TILE_SIZE = 128
+
+
+def _vec(v):
+    return [v.x, v.y, v.z]
+
+
+def _dot(a, b):
+    return np.einsum('ij,ij->i', a, b)
+
+
+def _cross(a, b):
+    """Cross product over the last axis (np.cross is slow for small batches)."""
+    ax, ay, az = a[..., 0], a[..., 1], a[..., 2]
+    bx, by, bz = b[..., 0], b[..., 1], b[..., 2]
+    return np.stack((ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx), axis=-1)
+
+
+def _normalize(a):
+    """Row-wise normalize; zero-length rows are left unchanged (like Vector3D)."""
+    length = np.sqrt(_dot(a, a))
+    return a / np.where(length > 0, length, 1.0)[:, None]
+
+
+def _collect_leaves(obj, out):
+    """Append the leaf objects below a (possibly nested) scene BVH to out."""
+    if isinstance(obj, BVHNode):
+        for child in (obj._left, obj._right):
+            if child is not None:
+                _collect_leaves(child, out)
+    elif isinstance(obj, BVHLeaf):
+        out.extend(obj.objects)
+    elif isinstance(obj, FlatBVH):
+        out.extend(obj.primitives)
+    else:
+        out.append(obj)
+
+
+def _as_mesh(obj):
+    """Wrap a standalone Triangle in a one-face Mesh so it compiles like one."""
+    if isinstance(obj, Mesh):
+        return obj
+    mesh = Mesh(obj.material)
+    if obj.use_smooth_shading:
+        mesh.add_triangle(obj.v0, obj.v1, obj.v2, obj.n0, obj.n1, obj.n2)
+    else:
+        mesh.add_triangle(obj.v0, obj.v1, obj.v2)
+    return mesh
+
+
+def _mesh_bvh(mesh):
+    """The FlatBVH over a mesh's triangle rows (a one-leaf BVH for meshes
+    traced without one)."""
+    if isinstance(mesh._bvh, FlatBVH):
+        return mesh._bvh
+    count = mesh.get_triangle_count()
+    if count == 0:
+        return None
+    lo, hi = mesh.get_bounding_box()
+    return FlatBVH(np.array([_vec(lo)]), np.array([_vec(hi)]), np.array([-1], dtype=np.int32),
+                   np.array([0], dtype=np.int32), np.array([count], dtype=np.int32),
+                   None, np.arange(count, dtype=np.int32))
+
+
+class Hits:
+    """Closest-hit state for a batch of rays (struct of arrays)."""
+
+    def __init__(self, n, t_max=None):
+        self.t = np.full(n, np.inf) if t_max is None else np.array(t_max, dtype=np.float64)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.prim = np.zeros(n, dtype=np.int64)
+        self.u = np.zeros(n)
+        self.v = np.zeros(n)
+        self.inst = np.full(n, -1, dtype=np.int64)  # mesh instance of triangle hits, or -1
+
+    def update(self, ids, t, kind, prim, u=None, v=None, inst=-1):
+        """Record hits for ray indices ids that are closer than the current best."""
+        closer = t < self.t[ids]
+        if not closer.any():
+            return
+        ids = ids[closer]
+        self.t[ids] = t[closer]
+        self.kind[ids] = kind
+        self.prim[ids] = prim[closer]
+        self.inst[ids] = inst
+        if u is not None:
+            self.u[ids] = u[closer]
+            self.v[ids] = v[closer]
+
+
+class PacketScene:
+    """Scene objects compiled into flat NumPy arrays for batched tracing.
+
+    Spheres are stored in the slot order of a FlatBVH over their bounds,
+    compiled into a node list and stream-traversed like the meshes; only the
+    unbounded planes are tested brute-force. Mesh triangles from every mesh
+    are concatenated into shared arrays, and each mesh keeps a compact node
+    list built from its BVH for stream traversal.
+
+    Instances compile their mesh once however many there are. A top-level
+    node list over the instances' world bounds leads to per-instance
+    transforms, which move the rays into the shared mesh's object space.
+    """
+
+    def __init__(self, objects, lights):
+        leaves = []
+        for obj in objects:
+            _collect_leaves(obj, leaves)
+
+        self._materials = []
+        self._material_ids = {}
+        spheres, planes, meshes, instances = [], [], [], []
+        sphere_obj, plane_obj, mesh_obj, instance_obj = [], [], [], []  # leaf index of each object
+        for i, obj in enumerate(leaves):
+            if isinstance(obj, Sphere):
+                spheres.append(obj)
+                sphere_obj.append(i)
+            elif isinstance(obj, Plane):
+                planes.append(obj)
+                plane_obj.append(i)
+            elif isinstance(obj, (Mesh, Triangle)):
+                meshes.append(obj)
+                mesh_obj.append(i)
+            elif isinstance(obj, Instance):
+                instances.append(obj)
+                instance_obj.append(i)
+            else:
+                raise TypeError(f"Packet engine cannot trace {type(obj).__name__}")
+
+        self._compile_spheres(spheres, sphere_obj)
+
+        self.plane_point = np.array([_vec(p.point) for p in planes], dtype=np.float64).reshape(-1, 3)
+        self.plane_normal = np.array([_vec(p.normal) for p in planes], dtype=np.float64).reshape(-1, 3)
+        self.plane_mat = np.array([self._material_id(p.material) for p in planes], dtype=np.int64)
+        self.plane_obj = np.array(plane_obj, dtype=np.int64)
+
+        shared = list({id(inst.mesh): inst.mesh for inst in instances}.values())
+        nodes = self._compile_meshes(meshes + shared, mesh_obj + [-1] * len(shared))
+        self.mesh_nodes = nodes[:len(meshes)]
+        self._compile_instances(instances, instance_obj, shared, nodes[len(meshes):])
+        self._compile_materials()
+
+        self.light_position = np.array([_vec(l.position) for l in lights], dtype=np.float64).reshape(-1, 3)
+        self.light_intensity = np.array([l.intensity for l in lights], dtype=np.float64).reshape(-1, 3)
+
+    def _material_id(self, material):
+        key = id(material)
+        if key not in self._material_ids:
+            self._material_ids[key] = len(self._materials)
+            self._materials.append(material)
+        return self._material_ids[key]
+
+    def _compile_materials(self):
+        m = self._materials
+        self.ambient = np.array([x["ambient"] for x in m], dtype=np.float64).reshape(-1, 3)
+        self.diffuse = np.array([x["diffuse"] for x in m], dtype=np.float64).reshape(-1, 3)
+        self.specular = np.array([x["specular"] for x in m], dtype=np.float64).reshape(-1, 3)
+        self.shininess = np.array([x["shininess"] for x in m], dtype=np.float64)
+        self.reflectivity = np.array([x.get("reflectivity", 0) for x in m], dtype=np.float64)
+        self.transparency = np.array([x.get("transparency", 0) for x in m], dtype=np.float64)
+        self.refractive_index = np.array([x.get("refractive_index", 1.5) for x in m], dtype=np.float64)
+        del self._material_ids
+
+    def _compile_spheres(self, spheres, owners):
+        """Sphere arrays in the slot order of a FlatBVH over their bounds."""
+        self.sphere_nodes = None
+        if spheres:
+            center = np.array([_vec(s.center) for s in spheres], dtype=np.float64)
+            radius = np.array([s.radius for s in spheres], dtype=np.float64)
+            arrays = build_flat_arrays(center - radius[:, None], center + radius[:, None])
+            self.sphere_nodes = _compile_nodes(FlatBVH(*arrays[:-1], None, arrays[-1]), 0,
+                                               LEAF_SPHERES)
+            order = arrays[-1].tolist()
+            spheres = [spheres[k] for k in order]
+            owners = [owners[k] for k in order]
+        self.sphere_center = np.array([_vec(s.center) for s in spheres], dtype=np.float64).reshape(-1, 3)
+        self.sphere_radius = np.array([s.radius for s in spheres], dtype=np.float64)
+        self.sphere_mat = np.array([self._material_id(s.material) for s in spheres], dtype=np.int64)
+        self.sphere_obj = np.array(owners, dtype=np.int64)
+
+    def _compile_meshes(self, meshes, owners):
+        """Gather every mesh's triangle arrays in BVH slot order.
+
+        Returns each mesh's packet node list (None for empty meshes).
+        """
+        rows = {name: [] for name in ("v0", "e1", "e2", "face_normal", "n0", "n1", "n2", "smooth",
+                                      "mat", "obj")}
+        offset = 0
+        mesh_nodes = []
+        for mesh, owner in zip(map(_as_mesh, meshes), owners):
+            bvh = _mesh_bvh(mesh)
+            mesh_nodes.append(None if bvh is None else _compile_nodes(bvh, offset))
+            if bvh is None:
+                continue
+            order = bvh.prim_index
+            offset += len(order)
+
+            faces = mesh.faces[order]
+            normal_ids = mesh.face_normal_ids[order]
+            smooth = normal_ids[:, 0] >= 0
+            face_normal = mesh.face_normals[order]
+            rows["v0"].append(mesh.vertices[faces[:, 0]])
+            rows["e1"].append(mesh.edge1[order])
+            rows["e2"].append(mesh.edge2[order])
+            rows["face_normal"].append(face_normal)
+            for c in range(3):
+                vertex_normal = mesh.normals[normal_ids[:, c]] if smooth.any() else face_normal
+                rows[f"n{c}"].append(np.where(smooth[:, None], vertex_normal, face_normal))
+            rows["smooth"].append(smooth)
+            rows["mat"].append(np.full(len(order), self._material_id(mesh.material), dtype=np.int64))
+            rows["obj"].append(np.full(len(order), owner, dtype=np.int64))
+
+        def stack(name, dtype, shape):
+            parts = rows[name]
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(shape, dtype=dtype)
+
+        for name in ("v0", "e1", "e2", "face_normal", "n0", "n1", "n2"):
+            setattr(self, "tri_" + name, stack(name, np.float64, (0, 3)))
+        self.tri_smooth = stack("smooth", bool, (0,))
+        self.tri_mat = stack("mat", np.int64, (0,))
+        self.tri_obj = stack("obj", np.int64, (0,))
+        return mesh_nodes
+
+    def _compile_instances(self, instances, owners, shared, shared_nodes):
+        """Per-instance transform arrays in top-level BVH slot order.
+
+        shared lists the distinct meshes of the instances and shared_nodes
+        their node lists from _compile_meshes.
+        """
+        index = {id(mesh): k for k, mesh in enumerate(shared)}
+        instances = [(inst, owner) for inst, owner in zip(instances, owners)
+                     if shared_nodes[index[id(inst.mesh)]] is not None]
+        self.shared_nodes = shared_nodes
+        self.instance_nodes = None
+        self.inst_to_object = np.zeros((0, 3, 4))
+        self.inst_normal = np.zeros((0, 3, 3))
+        self.inst_mesh = np.zeros(0, dtype=np.int64)
+        self.inst_mat = np.zeros(0, dtype=np.int64)
+        self.inst_obj = np.zeros(0, dtype=np.int64)
+        if not instances:
+            return
+        boxes = [inst.get_bounding_box() for inst, _ in instances]
+        lo = np.array([_vec(b[0]) for b in boxes], dtype=np.float64)
+        hi = np.array([_vec(b[1]) for b in boxes], dtype=np.float64)
+        arrays = build_flat_arrays(lo, hi)
+        self.instance_nodes = _compile_nodes(FlatBVH(*arrays[:-1], None, arrays[-1]), 0,
+                                             LEAF_INSTANCES)
+        order = arrays[-1].tolist()
+        instances = [instances[k] for k in order]
+        self.inst_to_object = np.array([inst.world_to_object() for inst, _ in instances])
+        self.inst_normal = np.array([inst.normal_matrix() for inst, _ in instances])
+        self.inst_mesh = np.array([index[id(inst.mesh)] for inst, _ in instances], dtype=np.int64)
+        self.inst_mat = np.array([self._material_id(inst.material) for inst, _ in instances],
+                                 dtype=np.int64)
+        self.inst_obj = np.array([owner for _, owner in instances], dtype=np.int64)
+
+    # ---------- intersection ----------
+    def intersect(self, origins, directions, t_max=None):
+        """Closest hit for every ray. Hits beyond t_max (default inf) are ignored."""
+        hits = Hits(len(origins), t_max)
+        if len(origins) == 0:
+            return hits
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_d = 1.0 / directions
+        rays = np.arange(len(origins))
+        if self.sphere_nodes is not None:
+            self._traverse(self.sphere_nodes, origins, directions, inv_d, rays, hits, leaf=SPHERE)
+        self._intersect_meshes(origins, directions, inv_d, rays, hits)
+        self._intersect_planes(origins, directions, hits)
+        return hits
+
+    def occluded(self, origins, directions, distances):
+        """True for rays that hit anything closer than distances."""
+        return self.intersect(origins, directions, distances).kind != MISS
+
+    def _intersect_planes(self, o, d, hits):
+        ids = np.arange(len(o))
+        config.trace_stats["primitive_tests"] += len(o) * len(self.plane_mat)
+        for i in range(len(self.plane_mat)):
+            n = self.plane_normal[i]
+            denom = d @ n
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = ((self.plane_point[i] - o) @ n) / denom
+            t = np.where((np.abs(denom) >= 1e-6) & (t >= 0), t, np.inf)
+            hits.update(ids, t, PLANE, np.full(len(o), i))
+
+    def _intersect_meshes(self, o, d, inv_d, rays, hits):
+        for nodes in self.mesh_nodes:
+            if nodes is not None:
+                self._traverse(nodes, o, d, inv_d, rays, hits)
+        if self.instance_nodes is not None:
+            self._traverse(self.instance_nodes, o, d, inv_d, rays, hits, leaf=None)
+
+    def _traverse(self, nodes, o, d, inv_d, rays, hits, leaf=TRIANGLE, inst=-1):
+        """Stream-traverse a packet node list.
+
+        o, d and inv_d hold the rays whose indices in hits are rays. Leaves
+        name ranges of the primitive kind leaf (TRIANGLE or SPHERE), or of
+        instances when leaf is None; inst is the instance the (object-space)
+        rays belong to.
+        """
+        stats = config.trace_stats
+        stack = [(0, np.arange(len(o)))]
+        while stack:
+            n, ids = stack.pop()
+            stats["aabb_tests"] += len(ids)
+            t_near = _slab(nodes["bmin"][n], nodes["bmax"][n], o[ids], inv_d[ids])
+            ids = ids[(t_near < np.inf) & (t_near <= hits.t[rays[ids]])]
+            if ids.size == 0:
+                continue
+            stats["bvh_nodes"] += len(ids)
+            if nodes["left"][n] < 0:
+                start, count = nodes["start"][n], nodes["count"][n]
+                if leaf is None:
+                    self._intersect_instance_range(o[ids], d[ids], rays[ids], start, start + count,
+                                                   hits)
+                elif leaf == SPHERE:
+                    self._intersect_sphere_range(o, d, ids, start, start + count, hits)
+                else:
+                    self._intersect_triangle_range(o, d, ids, start, start + count, hits,
+                                                   rays[ids], inst)
+            else:
+                stack.append((nodes["right"][n], ids))
+                stack.append((nodes["left"][n], ids))
+
+    def _intersect_instance_range(self, o, d, rays, start, end, hits):
+        """Trace world-space rays o / d (indices rays in hits) through
+        instances [start, end), each in its mesh's object space."""
+        for i in range(start, end):
+            m = self.inst_to_object[i]
+            local_o = o @ m[:, :3].T + m[:, 3]
+            local_d = d @ m[:, :3].T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                local_inv = 1.0 / local_d
+            self._traverse(self.shared_nodes[self.inst_mesh[i]], local_o, local_d, local_inv,
+                           rays, hits, inst=i)
+
+    def _intersect_sphere_range(self, o, d, ids, start, end, hits):
+        """Batched test of world-space rays ids against spheres [start, end)."""
+        config.trace_stats["primitive_tests"] += len(ids) * int(end - start)
+        r2 = self.sphere_radius[start:end] ** 2
+        l = self.sphere_center[None, start:end, :] - o[ids][:, None, :]
+        tc = np.einsum('ksj,kj->ks', l, d[ids])
+        d2 = np.einsum('ksj,ksj->ks', l, l) - tc * tc
+        valid = (tc >= 0) & (d2 <= r2)
+        thc = np.sqrt(np.where(valid, r2 - d2, 0.0))
+        t1 = tc - thc
+        t = np.where(t1 > 0, t1, tc + thc)
+        t = np.where(valid, t, np.inf)
+        best = np.argmin(t, axis=1)
+        hits.update(ids, t[np.arange(len(ids)), best], SPHERE, start + best)
+
+    def _intersect_triangle_range(self, o, d, ids, start, end, hits, rays=None, inst=-1):
+        """Batched Möller–Trumbore of rays ids against triangles [start, end).
+
+        Hits are recorded for rays (default: ids), tagged with instance inst.
+        """
+        config.trace_stats["primitive_tests"] += len(ids) * int(end - start)
+        v0 = self.tri_v0[start:end]
+        e1 = self.tri_e1[start:end]
+        e2 = self.tri_e2[start:end]
+        ro = o[ids][:, None, :]
+        rd = d[ids][:, None, :]
+
+        pvec = _cross(rd, e2[None, :, :])
+        det = np.einsum('kmj,mj->km', pvec, e1)
+        ok = np.abs(det) >= EPSILON
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_det = np.where(ok, 1.0 / det, 0.0)
+        tvec = ro - v0[None, :, :]
+        u = np.einsum('kmj,kmj->km', tvec, pvec) * inv_det
+        qvec = _cross(tvec, e1[None, :, :])
+        v = np.einsum('kmj,kmj->km', qvec, rd) * inv_det
+        t = np.einsum('kmj,mj->km', qvec, e2) * inv_det
+        ok &= (u >= 0.0) & (u <= 1.0) & (v >= 0.0) & (u + v <= 1.0) & (t > EPSILON)
+        t = np.where(ok, t, np.inf)
+
+        best = np.argmin(t, axis=1)
+        rows = np.arange(len(ids))
+        hits.update(ids if rays is None else rays, t[rows, best], TRIANGLE, start + best,
+                    u[rows, best], v[rows, best], inst)
+
+    # ---------- shading inputs ----------
+    def normals(self, hits, idx, points):
+        """Surface normals at points for the hit rays idx."""
+        normal = np.zeros((len(idx), 3))
+        kind = hits.kind[idx]
+        prim = hits.prim[idx]
+
+        sel = kind == SPHERE
+        if sel.any():
+            normal[sel] = _normalize(points[sel] - self.sphere_center[prim[sel]])
+
+        sel = kind == PLANE
+        if sel.any():
+            normal[sel] = self.plane_normal[prim[sel]]
+
+        sel = kind == TRIANGLE
+        if sel.any():
+            tri = prim[sel]
+            u = hits.u[idx][sel][:, None]
+            v = hits.v[idx][sel][:, None]
+            smooth = _normalize(self.tri_n0[tri] * (1.0 - u - v) + self.tri_n1[tri] * u + self.tri_n2[tri] * v)
+            normal[sel] = np.where(self.tri_smooth[tri][:, None], smooth, self.tri_face_normal[tri])
+
+        inst = hits.inst[idx]
+        sel = inst >= 0
+        if sel.any():
+            matrix = self.inst_normal[inst[sel]]
+            normal[sel] = _normalize(np.einsum('kij,kj->ki', matrix, normal[sel]))
+        return normal
+
+    def object_ids(self, hits):
+        """Scene leaf index of every ray's closest object (-1 for misses)."""
+        ids = np.full(len(hits.kind), -1, dtype=np.int64)
+        for k, table in ((SPHERE, self.sphere_obj), (PLANE, self.plane_obj), (TRIANGLE, self.tri_obj)):
+            sel = hits.kind == k
+            if sel.any():
+                ids[sel] = table[hits.prim[sel]]
+        sel = hits.inst >= 0
+        if sel.any():
+            ids[sel] = self.inst_obj[hits.inst[sel]]
+        return ids
+
+    def material_ids(self, hits, idx):
+        kind = hits.kind[idx]
+        prim = hits.prim[idx]
+        mat = np.zeros(len(idx), dtype=np.int64)
+        for k, table in ((SPHERE, self.sphere_mat), (PLANE, self.plane_mat), (TRIANGLE, self.tri_mat)):
+            sel = kind == k
+            if sel.any():
+                mat[sel] = table[prim[sel]]
+        inst = hits.inst[idx]
+        sel = inst >= 0
+        if sel.any():
+            mat[sel] = self.inst_mat[inst[sel]]
+        return mat
+
+
+def _compile_nodes(bvh, offset, leaf_size=LEAF_TRIANGLES):
+    """Packet node list for one mesh FlatBVH whose triangles start at offset.
+
+    Subtrees with at most leaf_size triangles collapse into one packet
+    leaf. Returns a dict of arrays: bmin/bmax (n, 3), left/right child
+    indices (-1 for leaves), and start/count ranges into the shared triangle
+    arrays.
+    """
+    bmin, bmax, left, right, start, count = [], [], [], [], [], []
+
+    def emit(i):
+        j = len(left)
+        bmin.append(bvh.bounds_min[i])
+        bmax.append(bvh.bounds_max[i])
+        left.append(-1)
+        right.append(-1)
+        start.append(offset + bvh.prim_start[i])
+        count.append(bvh.prim_count[i])
+        if bvh.right[i] >= 0 and bvh.prim_count[i] > leaf_size:
+            count[j] = 0
+            left[j] = emit(i + 1)
+            right[j] = emit(bvh.right[i])
+        return j
+
+    emit(0)
+    return {
+        "bmin": np.array(bmin, dtype=np.float64),
+        "bmax": np.array(bmax, dtype=np.float64),
+        "left": np.array(left, dtype=np.int64),
+        "right": np.array(right, dtype=np.int64),
+        "start": np.array(start, dtype=np.int64),
+        "count": np.array(count, dtype=np.int64),
+    }
+
+
+def _slab(bmin, bmax, o, inv_d):
+    """Vectorized slab test of rays against one AABB.
+
+    Returns the entry distance per ray, or inf where the ray misses the box
+    (same acceptance rule as core.bvh._intersect_aabb).
+    """
+    with np.errstate(invalid='ignore'):
+        t0 = (bmin - o) * inv_d
+        t1 = (bmax - o) * inv_d
+    t_min = np.fmax.reduce(np.fmin(t0, t1), axis=1)
+    t_max = np.fmin.reduce(np.fmax(t0, t1), axis=1)
+    hit = (t_max >= t_min) & (t_max > 0)
+    return np.where(hit, t_min, np.inf)
+
+
+def trace_packet(scene, origins, directions, depth=0, counter="primary_rays"):
+    """Vectorized trace_ray: returns (N, 3) float colors already truncated to uint8 steps."""
+    if depth >= config.MAX_DEPTH or len(origins) == 0:
+        return np.zeros((len(origins), 3))
+    config.trace_stats[counter] += len(origins)
+    return shade_packet(scene, origins, directions, scene.intersect(origins, directions), depth)
+
+
+def shade_packet(scene, origins, directions, hits, depth=0):
+    """Colors of rays given their closest hits; trace_packet's shading."""
+    color = np.zeros((len(origins), 3))
+    idx = np.nonzero(hits.kind != MISS)[0]
+    if idx.size == 0:
+        return color
+
+    d = directions[idx]
+    points = origins[idx] + d * hits.t[idx][:, None]
+    normal = scene.normals(hits, idx, points)
+    mat = scene.material_ids(hits, idx)
+    view = -d
+
+    # Ambient once, then diffuse + specular per unshadowed light
+    local = scene.ambient[mat].copy()
+    shadow_origin = points + normal * 0.001
+    for light_pos, intensity in zip(scene.light_position, scene.light_intensity):
+        config.trace_stats["shadow_rays"] += len(points)
+        to_light = light_pos - points
+        distance = np.sqrt(_dot(to_light, to_light))
+        light_dir = _normalize(to_light)
+        lit = ~scene.occluded(shadow_origin, light_dir, distance)
+        if not lit.any():
+            continue
+        n_dot_l = _dot(normal, light_dir)
+        diff = np.maximum(n_dot_l, 0)
+        reflect_dir = _normalize(normal * 2 * n_dot_l[:, None] - light_dir)
+        spec = np.maximum(_dot(view, reflect_dir), 0) ** scene.shininess[mat]
+        contrib = (scene.diffuse[mat] * diff[:, None] + scene.specular[mat] * spec[:, None]) * intensity
+        local[lit] += contrib[lit]
+
+    c = np.clip(local * 255, 0, 255)
+
+    reflectivity = scene.reflectivity[mat]
+    sel = np.nonzero(reflectivity > 0)[0]
+    if sel.size:
+        ds, ns = d[sel], normal[sel]
+        reflection_dir = _normalize(ds - ns * 2 * _dot(ds, ns)[:, None])
+        reflection = trace_packet(scene, points[sel] + ns * 0.001, reflection_dir, depth + 1,
+                                  "reflection_rays")
+        r = reflectivity[sel][:, None]
+        c[sel] = c[sel] * (1 - r) + reflection * r
+
+    transparency = scene.transparency[mat]
+    sel = np.nonzero(transparency > 0)[0]
+    if sel.size:
+        ds, ns = d[sel], normal[sel]
+        inside = _dot(ds, ns) > 0
+        refr_normal = np.where(inside[:, None], -ns, ns)
+        ior = scene.refractive_index[mat[sel]]
+        eta = np.where(inside, ior, 1.0) / np.where(inside, 1.0, ior)
+        cos_i = -_dot(refr_normal, ds)
+        sin2_t = eta * eta * (1.0 - cos_i * cos_i)
+        ok = sin2_t <= 1.0  # otherwise total internal reflection
+        sel, ds, ns, refr_normal = sel[ok], ds[ok], ns[ok], refr_normal[ok]
+        eta, cos_i, sin2_t = eta[ok], cos_i[ok], sin2_t[ok]
+        if sel.size:
+            cos_t = np.sqrt(1.0 - sin2_t)
+            refraction_dir = _normalize(ds * eta[:, None] + refr_normal * (eta * cos_i - cos_t)[:, None])
+            refraction = trace_packet(scene, points[sel] - refr_normal * 0.001, refraction_dir, depth + 1,
+                                      "refraction_rays")
+            fresnel = 0.1 + 0.9 * (1.0 - np.abs(_dot(-ds, ns))) ** 5.0
+            w = (transparency[sel] * (1 - fresnel))[:, None]
+            c[sel] = c[sel] * (1 - w) + refraction * w
+
+    color[idx] = np.floor(np.clip(c, 0, 255))
+    return color
+
+
+def render_tile(scene, camera, width, height, x0, y0, x1, y1):
+    """Render pixels [x0, x1) x [y0, y1) with config.AA_SAMPLES² grid supersampling.
+
+    Returns a (y1 - y0, x1 - x0, 3) uint8 array matching render_pixel_with_aa.
+    """
+    aa = config.AA_SAMPLES
+    offsets = (np.arange(aa) + 0.5) / aa
+    ys, xs, sy, sx = np.meshgrid(np.arange(y0, y1), np.arange(x0, x1), offsets, offsets, indexing='ij')
+    u = ((xs + sx) / width) * 2 - 1
+    v = 1 - ((ys + sy) / height) * 2
+
+    origins, directions = camera.get_rays(u.ravel(), v.ravel())
+    samples = trace_packet(scene, origins, directions)
+    samples = samples.reshape(y1 - y0, x1 - x0, aa * aa, 3)
+    return (samples.sum(axis=2) / (aa * aa)).astype(np.uint8)
+
+
+def render_samples(scene, camera, width, height, xs, ys, ox, oy, object_ids=False):
+    """Trace one sample per entry: pixel (xs, ys) at sub-pixel offset (ox, oy).
+
+    Returns (N, 3) float colors, each equal to a single trace_ray sample,
+    and with object_ids also the PacketScene.object_ids of the primary hits.
+    """
+    u = ((xs + ox) / width) * 2 - 1
+    v = 1 - ((ys + oy) / height) * 2
+    origins, directions = camera.get_rays(u, v)
+    if not object_ids:
+        return trace_packet(scene, origins, directions)
+    hits = Hits(len(origins))
+    if config.MAX_DEPTH > 0:
+        config.trace_stats["primary_rays"] += len(origins)
+        hits = scene.intersect(origins, directions)
+    return shade_packet(scene, origins, directions, hits), scene.object_ids(hits)
+
+
+def render_image(width, height, camera, objects, lights, tile_size=TILE_SIZE):
+    """Render a whole frame with the packet engine, tile by tile."""
+    scene = PacketScene(objects, lights)
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            img[y0:y1, x0:x1] = render_tile(scene, camera, width, height, x0, y0, x1, y1)
+    return img
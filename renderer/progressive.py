@@ -0,0 +1,93 @@
+"""Successive-refinement rendering helpers.
+
+A progressive render runs coarse-to-fine passes over the frame:
+
+1. preview passes with step 8, 4, 2, 1 (config.PROGRESSIVE_START): each traces
+   one sample for the pixels on its step x step lattice that no coarser pass
+   covered, and the preview shows every lattice sample as a step x step block
+2. a refine pass, only when AA_SAMPLES > 1: traces the remaining AA samples
+   of every pixel and adds them to the one already taken
+
+The preview sample of a pixel is its first AA grid sample (sx = sy = 0), so
+nothing is traced twice and the finished frame equals a regular render.
+"""
+import numpy as np
+
+import config
+
+
+def pass_steps(start=None):
+    """Lattice steps of the preview passes, coarsest first, ending with 1."""
+    step = 1
+    while step * 2 <= max(1, start or config.PROGRESSIVE_START):
+        step *= 2
+    steps = []
+    while step >= 1:
+        steps.append(step)
+        step //= 2
+    return steps
+
+
+def pass_pixels(tile, step, coarsest):
+    """(ys, xs) of the pixels a preview pass with this step traces in tile.
+
+    The first (coarsest) pass takes every lattice pixel; later passes skip
+    the ones already on the previous pass's lattice of step * 2.
+    """
+    x0, y0, x1, y1 = tile
+    ys, xs = np.mgrid[-(-y0 // step) * step:y1:step, -(-x0 // step) * step:x1:step]
+    ys, xs = ys.ravel(), xs.ravel()
+    if step < coarsest:
+        new = (ys % (step * 2) != 0) | (xs % (step * 2) != 0)
+        ys, xs = ys[new], xs[new]
+    return ys, xs
+
+
+def sample_offsets(aa=None):
+    """Sub-pixel (ox, oy) offsets of the aa x aa grid, in render_pixel_with_aa order."""
+    aa = aa or config.AA_SAMPLES
+    offsets = [((sx + 0.5) / aa, (sy + 0.5) / aa) for sx in range(aa) for sy in range(aa)]
+    return np.array(offsets, dtype=np.float64).reshape(-1, 2)
+
+
+class ProgressiveFrame:
+    """Sample store and preview image of one progressive render."""
+
+    def __init__(self, width, height, aa=None):
+        self.width = width
+        self.height = height
+        self.aa = aa or config.AA_SAMPLES
+        self.first = np.zeros((height, width, 3), dtype=np.uint8)  # first AA sample
+        self.known = np.zeros((height, width), dtype=bool)
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def add_preview(self, tile, step, coarsest, colors):
+        """Store a preview pass's samples for tile and refresh its preview blocks.
+
+        Returns the (x0, y0, x1, y1) region of self.image that changed.
+        """
+        ys, xs = pass_pixels(tile, step, coarsest)
+        self.first[ys, xs] = colors
+        self.known[ys, xs] = True
+        if self.aa == 1 and step == 1:
+            self.image[ys, xs] = colors
+            return tile
+
+        # Every lattice pixel of the tile now covers its step x step block;
+        # blocks may reach past the tile into pixels not yet refined.
+        x0, y0, x1, y1 = tile
+        rx1, ry1 = min(self.width, x1 + step - 1), min(self.height, y1 + step - 1)
+        sy = (np.arange(y0, ry1) // step) * step
+        sx = (np.arange(x0, rx1) // step) * step
+        block = self.first[sy[:, None], sx[None, :]]
+        valid = self.known[sy[:, None], sx[None, :]]
+        region = self.image[y0:ry1, x0:rx1]
+        region[valid] = block[valid]
+        return (x0, y0, rx1, ry1)
+
+    def add_refinement(self, tile, rest_sum):
+        """Finish tile from the sum of its remaining AA samples (uint16)."""
+        x0, y0, x1, y1 = tile
+        total = self.first[y0:y1, x0:x1].astype(np.float64) + rest_sum
+        self.image[y0:y1, x0:x1] = (total / (self.aa * self.aa)).astype(np.uint8)
+        return tile
@@ -1,53 +1,60 @@
+import time
+
 import numpy as np
 from core.ray import Ray
 import config
 from utils.shading import diffuse_specular, get_reflection_direction, get_refraction_direction
-from utils.vector import Vector3D
-from core.bvh import BVHNode
+from renderer import adaptive, packet
+from renderer.progressive import pass_pixels, sample_offsets
 
-def trace_ray(ray, objects, lights, depth=0):
+def trace_ray(ray, objects, lights, depth=0, counter="primary_rays"):
+    """Color of ray; counter names the config.trace_stats entry it counts as."""
     if depth >= config.MAX_DEPTH:
         return (0, 0, 0)
+    config.trace_stats[counter] += 1
+    return shade_hit(ray, closest_hit(ray, objects), objects, lights, depth)
+
 
-    closest_hit = None
-    closest_obj = None
+def closest_hit(ray, objects):
+    """Nearest HitRecord of ray among objects, or None.
 
+    ray.t_max is narrowed to the closest hit so far while the later objects
+    are tested, so their BVHs skip everything behind it.
+    """
+    closest = None
+    t_limit = ray.t_max
     for obj in objects:
-        hit, leaf = obj.intersect_full(ray)
-        if hit is not None and (closest_hit is None or hit < closest_hit):
-            closest_hit = hit
-            closest_obj = leaf
-
-    if closest_hit is not None:
-        hit_point = ray.origin + ray.direction * closest_hit
-
-        # Get normal based on object type
-        if hasattr(closest_obj, 'center'):
-            normal = (hit_point - closest_obj.center).normalize()
-        elif hasattr(closest_obj, 'normal'):
-            normal = closest_obj.normal
-        elif hasattr(closest_obj, 'get_normal_at_intersection'):
-            normal = closest_obj.get_normal_at_intersection(hit_point)
-        else:
-            normal = Vector3D(0, 1, 0, 0)
+        hit = obj.intersect_full(ray)
+        if hit is not None and (closest is None or hit.t < closest.t):
+            closest = hit
+            ray.t_max = hit.t
+    ray.t_max = t_limit
+    return closest
+
+
+def shade_hit(ray, closest, objects, lights, depth=0):
+    """Color of ray given its closest hit (None for a miss); trace_ray's shading."""
+    if closest is not None:
+        hit_point = ray.origin + ray.direction * closest.t
+        normal = closest.obj.get_normal_at_intersection(hit_point, closest)
 
         view_dir = -ray.direction
-        material = closest_obj.material
+        material = closest.obj.material
 
         # Ambient once (0-1 scale)
         local = np.array(material["ambient"], dtype=np.float64)
 
         # Each light: own shadow test, then diffuse+specular contribution
         for light in lights:
+            config.trace_stats["shadow_rays"] += 1
             shadow_origin = hit_point + normal * 0.001  # Shadow acne bias
             light_dir = (light.position - hit_point).normalize()
-            shadow_ray = Ray(shadow_origin, light_dir)
+            shadow_ray = Ray(shadow_origin, light_dir, normalize=False)
             light_distance = (light.position - hit_point).length()
 
             in_shadow = False
             for obj in objects:
-                shadow_hit, _ = obj.intersect_full(shadow_ray)
-                if shadow_hit is not None and shadow_hit < light_distance:
+                if obj.occluded(shadow_ray, light_distance):
                     in_shadow = True
                     break
 
@@ -61,7 +68,8 @@ def trace_ray(ray, objects, lights, depth=0):
             reflection_origin = hit_point + normal * 0.001  # Reflection acne bias
             reflection_ray = Ray(reflection_origin, reflection_dir)
 
-            reflection_color = trace_ray(reflection_ray, objects, lights, depth + 1)
+            reflection_color = trace_ray(reflection_ray, objects, lights, depth + 1,
+                                         "reflection_rays")
 
             color = color * (1 - material["reflectivity"]) + np.array(reflection_color) * material["reflectivity"]
 
@@ -80,7 +88,8 @@ def trace_ray(ray, objects, lights, depth=0):
                 refraction_origin = hit_point - refr_normal * 0.001  # Refraction acne bias
                 refraction_ray = Ray(refraction_origin, refraction_dir)
 
-                refraction_color = trace_ray(refraction_ray, objects, lights, depth + 1)
+                refraction_color = trace_ray(refraction_ray, objects, lights, depth + 1,
+                                             "refraction_rays")
 
                 fresnel = 0.1 + 0.9 * pow(1.0 - abs(view_dir.dot(normal)), 5.0)
 
@@ -119,23 +128,162 @@ def render_pixel_with_aa(x, y, width, height, camera, objects, lights):
 # --- Multiprocessing worker support -------------------------------------------
 # The scene (camera, objects, light) is the same for every pixel. Passing it in
 # each task tuple re-pickles the whole scene (including large mesh BVH trees) per
-# pixel, which dominates render time. Instead the pool initializer ships it once
-# per worker process and stores it in this module-level context; per-pixel tasks
-# then carry only the (x, y) integer coordinates.
+# task, which dominates render time. Instead the pool initializer ships it once
+# per worker process and stores it in this module-level context; tile tasks
+# then carry only their pixel rectangle.
 _worker_ctx = {}
 
 
-def init_worker(width, height, camera, objects, lights):
-    """Pool initializer: store the immutable scene once per worker process."""
+def init_worker(width, height, camera, objects, lights, engine="scalar", framebuffer=None,
+                cost_maps=False):
+    """Pool initializer: store the immutable scene once per worker process.
+
+    framebuffer is an optional SharedFramebuffer that tiles are written into.
+    cost_maps makes render_tile_task also measure per-pixel traversal cost.
+    """
+    _worker_ctx["framebuffer"] = framebuffer
     _worker_ctx["width"] = width
     _worker_ctx["height"] = height
     _worker_ctx["camera"] = camera
     _worker_ctx["objects"] = objects
     _worker_ctx["lights"] = lights
+    _worker_ctx["engine"] = engine
+    _worker_ctx["cost_maps"] = cost_maps
+    _worker_ctx.pop("packet_scene", None)
 
 
-def render_pixel_coord(x, y):
-    """Render one pixel using the worker's stored scene context."""
+def render_tile_task(tile):
+    """Render the pixel rectangle tile = (x0, y0, x1, y1) of the worker's scene.
+
+    Returns (tile, pixels, counters) with pixels a packed (y1 - y0, x1 - x0, 3)
+    uint8 array, so one small buffer is pickled per tile instead of a tuple
+    per pixel, and counters the work it took: "samples" (primary samples of
+    the tile's pixels), "border_samples" (adaptive AA samples traced around
+    the tile, see renderer.adaptive), every config.trace_stats counter and
+    "tile_time" (wall seconds). With a
+    shared framebuffer the pixels are written into it instead and None is
+    returned in their place. The packet engine compiles the scene lazily,
+    once per worker.
+
+    In cost-map mode counters also holds "pixel_costs", a (2, h, w) array of
+    the BVH nodes visited and primitive tests of each pixel.
+    """
     c = _worker_ctx
-    return render_pixel_with_aa(
-        x, y, c["width"], c["height"], c["camera"], c["objects"], c["lights"])
+    _reset_trace_stats()
+    start = time.perf_counter()
+    x0, y0, x1, y1 = tile
+    samples = (x1 - x0) * (y1 - y0) * config.AA_SAMPLES * config.AA_SAMPLES
+    border = 0
+    costs = None
+    if config.ADAPTIVE_AA:
+        pixels, samples, border = adaptive.render_tile(tile, c["width"], c["height"], _trace_samples)
+    elif c["engine"] == "packet":
+        if "packet_scene" not in c:
+            c["packet_scene"] = packet.PacketScene(c["objects"], c["lights"])
+        pixels = packet.render_tile(c["packet_scene"], c["camera"], c["width"], c["height"],
+                                    x0, y0, x1, y1)
+    else:
+        pixels, costs = _render_pixels(tile, c["cost_maps"])
+    counters = dict(config.trace_stats, samples=samples, border_samples=border,
+                    tile_time=time.perf_counter() - start)
+    if c["cost_maps"]:
+        # Packet and adaptive renders are not per pixel: measure the costs
+        # with a separate scalar pass (not counted in counters above)
+        counters["pixel_costs"] = costs if costs is not None else _render_pixels(tile, True)[1]
+    if c["framebuffer"] is not None:
+        c["framebuffer"].write(tile, pixels)
+        return tile, None, counters
+    return tile, pixels, counters
+
+
+def _render_pixels(tile, measure=False):
+    """render_pixel_with_aa over tile. With measure, also returns the
+    (2, h, w) BVH nodes / primitive tests of each pixel (else None)."""
+    c = _worker_ctx
+    x0, y0, x1, y1 = tile
+    stats = config.trace_stats
+    pixels = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+    costs = np.zeros((2, y1 - y0, x1 - x0), dtype=np.int64) if measure else None
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            nodes, prims = stats["bvh_nodes"], stats["primitive_tests"]
+            pixels[y - y0, x - x0] = render_pixel_with_aa(
+                x, y, c["width"], c["height"], c["camera"], c["objects"], c["lights"])
+            if measure:
+                costs[0, y - y0, x - x0] = stats["bvh_nodes"] - nodes
+                costs[1, y - y0, x - x0] = stats["primitive_tests"] - prims
+    return pixels, costs
+
+
+def render_preview_task(task):
+    """Progressive preview pass over task = (tile, step, coarsest step).
+
+    Traces the first AA sample of each pixel progressive.pass_pixels picks
+    and returns (tile, step, colors, counters) with colors an (N, 3) uint8
+    array and counters as in render_tile_task.
+    """
+    tile, step, coarsest = task
+    _reset_trace_stats()
+    ys, xs = pass_pixels(tile, step, coarsest)
+    ox, oy = sample_offsets()[0]
+    colors = _trace_samples(xs, ys, np.full(len(xs), ox), np.full(len(xs), oy))
+    return tile, step, colors.astype(np.uint8), dict(config.trace_stats, samples=len(xs))
+
+
+def render_refine_task(tile):
+    """Progressive refine pass: for every pixel of tile, trace the AA samples
+    after the first and return (tile, sums, counters) with sums a uint16
+    (y1 - y0, x1 - x0, 3) array."""
+    _reset_trace_stats()
+    x0, y0, x1, y1 = tile
+    ys, xs = np.mgrid[y0:y1, x0:x1]
+    offsets = sample_offsets()[1:]
+    k = len(offsets)
+    colors = _trace_samples(np.repeat(xs.ravel(), k), np.repeat(ys.ravel(), k),
+                            np.tile(offsets[:, 0], xs.size), np.tile(offsets[:, 1], xs.size))
+    sums = colors.reshape(xs.size, k, 3).sum(axis=1)
+    counters = dict(config.trace_stats, samples=xs.size * k)
+    return tile, sums.reshape(y1 - y0, x1 - x0, 3).astype(np.uint16), counters
+
+
+def _reset_trace_stats():
+    for key in config.trace_stats:
+        config.trace_stats[key] = 0
+
+
+def _trace_samples(xs, ys, ox, oy, object_ids=False):
+    """Colors of single samples at pixels (xs, ys) + sub-pixel offsets (ox, oy)
+    with the worker's scene and engine, as an (N, 3) float array.
+
+    With object_ids, also returns an int array identifying the object each
+    primary ray hit (-1 for misses); ids are only comparable within a worker.
+    """
+    c = _worker_ctx
+    width, height, camera = c["width"], c["height"], c["camera"]
+    if c["engine"] == "packet":
+        if "packet_scene" not in c:
+            c["packet_scene"] = packet.PacketScene(c["objects"], c["lights"])
+        return packet.render_samples(c["packet_scene"], camera, width, height,
+                                     xs, ys, ox, oy, object_ids)
+
+    colors = np.zeros((len(xs), 3))
+    ids = np.full(len(xs), -1, dtype=np.int64)
+    objects, lights = c["objects"], c["lights"]
+    numbering = {}  # id() of each hit object -> small int
+    for i, (x, y, offset_x, offset_y) in enumerate(zip(xs.tolist(), ys.tolist(),
+                                                        ox.tolist(), oy.tolist())):
+        # Same arithmetic as render_pixel_with_aa
+        u = ((x + offset_x) / width) * 2 - 1
+        v = 1 - ((y + offset_y) / height) * 2
+        ray = camera.get_ray(u, v)
+        if not object_ids:
+            colors[i] = trace_ray(ray, objects, lights)
+            continue
+        hit = None
+        if config.MAX_DEPTH > 0:
+            config.trace_stats["primary_rays"] += 1
+            hit = closest_hit(ray, objects)
+        colors[i] = shade_hit(ray, hit, objects, lights)
+        if hit is not None:
+            ids[i] = numbering.setdefault(id(hit.obj), len(numbering))
+    return (colors, ids) if object_ids else colors
@@ -0,0 +1,224 @@
+"""Long-lived render worker pool reused across renders.
+
+A fresh multiprocessing.Pool per render pays for process start-up, module
+imports and a full scene transfer every time. RenderService keeps its
+workers alive instead and ships scenes through a small on-disk store:
+
+- the scene (camera, lights, objects, engine and config values) is pickled
+  with every Mesh replaced by a reference to its content hash, and only
+  written again when those bytes change
+- each distinct mesh is written once, keyed by Mesh.content_hash(); workers
+  keep loaded meshes resident and reuse them for every later scene that
+  references the same hash (with that scene's material)
+
+Tasks carry the scene file path, so a worker reloads only when the
+scene it last used is out of date.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+
+import config
+from core.objects.mesh import Mesh
+from renderer import raytracer
+from renderer.framebuffer import SharedFramebuffer
+
+# Config values that affect the image; shipped with every scene update.
+SCENE_CONFIG = ("MAX_DEPTH", "AA_SAMPLES", "BVH_METHOD", "BVH_BINS", "BVH_LEAF_SIZE",
+                "MESH_LEAF_SIZE", "BVH_WIDTH", "ADAPTIVE_AA", "ADAPTIVE_CONTRAST",
+                "ADAPTIVE_VARIANCE")
+
+
+class _ScenePickler(pickle.Pickler):
+    """Pickles meshes as (hash, material, name) references, storing each
+    distinct mesh through store_mesh."""
+
+    def __init__(self, file, store_mesh):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store_mesh = store_mesh
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Mesh):
+            return ("mesh", self._store_mesh(obj), obj.material, obj.name)
+        return None
+
+
+class _SceneUnpickler(pickle.Unpickler):
+    """Resolves mesh references; references to one mesh with one material
+    and name (e.g. the Instances sharing a Mesh) load as a single object."""
+
+    def __init__(self, file, resolve_mesh):
+        super().__init__(file)
+        self._resolve_mesh = resolve_mesh
+        self._loaded = {}
+
+    def persistent_load(self, pid):
+        _, digest, material, name = pid
+        key = (digest, id(material), name)
+        if key not in self._loaded:
+            self._loaded[key] = self._resolve_mesh(digest).with_material(material, name)
+        return self._loaded[key]
+
+
+class RenderService:
+    """Warm worker pool that renders tiles of the most recent scene.
+
+    Call set_scene() before each render (cheap when nothing changed), then
+    iterate render_tiles(). cancel() abandons the tiles of the running
+    render; close() shuts the workers down and removes the scene store.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self._store = tempfile.mkdtemp(prefix="raytracer-scenes-")
+        self._meshes = {}  # content hash -> file in the store
+        self._scene_digest = None
+        self._scene_path = None
+        self._generation = multiprocessing.Value("i", 0, lock=False)
+        self.stats = {"scene_uploads": 0, "mesh_uploads": 0}
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_service_worker,
+                                          initargs=(self._generation, self._store))
+
+    def set_scene(self, width, height, camera, objects, lights, engine="scalar"):
+        """Publish the scene for the next render. Returns True if anything
+        changed since the previous call (i.e. the workers will reload)."""
+        scene = {"width": width, "height": height, "camera": camera, "objects": objects,
+                 "lights": lights, "engine": engine,
+                 "config": {k: getattr(config, k) for k in SCENE_CONFIG}}
+        used = set()
+
+        def store_mesh(mesh):
+            digest = self._store_mesh(mesh)
+            used.add(digest)
+            return digest
+
+        buffer = io.BytesIO()
+        _ScenePickler(buffer, store_mesh).dump(scene)
+        data = buffer.getvalue()
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == self._scene_digest:
+            return False
+
+        path = os.path.join(self._store, f"scene-{digest}.pkl")
+        _write_file(path, data)
+        if self._scene_path is not None:
+            os.remove(self._scene_path)
+        self._scene_digest, self._scene_path = digest, path
+        for old in set(self._meshes) - used:
+            os.remove(self._meshes.pop(old))
+        self.stats["scene_uploads"] += 1
+        return True
+
+    def _store_mesh(self, mesh):
+        digest = mesh.content_hash()
+        if digest not in self._meshes:
+            path = os.path.join(self._store, f"mesh-{digest}.pkl")
+            _write_file(path, pickle.dumps(mesh, protocol=pickle.HIGHEST_PROTOCOL))
+            self._meshes[digest] = path
+            self.stats["mesh_uploads"] += 1
+        return digest
+
+    def render_tiles(self, tiles, framebuffer=None):
+        """Render tiles of the current scene; yields (tile, pixels, counters)
+        in completion order like tiles.render_tiles (pixels is None when
+        they were written into framebuffer, a SharedFramebuffer)."""
+        return self.map(raytracer.render_tile_task, tiles, framebuffer)
+
+    def map(self, func, payloads, framebuffer=None):
+        """Run a raytracer worker function (e.g. render_tile_task) on each
+        payload against the current scene; yields results in completion order.
+        Payloads skipped after cancel() yield (payload, None)."""
+        if self._scene_path is None:
+            raise RuntimeError("RenderService.set_scene() must be called before rendering")
+        self._generation.value += 1
+        fb = None if framebuffer is None else (framebuffer.name, framebuffer.width, framebuffer.height)
+        tasks = [(self._scene_path, fb, self._generation.value, func, payload) for payload in payloads]
+        return self._pool.imap_unordered(_service_task, tasks)
+
+    def cancel(self):
+        """Make workers skip the remaining tiles of the current render."""
+        self._generation.value += 1
+
+    def close(self):
+        if self._pool is not None:
+            self.cancel()
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            shutil.rmtree(self._store, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _write_file(path, data):
+    # Write then rename, so a worker never reads a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# --- Worker side --------------------------------------------------------------
+_service = {}
+
+
+def _init_service_worker(generation, store):
+    _service["generation"] = generation
+    _service["store"] = store
+    _service["scene_path"] = None
+    _service["framebuffer"] = None
+    _service["fb_key"] = None
+    _service["resident"] = {}  # content hash -> Mesh
+    _service["mesh_loads"] = 0
+
+
+def _resolve_mesh(digest):
+    resident = _service["resident"]
+    if digest not in resident:
+        with open(os.path.join(_service["store"], f"mesh-{digest}.pkl"), "rb") as f:
+            resident[digest] = pickle.load(f)
+        _service["mesh_loads"] += 1
+    _service["used"].add(digest)
+    return resident[digest]
+
+
+def _load_scene(path):
+    _service["used"] = set()
+    with open(path, "rb") as f:
+        scene = _SceneUnpickler(f, _resolve_mesh).load()
+    # Meshes the new scene no longer references are dropped
+    for digest in set(_service["resident"]) - _service["used"]:
+        del _service["resident"][digest]
+    for key, value in scene["config"].items():
+        setattr(config, key, value)
+    raytracer.init_worker(scene["width"], scene["height"], scene["camera"], scene["objects"],
+                          scene["lights"], scene["engine"])
+    _service["scene_path"] = path
+
+
+def _service_task(args):
+    scene_path, fb, generation, func, payload = args
+    if generation != _service["generation"].value:
+        return payload, None  # cancelled render: skip the remaining tasks
+    if scene_path != _service["scene_path"]:
+        _load_scene(scene_path)
+    if fb != _service["fb_key"]:
+        if _service["framebuffer"] is not None:
+            _service["framebuffer"].release()
+        _service["framebuffer"] = None if fb is None else SharedFramebuffer(fb[1], fb[2], fb[0])
+        _service["fb_key"] = fb
+    raytracer._worker_ctx["framebuffer"] = _service["framebuffer"]
+    return func(payload)
+
+
+def _worker_state(_=None):
+    """(pid, resident mesh hashes, mesh loads so far) — for tests and debugging."""
+    return os.getpid(), sorted(_service["resident"]), _service["mesh_loads"]
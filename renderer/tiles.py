@@ -0,0 +1,51 @@
+"""Tile scheduling for multiprocess rendering.
+
+The frame is cut into rectangular tiles that workers render independently.
+Tiles are handed out through Pool.imap_unordered, so a costly tile never
+holds back the rest and results arrive as soon as each tile finishes.
+"""
+import math
+
+import config
+from renderer.raytracer import render_tile_task
+
+ORDERS = ("rows", "spiral")
+
+
+def make_tiles(width, height, tile_size=None, order=None):
+    """Cut a width x height frame into (x0, y0, x1, y1) tiles.
+
+    order is "rows" (left to right, top to bottom) or "spiral" (outward from
+    the image center, ring by ring, so the subject usually appears first).
+    Unset arguments default to config.TILE_SIZE / TILE_ORDER.
+    """
+    tile_size = max(1, tile_size or config.TILE_SIZE)
+    order = order or config.TILE_ORDER
+    if order not in ORDERS:
+        raise ValueError(f"Unknown tile order: {order}")
+
+    tiles = [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+             for y0 in range(0, height, tile_size)
+             for x0 in range(0, width, tile_size)]
+    if order == "spiral":
+        cx, cy = width / 2.0, height / 2.0
+
+        def ring_and_angle(tile):
+            # Tile center relative to the image center, in tile units
+            dx = ((tile[0] + tile[2]) / 2.0 - cx) / tile_size
+            dy = ((tile[1] + tile[3]) / 2.0 - cy) / tile_size
+            return (math.floor(max(abs(dx), abs(dy))), math.atan2(dy, dx))
+
+        tiles.sort(key=ring_and_angle)
+    return tiles
+
+
+def render_tiles(pool, tiles):
+    """Render tiles on a pool set up with raytracer.init_worker.
+
+    Yields ((x0, y0, x1, y1), pixels, counters) in completion order, pixels
+    being the tile's (y1 - y0, x1 - x0, 3) uint8 buffer, or None when the
+    workers write into a shared framebuffer, and counters the tile's work
+    (see raytracer.render_tile_task).
+    """
+    return pool.imap_unordered(render_tile_task, tiles)
@@ -1,3 +1,4 @@
+import json
 import sys
 import time
 from datetime import timedelta
@@ -6,12 +7,13 @@ from PIL import Image
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QProgressBar,
     QWidget, QPushButton, QComboBox, QSpinBox, QDoubleSpinBox, QListWidget,
-    QGroupBox, QFormLayout, QMessageBox,
+    QGroupBox, QFormLayout, QMessageBox, QCheckBox,
 )
 from PyQt5.QtGui import QPixmap, QImage, QFont
 from PyQt5.QtCore import Qt, QTimer, pyqtSlot
 
 import config
+from renderer.service import RenderService
 from renderer.ui.render_thread import RenderThread
 from renderer.ui.scene_builder import build_scene
 from renderer.ui.object_dialog import (
@@ -25,6 +27,7 @@ class RayTracerWindow(QMainWindow):
         self.object_specs = []
         self.light_specs = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
         self.render_thread = None
+        self.render_service = None  # warm worker pool, started on first render
         self._stopped_by_user = False
         self.img_array = np.zeros((300, 400, 3), dtype=np.uint8)
         self.initUI()
@@ -80,10 +83,13 @@ class RayTracerWindow(QMainWindow):
         self.time_label = QLabel("Süre: 00:00:00")
         self.pixels_label = QLabel("İşlenen Piksel: 0 / 0 (%0.0)")
         self.rays_label = QLabel("Ray Sayısı: 0")
+        self.ray_kinds_label = QLabel("Birincil: 0  Gölge: 0  Yansıma: 0  Kırılma: 0")
+        self.spp_label = QLabel("Örnek/Piksel: 0.00")
+        self.bvh_label = QLabel("BVH Düğümü: 0  AABB Testi: 0  Primitif Testi: 0")
         self.speed_label = QLabel("Piksel/Saniye: 0.0")
         self.eta_label = QLabel("Tahmini Kalan Süre: --:--:--")
-        for w in (self.time_label, self.pixels_label, self.rays_label,
-                  self.speed_label, self.eta_label):
+        for w in (self.time_label, self.pixels_label, self.rays_label, self.ray_kinds_label,
+                  self.spp_label, self.bvh_label, self.speed_label, self.eta_label):
             w.setObjectName("statLabel")
             stats_layout.addWidget(w)
         stats_card.setLayout(stats_layout)
@@ -132,6 +138,21 @@ class RayTracerWindow(QMainWindow):
         self.width_spin = QSpinBox(); self.width_spin.setRange(1, 4000); self.width_spin.setValue(400)
         self.height_spin = QSpinBox(); self.height_spin.setRange(1, 4000); self.height_spin.setValue(300)
         self.aa_spin = QSpinBox(); self.aa_spin.setRange(1, 4); self.aa_spin.setValue(1)
+        self.adaptive_check = QCheckBox("Kenarlarda daha fazla örnek")
+        self.adaptive_check.setChecked(config.ADAPTIVE_AA)
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("Skaler", "scalar")
+        self.engine_combo.addItem("Paket (NumPy)", "packet")
+        self.bvh_combo = QComboBox()
+        self.bvh_combo.addItem("Medyan", "median")
+        self.bvh_combo.addItem("SAH (binned)", "sah")
+        self.bvh_combo.addItem("LBVH (Morton)", "lbvh")
+        self.tile_spin = QSpinBox(); self.tile_spin.setRange(4, 512); self.tile_spin.setValue(config.TILE_SIZE)
+        self.tile_order_combo = QComboBox()
+        self.tile_order_combo.addItem("Spiral (merkezden)", "spiral")
+        self.tile_order_combo.addItem("Satır satır", "rows")
+        self.progressive_check = QCheckBox("Önce kaba önizleme")
+        self.progressive_check.setChecked(config.PROGRESSIVE)
 
         self.cam_x = QDoubleSpinBox(); self.cam_x.setRange(-1000, 1000); self.cam_x.setValue(0.0)
         self.cam_y = QDoubleSpinBox(); self.cam_y.setRange(-1000, 1000); self.cam_y.setValue(3.0)
@@ -143,6 +164,12 @@ class RayTracerWindow(QMainWindow):
         form.addRow("Genişlik", self.width_spin)
         form.addRow("Yükseklik", self.height_spin)
         form.addRow("Anti-aliasing", self.aa_spin)
+        form.addRow("Uyarlamalı AA", self.adaptive_check)
+        form.addRow("Motor", self.engine_combo)
+        form.addRow("BVH", self.bvh_combo)
+        form.addRow("Karo Boyutu", self.tile_spin)
+        form.addRow("Karo Sırası", self.tile_order_combo)
+        form.addRow("İlerlemeli", self.progressive_check)
         form.addRow("Kamera X", self.cam_x)
         form.addRow("Kamera Y", self.cam_y)
         form.addRow("Kamera Z", self.cam_z)
@@ -179,7 +206,9 @@ class RayTracerWindow(QMainWindow):
 
         # collect controls to enable/disable during render
         self._controls = [self.type_combo, add_btn, del_btn, self.object_list,
-                          self.width_spin, self.height_spin, self.aa_spin,
+                          self.width_spin, self.height_spin, self.aa_spin, self.adaptive_check,
+                          self.engine_combo, self.bvh_combo,
+                          self.tile_spin, self.tile_order_combo, self.progressive_check,
                           self.cam_x, self.cam_y, self.cam_z,
                           self.target_x, self.target_y, self.target_z,
                           add_light_btn, del_light_btn, self.light_list]
@@ -228,6 +257,7 @@ class RayTracerWindow(QMainWindow):
         height = self.height_spin.value()
         camera_pos = (self.cam_x.value(), self.cam_y.value(), self.cam_z.value())
         look_at = (self.target_x.value(), self.target_y.value(), self.target_z.value())
+        config.BVH_METHOD = self.bvh_combo.currentData()
 
         try:
             camera, objects, lights = build_scene(
@@ -238,6 +268,7 @@ class RayTracerWindow(QMainWindow):
             return
 
         config.AA_SAMPLES = self.aa_spin.value()
+        config.ADAPTIVE_AA = self.adaptive_check.isChecked()
 
         self.image_label.setFixedSize(width, height)
         self.img_array = np.zeros((height, width, 3), dtype=np.uint8)
@@ -249,8 +280,16 @@ class RayTracerWindow(QMainWindow):
         self.start_btn.setText("Stop")
 
         self._stopped_by_user = False
-        self.render_thread = RenderThread(width, height, camera, objects, lights)
+        if self.render_service is None:
+            self.render_service = RenderService()
+        self.render_thread = RenderThread(width, height, camera, objects, lights,
+                                          engine=self.engine_combo.currentData(),
+                                          tile_size=self.tile_spin.value(),
+                                          tile_order=self.tile_order_combo.currentData(),
+                                          service=self.render_service,
+                                          progressive=self.progressive_check.isChecked())
         self.render_thread.update_signal.connect(self.updateRender)
+        self.render_thread.dirty_signal.connect(self.updateRegion)
         self.render_thread.finished_signal.connect(self.renderFinished)
         self.render_thread.progress_signal.connect(self.updateProgress)
         self.render_thread.start()
@@ -266,19 +305,31 @@ class RayTracerWindow(QMainWindow):
         if self.stats_timer.isActive():
             self.stats_timer.stop()
 
-    @pyqtSlot(np.ndarray, int, int)
-    def updateRender(self, img_array, start_row, end_row):
-        self.img_array[start_row:end_row, :, :] = img_array[start_row:end_row, :, :]
+    @pyqtSlot(np.ndarray, int, int, int, int)
+    def updateRender(self, pixels, x0, y0, x1, y1):
+        self.img_array[y0:y1, x0:x1, :] = pixels
         self.updateImage(self.img_array)
 
+    @pyqtSlot(int, int, int, int)
+    def updateRegion(self, x0, y0, x1, y1):
+        # Shared-framebuffer mode: copy just the dirty tile out of shared memory
+        framebuffer = self.render_thread.framebuffer
+        if framebuffer is not None:
+            self.img_array[y0:y1, x0:x1, :] = framebuffer.array[y0:y1, x0:x1, :]
+            self.updateImage(self.img_array)
+
     @pyqtSlot(np.ndarray)
     def renderFinished(self, img_array):
+        self.render_thread.release_framebuffer()
         self.img_array = img_array
         self.updateImage(self.img_array)
         self.updateStats()
         self._reset_to_idle()
         if not getattr(self, "_stopped_by_user", False):
             Image.fromarray(self.img_array).save("output.png")
+            # Machine-readable counters next to the image, like the CLI's stats file
+            with open("output.json", "w") as f:
+                json.dump(config.render_stats, f, indent=2)
             total_time = config.render_stats["end_time"] - config.render_stats["start_time"]
             if total_time > 0:
                 print(f"Rendering completed in {total_time:.2f} seconds")
@@ -310,7 +361,16 @@ class RayTracerWindow(QMainWindow):
         self.pixels_label.setText(
             f"İşlenen Piksel: {config.render_stats['processed_pixels']} / "
             f"{config.render_stats['total_pixels']} (%{progress:.1f})")
-        self.rays_label.setText(f"Ray Sayısı: {config.render_stats['ray_count']}")
+        stats = config.render_stats
+        self.rays_label.setText(f"Ray Sayısı: {stats['ray_count']}")
+        self.ray_kinds_label.setText(
+            f"Birincil: {stats['primary_rays']}  Gölge: {stats['shadow_rays']}  "
+            f"Yansıma: {stats['reflection_rays']}  Kırılma: {stats['refraction_rays']}")
+        self.bvh_label.setText(
+            f"BVH Düğümü: {stats['bvh_nodes']}  AABB Testi: {stats['aabb_tests']}  "
+            f"Primitif Testi: {stats['primitive_tests']}")
+        spp = config.render_stats["samples"] / max(1, config.render_stats["processed_pixels"])
+        self.spp_label.setText(f"Örnek/Piksel: {spp:.2f}")
         self.speed_label.setText(f"Piksel/Saniye: {fps:.1f}")
 
         if 0 < progress < 100:
@@ -324,6 +384,10 @@ class RayTracerWindow(QMainWindow):
         if self.render_thread is not None and self.render_thread.isRunning():
             self.render_thread.stop()
             self.render_thread.wait()
+        if self.render_thread is not None:
+            self.render_thread.release_framebuffer()
+        if self.render_service is not None:
+            self.render_service.close()
         event.accept()
 
 
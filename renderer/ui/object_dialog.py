@@ -116,7 +116,7 @@ class ObjectDialog(QDialog):
 
     def _pick_file(self):
         path, _ = QFileDialog.getOpenFileName(
-            self, "OBJ Dosyası Seç", "", "OBJ Dosyaları (*.obj)")
+            self, "OBJ Dosyası Seç", "", "OBJ Dosyaları (*.obj *.obj.gz)")
         if path:
             self._obj_path = path
             self._file_label.setText(path.split("/")[-1])
@@ -3,24 +3,48 @@ import numpy as np
 import multiprocessing
 from PyQt5.QtCore import QThread, pyqtSignal
 import config
-from renderer.raytracer import init_worker, render_pixel_coord
+from renderer.framebuffer import SharedFramebuffer
+from renderer.progressive import ProgressiveFrame, pass_steps
+from renderer.raytracer import (init_worker, render_preview_task, render_refine_task,
+                                render_tile_task)
+from renderer.tiles import make_tiles
 
 class RenderThread(QThread):
     """
     Class that runs the render process in a separate thread.
     """
-    update_signal = pyqtSignal(np.ndarray, int, int)
+    # Tile pixels and their rectangle (x0, y0, x1, y1) in the frame
+    update_signal = pyqtSignal(np.ndarray, int, int, int, int)
+    # Shared-framebuffer mode: only the dirty rectangle (x0, y0, x1, y1)
+    dirty_signal = pyqtSignal(int, int, int, int)
     finished_signal = pyqtSignal(np.ndarray)
     progress_signal = pyqtSignal(int)
     
-    def __init__(self, width, height, camera, objects, lights):
+    def __init__(self, width, height, camera, objects, lights, engine="scalar",
+                 tile_size=None, tile_order=None, shared_framebuffer=None, service=None,
+                 progressive=None):
         super().__init__()
         self.width = width
         self.height = height
         self.camera = camera
         self.objects = objects
         self.lights = lights
-        self.img_array = np.zeros((height, width, 3), dtype=np.uint8)
+        self.engine = engine
+        # Optional RenderService whose warm workers are used instead of a
+        # pool created for this render
+        self.service = service
+        self.tiles = make_tiles(width, height, tile_size, tile_order)
+        # Coarse-to-fine preview passes before the full-quality pixels
+        self.progressive = config.PROGRESSIVE if progressive is None else progressive
+        if shared_framebuffer is None:
+            shared_framebuffer = config.SHARED_FRAMEBUFFER
+        # In shared mode workers write into self.framebuffer and img_array is
+        # a view of it; the owner must call release_framebuffer() when done.
+        self.framebuffer = SharedFramebuffer(width, height) if shared_framebuffer else None
+        if self.framebuffer is not None:
+            self.img_array = self.framebuffer.array
+        else:
+            self.img_array = np.zeros((height, width, 3), dtype=np.uint8)
         self.running = True
     
     def run(self):
@@ -29,41 +53,127 @@ class RenderThread(QThread):
         config.render_stats["end_time"] = 0
         config.render_stats["processed_pixels"] = 0
         config.render_stats["total_pixels"] = self.width * self.height
+        for key in ("samples", "border_samples", "tile_time") + config.TRACE_COUNTERS:
+            config.render_stats[key] = 0
+        self._done = 0
 
-        # Create the worker pool ONCE and reuse it for every row. The scene is
-        # shipped to each worker a single time via the pool initializer; per-row
-        # tasks then carry only (x, y) coordinates. Passing the scene in every
+        if self.service is not None:
+            self.service.set_scene(self.width, self.height, self.camera,
+                                   self.objects, self.lights, self.engine)
+            self._render(lambda func, payloads: self.service.map(func, payloads, self.framebuffer))
+        else:
+            self._run_pool()
+
+        config.render_stats["end_time"] = time.time()
+        # A copy, so receivers never hold a view into the shared block
+        self.finished_signal.emit(self.img_array.copy() if self.framebuffer else self.img_array)
+
+    def _run_pool(self):
+        # Create the worker pool ONCE and reuse it for every tile. The scene is
+        # shipped to each worker a single time via the pool initializer; tile
+        # tasks then carry only their rectangle. Passing the scene in every
         # task tuple re-pickles the whole scene (incl. large mesh BVH trees) per
-        # pixel, which otherwise dominates render time (minutes of overhead).
+        # task, which otherwise dominates render time (minutes of overhead).
         pool = multiprocessing.Pool(
             processes=multiprocessing.cpu_count(),
             initializer=init_worker,
             initargs=(self.width, self.height, self.camera,
-                      self.objects, self.lights))
+                      self.objects, self.lights, self.engine, self.framebuffer))
         try:
-            for y in range(self.height):
+            self._render(pool.imap_unordered)
+        finally:
+            # Stopping abandons tiles still queued instead of waiting for them
+            if self.running:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    def _render(self, map_tasks):
+        """Render the frame with map_tasks(worker function, payloads), which
+        yields results in completion order (a pool's imap_unordered or
+        RenderService.map)."""
+        if self.progressive:
+            self._run_progressive(map_tasks)
+        else:
+            self._collect(map_tasks(render_tile_task, self.tiles))
+
+    def _run_progressive(self, map_tasks):
+        # Preview passes show one sample per block (progressive.py); the
+        # refine pass then adds the remaining AA samples. Samples are never
+        # traced twice, so the finished image equals a regular render. The
+        # shared framebuffer only serves as img_array here: previews are
+        # composited in this thread.
+        frame = ProgressiveFrame(self.width, self.height)
+        samples = frame.aa * frame.aa
+        steps = pass_steps()
+        for step in steps:
+            payloads = [(tile, step, steps[0]) for tile in self.tiles]
+            for result in map_tasks(render_preview_task, payloads):
                 if not self.running:
-                    break
+                    return
+                tile, _, colors, counters = result
+                self._show(frame, frame.add_preview(tile, step, steps[0], colors))
+                self._add_counters(counters)
+                self._count_pixels(len(colors) / samples)
+        if samples == 1:
+            return
+        for result in map_tasks(render_refine_task, self.tiles):
+            if not self.running:
+                return
+            tile, sums, counters = result
+            x0, y0, x1, y1 = tile
+            self._show(frame, frame.add_refinement(tile, sums))
+            self._add_counters(counters)
+            self._count_pixels((x1 - x0) * (y1 - y0) * (samples - 1) / samples)
 
-                args = [(x, y) for x in range(self.width)]
-                results = pool.starmap(render_pixel_coord, args)
+    def _show(self, frame, region):
+        x0, y0, x1, y1 = region
+        pixels = frame.image[y0:y1, x0:x1]
+        self.img_array[y0:y1, x0:x1] = pixels
+        self.update_signal.emit(pixels.copy(), x0, y0, x1, y1)
 
-                for x in range(self.width):
-                    self.img_array[y, x] = results[x]
-                config.render_stats["processed_pixels"] += self.width
+    def _collect(self, results):
+        for result in results:
+            if not self.running:
+                break
+            tile, pixels, counters = result
+            if pixels is not None:
+                x0, y0, x1, y1 = tile
+                self.img_array[y0:y1, x0:x1] = pixels
+            self._add_counters(counters)
+            self._tile_done(pixels, tile)
 
-                avg_rays_per_pixel = config.AA_SAMPLES * config.AA_SAMPLES * (1 + len(self.lights))
-                config.render_stats["ray_count"] = \
-                    config.render_stats["processed_pixels"] * avg_rays_per_pixel
+    def _tile_done(self, pixels, tile):
+        x0, y0, x1, y1 = tile
+        if pixels is None:
+            self.dirty_signal.emit(x0, y0, x1, y1)
+        else:
+            self.update_signal.emit(pixels, x0, y0, x1, y1)
+        self._count_pixels((x1 - x0) * (y1 - y0))
 
-                self.update_signal.emit(self.img_array.copy(), y, y + 1)
-                self.progress_signal.emit(config.render_stats["processed_pixels"])
-        finally:
-            pool.close()
-            pool.join()
+    def _add_counters(self, counters):
+        """Add a tile's worker counters (samples, rays, BVH work) to the stats."""
+        for key, value in counters.items():
+            config.render_stats[key] += value
+        config.render_stats["ray_count"] = sum(
+            config.render_stats[key] for key in config.RAY_COUNTERS)
+
+    def _count_pixels(self, pixels):
+        """Advance progress by a number of finished pixels (fractional for
+        progressive passes that take some of each pixel's samples)."""
+        self._done += pixels
+        config.render_stats["processed_pixels"] = int(round(self._done))
+        self.progress_signal.emit(config.render_stats["processed_pixels"])
 
-        config.render_stats["end_time"] = time.time()
-        self.finished_signal.emit(self.img_array)
-    
     def stop(self):
         self.running = False
+        if self.service is not None:
+            self.service.cancel()
+
+    def release_framebuffer(self):
+        """Free the shared framebuffer (call after finished_signal was handled)."""
+        if self.framebuffer is not None:
+            self.img_array = self.img_array.copy()
+            self.framebuffer.release()
+            self.framebuffer = None
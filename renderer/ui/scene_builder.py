@@ -1,10 +1,14 @@
+from collections import Counter
+
 from utils.vector import Vector3D
 from core.objects.sphere import Sphere
 from core.objects.plane import Plane
+from core.objects.instance import Instance
 from utils.obj_loader import OBJLoader
 from core.camera import Camera
 from core.light import Light
-from core.bvh import BVHNode
+from core.bvh import FlatBVH
+from utils.matrix import Matrix3D
 
 
 def make_material(diffuse, reflectivity):
@@ -20,11 +24,41 @@ def make_material(diffuse, reflectivity):
     }
 
 
-def build_object(spec):
+def geometry_key(spec):
+    """Key of the mesh a cube/tetra/obj spec needs at the origin, or None.
+
+    Specs with equal keys can share one Mesh (and its BVH) as instances.
+    """
+    t = spec["type"]
+    if t in ("cube", "tetra"):
+        return (t, float(spec["size"]))
+    if t == "obj":
+        return (t, spec["path"], float(spec["scale"]))
+    return None
+
+
+def _origin_mesh(spec):
+    """Load or create a spec's mesh at the origin (for sharing between instances)."""
+    t = spec["type"]
+    origin = Vector3D(0, 0, 0, 1)
+    if t == "cube":
+        return OBJLoader.create_cube(spec["material"], origin, spec["size"])
+    if t == "tetra":
+        return OBJLoader.create_tetrahedron(spec["material"], origin, spec["size"])
+    return OBJLoader.load(spec["path"], spec["material"], spec["scale"], origin)
+
+
+def build_object(spec, meshes=None):
     """Map a single object-spec dict to a scene object.
 
     Supported types: sphere, cube, tetra, plane, obj.
     Raises ValueError on unknown type; propagates OBJLoader errors for obj.
+
+    cube/tetra/obj specs become a Mesh with the position baked into the
+    vertices, or an Instance of a mesh built at the origin when the spec has
+    a "rotation" ([x, y, z] degrees, see Matrix3D.rotation) or a meshes dict
+    is given. meshes maps geometry_key to shared meshes and is filled as
+    meshes are built, so every spec with the same key uses one Mesh.
     """
     t = spec["type"]
     material = spec["material"]
@@ -38,6 +72,19 @@ def build_object(spec):
         normal = Vector3D(*spec["normal"], 0)
         return Plane(point, normal, material)
 
+    key = geometry_key(spec)
+    if key is not None and (meshes is not None or spec.get("rotation")):
+        if meshes is None:
+            mesh = _origin_mesh(spec)
+        elif key in meshes:
+            mesh = meshes[key]
+        else:
+            mesh = meshes[key] = _origin_mesh(spec)
+        transform = Matrix3D.translation(*spec["position" if t == "obj" else "center"])
+        if spec.get("rotation"):
+            transform = transform @ Matrix3D.rotation(*spec["rotation"])
+        return Instance(mesh, transform, material)
+
     if t == "cube":
         center = Vector3D(*spec["center"], 1)
         return OBJLoader.create_cube(material, center, spec["size"])
@@ -65,8 +112,10 @@ def build_scene(width, height, object_specs, light_specs,
                 camera_pos=(0, 3, 8), look_at=(0, 1, 0)):
     """Build (camera, objects, lights) from object/light specs and settings.
 
-    Finite objects (sphere/cube/tetra/obj) go into a BVH; planes are kept
-    separate (infinite, excluded from the BVH).
+    Finite objects (sphere/cube/tetra/obj) go into a flattened BVH; planes
+    are kept separate (infinite, excluded from the BVH). Meshes used by more
+    than one spec (same geometry_key) are built once and placed as
+    Instances, so the scene BVH is the top level over them.
     """
     camera_position = Vector3D(camera_pos[0], camera_pos[1], camera_pos[2], 1)
     look_at_v = Vector3D(look_at[0], look_at[1], look_at[2], 0)
@@ -77,8 +126,11 @@ def build_scene(width, height, object_specs, light_specs,
 
     finite_objects = []
     planes = []
-    for spec in object_specs:
-        obj = build_object(spec)
+    keys = [geometry_key(spec) for spec in object_specs]
+    repeated = {key for key, n in Counter(keys).items() if key is not None and n > 1}
+    meshes = {}
+    for spec, key in zip(object_specs, keys):
+        obj = build_object(spec, meshes if key in repeated else None)
         if isinstance(obj, Plane):
             planes.append(obj)
         else:
@@ -86,10 +138,29 @@ def build_scene(width, height, object_specs, light_specs,
 
     objects = []
     if finite_objects:
-        bvh = BVHNode.build(finite_objects)
+        bvh = FlatBVH.build(finite_objects)
         objects.append(bvh)
     objects.extend(planes)
 
     lights = [build_light(s) for s in light_specs]
 
     return camera, objects, lights
+
+
+def refit_scene(objects):
+    """Update build_scene's objects after finite objects moved in place.
+
+    Spheres moved by changing center, meshes by Mesh.set_vertices and
+    instances by Instance.set_transform keep the scene BVH's topology, so
+    it is refitted in O(n) rather than rebuilt; it is rebuilt only once the
+    refit has degraded it past config.BVH_REBUILD_RATIO. Returns the objects
+    list (the BVH entry may be a new FlatBVH).
+    """
+    result = []
+    for obj in objects:
+        if isinstance(obj, FlatBVH):
+            obj.refit()
+            if obj.needs_rebuild():
+                obj = FlatBVH.build(obj.primitives)
+        result.append(obj)
+    return result
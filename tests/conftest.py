@@ -0,0 +1,14 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import config
+
+
+@pytest.fixture(autouse=True)
+def _no_mesh_cache(monkeypatch):
+    """Keep OBJLoader.load out of the user's mesh cache: every test parses
+    its models afresh. The mesh cache tests point config.MESH_CACHE_DIR at
+    a temporary directory themselves."""
+    monkeypatch.setattr(config, "MESH_CACHE_DIR", None)
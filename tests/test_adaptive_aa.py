@@ -0,0 +1,112 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import config
+from renderer.adaptive import edge_pixels, render_tile, sample_rounds
+from renderer.headless import render_image
+from renderer.progressive import sample_offsets
+from renderer.ui.scene_builder import build_scene, make_material
+
+SPECS = [
+    {"type": "sphere", "position": (-1.0, 0.5, -1), "radius": 1.0,
+     "material": make_material((0.8, 0.2, 0.2), 0.3)},
+    {"type": "cube", "center": (1.0, -0.3, 0.5), "size": 0.8,
+     "material": make_material((0.2, 0.8, 0.2), 0.0)},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.2)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+W, H = 40, 30
+
+
+def _render(engine, aa, adaptive, contrast=None, variance=None, workers=1):
+    saved = {k: getattr(config, k) for k in ("AA_SAMPLES", "ADAPTIVE_AA",
+                                             "ADAPTIVE_CONTRAST", "ADAPTIVE_VARIANCE")}
+    try:
+        config.AA_SAMPLES, config.ADAPTIVE_AA = aa, adaptive
+        if contrast is not None:
+            config.ADAPTIVE_CONTRAST, config.ADAPTIVE_VARIANCE = contrast, variance
+        camera, objects, lights = build_scene(W, H, SPECS, LIGHTS)
+        stats = {}
+        img = render_image(W, H, camera, objects, lights, engine, workers, tile_size=8, stats=stats)
+        assert stats["border_samples"] > 0 if adaptive else stats["border_samples"] == 0
+        return img, stats["samples"]
+    finally:
+        for k, v in saved.items():
+            setattr(config, k, v)
+
+
+def test_rounds_cover_grid_once():
+    for aa in (2, 3, 4):
+        corners, rest = sample_rounds(aa)
+        taken = [tuple(o) for o in np.concatenate([corners, rest])]
+        if aa % 2:
+            taken.append((0.5, 0.5))  # the round-1 center is a grid sample
+        assert sorted(taken) == sorted(tuple(o) for o in sample_offsets(aa))
+
+
+def test_edges_from_contrast_and_object_ids():
+    colors = np.zeros((5, 6, 3))
+    ids = np.zeros((5, 6), dtype=np.int64)
+    ids[:, 3:] = 1  # same color, different object
+    mask = edge_pixels(colors, ids, 16)
+    assert mask[:, 1:3].all() and not mask[:, [0, 3]].any()
+    colors[2, 1] = 100  # interior pixel (1, 0): it and its three neighbors
+    mask = edge_pixels(colors, np.zeros_like(ids), 16)
+    assert mask.sum() == 4 and mask[1, 0] and mask[0, 0] and mask[2, 0] and mask[1, 1]
+
+
+def test_border_samples_counted_apart():
+    traced = []
+
+    def trace(xs, ys, ox, oy, object_ids):
+        traced.append(len(xs))
+        colors = np.zeros((len(xs), 3))
+        return (colors, np.zeros(len(xs), dtype=np.int64)) if object_ids else colors
+
+    # A 4 x 3 tile inside a 10 x 8 frame has a full 6 x 5 ring of border pixels
+    pixels, samples, border = render_tile((2, 2, 6, 5), 10, 8, trace, aa=1)
+    assert pixels.shape == (3, 4, 3) and samples == 12 and border == 30 - 12
+    # A tile covering the whole frame has no border to trace
+    traced.clear()
+    _, samples, border = render_tile((0, 0, 4, 3), 4, 3, trace, aa=2)
+    assert samples == 12 and border == 0 and sum(traced) == samples + border
+    # At the frame corner only the border pixels inside the frame are traced
+    _, samples, border = render_tile((0, 0, 4, 3), 10, 8, trace, aa=2)
+    assert samples == 12 and border == 5 * 4 - 12
+
+
+def test_full_refinement_matches_fixed_aa():
+    # Thresholds below zero refine every pixel to the whole grid
+    for engine in ("scalar", "packet"):
+        for aa in (2, 3):
+            expected, fixed_samples = _render(engine, aa, False)
+            img, samples = _render(engine, aa, True, -1, -1)
+            assert np.array_equal(img, expected), (engine, aa)
+            assert fixed_samples == W * H * aa * aa
+            # For even aa the round-1 center is an extra, off-grid sample
+            assert samples == fixed_samples + (W * H if aa % 2 == 0 else 0)
+
+
+def test_adaptive_uses_fewer_samples():
+    for engine in ("scalar", "packet"):
+        img, samples = _render(engine, 4, True)
+        assert W * H < samples < W * H * 16 / 2
+        fixed, _ = _render(engine, 4, False)
+        assert np.abs(img.astype(int) - fixed).mean() < 2
+    parallel, parallel_samples = _render("packet", 4, True, workers=2)
+    assert np.array_equal(parallel, _render("packet", 4, True)[0])
+    assert parallel_samples == samples
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,61 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import tempfile
+from benchmarks import suite
+
+
+def test_compare_flags_slower_times_and_lower_rates():
+    baseline = {"metrics": {"a.render_s": 1.0, "a.packet.primary_rays_per_s": 1000.0,
+                            "b.render_s": 2.0, "gone.render_s": 1.0}}
+    results = {"metrics": {"a.render_s": 1.3, "a.packet.primary_rays_per_s": 950.0,
+                           "b.render_s": 1.0, "new.render_s": 5.0}}
+    rows, regressions = suite.compare(results, baseline, 0.10)
+    assert [r[0] for r in rows] == ["a.packet.primary_rays_per_s", "a.render_s", "b.render_s"]
+    assert [r[0] for r in regressions] == ["a.render_s"]
+    changes = {r[0]: round(r[3], 6) for r in rows}
+    assert changes == {"a.packet.primary_rays_per_s": 0.05, "a.render_s": 0.3, "b.render_s": -0.5}
+    assert suite.compare(results, baseline, 0.5)[1] == []
+
+
+def test_suite_writes_json_and_checks_baseline():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "results.json")
+        args = ["--scenes", "glass", "--width", "8", "--height", "6", "--rays", "20", "--repeat", "1"]
+        assert suite.main(args + ["-o", out]) == 0
+        with open(out) as f:
+            results = json.load(f)
+        metrics = results["metrics"]
+        assert results["meta"]["width"] == 8 and "bunny.obj_load_s" in metrics
+        for engine in ("scalar", "packet"):
+            assert metrics[f"glass.{engine}.render_s"] > 0
+            for kind in suite.RAY_TYPES:
+                assert metrics[f"glass.{engine}.{kind}_rays_per_s"] > 0
+        assert not any(name.startswith("bunny.packet") for name in metrics)
+
+        # A baseline 100x faster than anything possible fails the run
+        fast = {"meta": {}, "metrics": {name: (v / 100 if suite.lower_is_better(name) else v * 100)
+                                        for name, v in metrics.items()}}
+        with open(os.path.join(tmp, "fast.json"), "w") as f:
+            json.dump(fast, f)
+        assert suite.main(args + ["--baseline", os.path.join(tmp, "fast.json")]) == 1
+
+
+def test_packet_not_slower_than_scalar_on_spheres():
+    # The packet engine stream-traverses a BVH over the 1000-sphere grid;
+    # testing every ray against every sphere made it ~2.5x slower than scalar.
+    metrics = suite.run_suite(["spheres"], max_rays=20, repeat=3)["metrics"]
+    assert metrics["spheres.packet.render_s"] <= metrics["spheres.scalar.render_s"]
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
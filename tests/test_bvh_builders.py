@@ -0,0 +1,166 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from utils.vector import Vector3D
+from core.bvh import BVHNode, BVHLeaf, build_flat_arrays
+from core.objects.sphere import Sphere
+from core.ray import Ray
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def _spheres(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return [Sphere(Vector3D(*p.tolist(), 1), float(r), MAT)
+            for p, r in zip(rng.uniform(-5, 5, (n, 3)), rng.uniform(0.1, 0.6, n))]
+
+
+def _rays(n, seed=4):
+    rng = np.random.default_rng(seed)
+    rays = []
+    for _ in range(n):
+        o = rng.uniform(-12, 12, 3)
+        target = rng.uniform(-5, 5, 3)
+        rays.append(Ray(Vector3D(*o.tolist(), 1), Vector3D(*(target - o).tolist(), 0)))
+    return rays
+
+
+def _linear(objects, ray):
+    best = None
+    for obj in objects:
+        t = obj.intersect(ray)
+        if t is not None and (best is None or t < best):
+            best = t
+    return best
+
+
+def _leaves(node):
+    if isinstance(node, BVHNode):
+        return _leaves(node._left) + _leaves(node._right)
+    if isinstance(node, BVHLeaf):
+        return list(node.objects)
+    return [node]
+
+
+BUILDERS = [
+    {"method": "median"},
+    {"method": "sah", "bins": 8},
+    {"method": "sah", "bins": 32, "leaf_size": 4},
+    {"method": "median", "leaf_size": 3},
+    {"method": "lbvh"},
+    {"method": "lbvh", "leaf_size": 4},
+]
+
+
+def test_builders_match_linear_scan():
+    spheres = _spheres(60)
+    for kwargs in BUILDERS:
+        root = BVHNode.build(spheres, **kwargs)
+        assert sorted(map(id, _leaves(root))) == sorted(map(id, spheres)), kwargs
+        for ray in _rays(200):
+            ref = _linear(spheres, ray)
+            t = root.intersect(ray)
+            assert (t is None) == (ref is None), kwargs
+            if ref is not None:
+                assert abs(t - ref) < 1e-9, kwargs
+
+
+def test_leaf_size_bounds_leaf_population():
+    root = BVHNode.build(_spheres(50), method="sah", leaf_size=4)
+    leaves = []
+
+    def walk(n):
+        if isinstance(n, BVHNode):
+            walk(n._left)
+            walk(n._right)
+        else:
+            leaves.append(n)
+    walk(root)
+    assert any(isinstance(n, BVHLeaf) for n in leaves)
+    assert all(len(n.objects) <= 4 for n in leaves if isinstance(n, BVHLeaf))
+
+
+def test_sah_coincident_centroids():
+    same = [Sphere(Vector3D(0, 0, 0, 1), 0.5 + 0.1 * i, MAT) for i in range(5)]
+    root = BVHNode.build(same, method="sah")
+    assert len(_leaves(root)) == 5
+    ray = Ray(Vector3D(0, 0, 5, 1), Vector3D(0, 0, -1, 0))
+    assert abs(root.intersect(ray) - (5 - 0.9)) < 1e-9
+
+
+def test_sah_mesh_bvh_matches_median():
+    from utils.obj_loader import OBJLoader
+    cube = OBJLoader.create_cube(MAT, Vector3D(0, 0, -3, 1), 2.0)
+    median_ts = [cube.intersect(r) for r in _rays(100)]
+    cube.build_bvh(method="sah", bins=4)
+    sah_ts = [cube.intersect(r) for r in _rays(100)]
+    assert median_ts == sah_ts
+
+
+def test_lbvh_flat_layout():
+    rng = np.random.default_rng(7)
+    centers = rng.uniform(-5, 5, (300, 3))
+    centers[:40] = centers[0]  # a run of identical Morton codes
+    lo, hi = centers - 0.05, centers + 0.05
+    for leaf_size in (1, 4):
+        bmin, bmax, right, start, count, order = build_flat_arrays(lo, hi, "lbvh", leaf_size=leaf_size)
+        assert sorted(order.tolist()) == list(range(300))
+        for i in range(len(right)):
+            slots = order[start[i]:start[i] + count[i]]
+            assert np.array_equal(bmin[i], lo[slots].min(axis=0))
+            assert np.array_equal(bmax[i], hi[slots].max(axis=0))
+            if right[i] >= 0:
+                assert start[i + 1] == start[i] and count[i + 1] + count[right[i]] == count[i]
+                assert start[right[i]] == start[i] + count[i + 1]
+            else:
+                assert count[i] <= leaf_size
+
+
+def test_lbvh_mesh_bvh_matches_median():
+    from utils.obj_loader import OBJLoader
+    bunny = OBJLoader.load(os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj"),
+                           MAT, 20.0)
+    rays = _rays(100)
+    bunny.build_bvh(method="median")
+    median_hits = [bunny.intersect_full(r) for r in rays]
+    bunny.build_bvh(method="lbvh", leaf_size=4)
+    for ray, ref in zip(rays, median_hits):
+        hit = bunny.intersect_full(ray)
+        assert (hit is None) == (ref is None)
+        assert hit is None or (hit.prim_id, hit.t) == (ref.prim_id, ref.t)
+
+
+def test_parallel_build_matches_serial():
+    from utils.obj_loader import OBJLoader
+    from core.objects.mesh import BVH_ARRAYS
+    bunny = OBJLoader.load(os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj"),
+                           MAT, 20.0)
+    for kwargs in ({"method": "median"}, {"method": "sah", "bins": 8, "leaf_size": 4}):
+        bunny.build_bvh(workers=1, **kwargs)
+        serial = [getattr(bunny._bvh, name) for name in BVH_ARRAYS]
+        bunny.build_bvh(workers=3, **kwargs)
+        for name, a in zip(BVH_ARRAYS, serial):
+            assert np.array_equal(getattr(bunny._bvh, name), a), (kwargs, name)
+
+
+def test_unknown_method_raises():
+    try:
+        BVHNode.build(_spheres(3), method="octree")
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
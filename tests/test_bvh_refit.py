@@ -0,0 +1,148 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from utils.vector import Vector3D
+from utils.matrix import Matrix3D
+from utils.obj_loader import OBJLoader
+from core.bvh import BVHNode, FlatBVH, _compute_aabb
+from core.objects.mesh import Mesh
+from core.objects.sphere import Sphere
+from core.ray import Ray
+from renderer.ui.scene_builder import build_scene, make_material, refit_scene
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+MAT = make_material((0.7, 0.2, 0.2), 0.0)
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+
+
+def _spheres(n, seed=5):
+    rng = np.random.default_rng(seed)
+    return [Sphere(Vector3D(*p.tolist(), 1), float(r), MAT)
+            for p, r in zip(rng.uniform(-5, 5, (n, 3)), rng.uniform(0.1, 0.6, n))]
+
+
+def _rays(n, seed=6):
+    rng = np.random.default_rng(seed)
+    rays = []
+    for _ in range(n):
+        o = rng.uniform(-12, 12, 3)
+        d = rng.uniform(-5, 5, 3) - o
+        rays.append(Ray(Vector3D(*o.tolist(), 1), Vector3D(*d.tolist(), 0)))
+    return rays
+
+
+def _brute_t(objects, ray):
+    ts = [t for t in (obj.intersect(ray) for obj in objects) if t is not None]
+    return min(ts) if ts else None
+
+
+def _move(spheres, seed, scale):
+    rng = np.random.default_rng(seed)
+    for s, step in zip(spheres, rng.uniform(-scale, scale, (len(spheres), 3))):
+        s.center = s.center + Vector3D(*step.tolist(), 0)
+
+
+def test_flat_refit_without_motion_keeps_bounds():
+    spheres = _spheres(60)
+    bvh = FlatBVH.build(spheres, method="sah")
+    lo, hi = bvh.bounds_min.copy(), bvh.bounds_max.copy()
+    assert bvh.refit() == 1.0
+    assert np.array_equal(bvh.bounds_min, lo) and np.array_equal(bvh.bounds_max, hi)
+    assert not bvh.needs_rebuild()
+
+
+def test_flat_refit_follows_moved_objects():
+    spheres = _spheres(80)
+    bvh = FlatBVH.build(spheres)
+    right = bvh.right.copy()
+    _move(spheres, 1, 3.0)
+    quality = bvh.refit()
+    assert np.array_equal(bvh.right, right)
+    assert quality == bvh.quality()
+    for ray in _rays(150):
+        hit = bvh.intersect(ray)
+        ref = _brute_t(spheres, ray)
+        assert (hit is None) == (ref is None) and (ref is None or abs(hit - ref) < 1e-9)
+    # Scrambling every object degrades the tree enough to ask for a rebuild
+    _move(spheres, 2, 40.0)
+    bvh.refit()
+    assert bvh.needs_rebuild()
+    assert FlatBVH.build(spheres).cost() < bvh.cost()
+
+
+def test_tree_refit_matches_object_bounds():
+    spheres = _spheres(40)
+    root = BVHNode.build(spheres, leaf_size=4)
+    _move(spheres, 3, 2.0)
+    assert root.refit() > 0
+    lo, hi = _compute_aabb(spheres)
+    assert (root.aabb_min.x, root.aabb_max.z) == (lo.x, hi.z)
+    for ray in _rays(100):
+        hit = root.intersect(ray)
+        ref = _brute_t(spheres, ray)
+        assert (hit is None) == (ref is None) and (ref is None or abs(hit - ref) < 1e-9)
+
+
+def test_mesh_set_vertices_refits_its_bvh():
+    mesh = OBJLoader.load(BUNNY, MAT, 20.0)
+    # Read-only arrays, as when the mesh comes from the memory-mapped cache
+    arrays = mesh.arrays()
+    for a in arrays.values():
+        a.setflags(write=False)
+    mesh = Mesh.from_arrays(MAT, arrays)
+    bvh = mesh._bvh
+
+    moved = mesh.vertices + (0.5, 1.0, -0.25)
+    assert not mesh.set_vertices(moved)
+    assert mesh._bvh is bvh and abs(bvh.quality() - 1.0) < 1e-9
+    fresh = Mesh(MAT)
+    fresh.add_arrays(moved, mesh.faces)
+    fresh.build_bvh()
+    for ray in _rays(100, seed=8):
+        a, b = mesh.intersect_full(ray), fresh.intersect_full(ray)
+        assert (a is None) == (b is None) and (a is None or (a.prim_id, a.t) == (b.prim_id, b.t))
+
+    rng = np.random.default_rng(4)
+    assert mesh.set_vertices(moved[rng.permutation(len(moved))])
+    assert mesh._bvh is not bvh
+
+
+def test_mesh_rebuild_keeps_build_options():
+    mesh = OBJLoader.load(BUNNY, MAT, 20.0)
+    rng = np.random.default_rng(4)
+    for options in ({"method": "lbvh", "leaf_size": 2}, {"method": "sah", "bins": 8, "leaf_size": 3}):
+        mesh.build_bvh(**options)
+        scrambled = mesh.vertices[rng.permutation(len(mesh.vertices))]
+        assert mesh.set_vertices(scrambled)
+        fresh = Mesh(MAT)
+        fresh.add_arrays(scrambled, mesh.faces)
+        fresh.build_bvh(**options)
+        assert np.array_equal(mesh._bvh.right, fresh._bvh.right)
+        assert np.array_equal(mesh._bvh.prim_index, fresh._bvh.prim_index)
+
+
+def test_refit_scene_after_moving_instances():
+    specs = [{"type": "cube", "center": (i * 1.5, 0, 0), "size": 1.0, "material": MAT}
+             for i in range(6)]
+    camera, objects, _ = build_scene(40, 30, specs, LIGHTS)
+    bvh = objects[0]
+    for inst in bvh.primitives:
+        x = inst.transform[0].w
+        inst.set_transform(Matrix3D.translation(0, x, 0) @ inst.transform)
+    objects = refit_scene(objects)
+    assert objects[0] is bvh
+    ray = Ray(Vector3D(3 * 1.5, 3 * 1.5, 10, 1), Vector3D(0, 0, -1, 0))
+    assert abs(bvh.intersect(ray) - 9.5) < 1e-9
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
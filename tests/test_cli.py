@@ -0,0 +1,95 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import subprocess
+import tempfile
+import numpy as np
+from PIL import Image
+import config
+from renderer import cli
+from renderer.headless import render_image
+from renderer.ui.scene_builder import build_scene
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCENE = {
+    "width": 40, "height": 30,
+    "camera": {"position": [0, 2, 6], "look_at": [0, 0.5, 0]},
+    "render": {"engine": "packet", "workers": 1},
+    "objects": [
+        {"type": "obj", "path": "bunny.obj", "scale": 10.0, "position": [0, -1, 0],
+         "material": {"diffuse": [0.8, 0.7, 0.6], "reflectivity": 0.1}},
+        {"type": "sphere", "position": [1.5, 0, 0], "radius": 0.5,
+         "material": {"diffuse": [0.2, 0.2, 0.8], "shininess": 8}},
+    ],
+    "lights": [{"position": [3, 5, 2], "color": [1, 1, 1], "intensity": 1.0}],
+}
+
+
+def test_cli_renders_png_and_stats():
+    with tempfile.TemporaryDirectory() as tmp:
+        # OBJ paths are resolved against the scene file's directory
+        os.symlink(os.path.join(ROOT, "models", "bunny.obj"), os.path.join(tmp, "bunny.obj"))
+        scene_path = os.path.join(tmp, "scene.json")
+        with open(scene_path, "w") as f:
+            json.dump(SCENE, f)
+        out = os.path.join(tmp, "out.png")
+        assert cli.main([scene_path, "-o", out, "--engine", "scalar", "--workers", "2"]) == 0
+
+        img = np.asarray(Image.open(out))
+        camera, objects, lights = build_scene(
+            40, 30, cli.resolve_specs(SCENE, tmp), SCENE["lights"], (0, 2, 6), (0, 0.5, 0))
+        assert np.array_equal(img, render_image(40, 30, camera, objects, lights))
+
+        with open(os.path.join(tmp, "out.json")) as f:
+            stats = json.load(f)
+        assert stats["engine"] == "scalar" and stats["workers"] == 2  # flags override the file
+        assert stats["pixels"] == 1200 and stats["render_time"] > 0
+        assert stats["samples_per_pixel"] == 1.0 and not stats["adaptive_aa"]
+        assert stats["primary_rays"] == 1200 and stats["ray_count"] >= 1200
+        assert stats["bvh_nodes"] > 0 and stats["primitive_tests"] > 0
+
+
+def test_no_adaptive_overrides_scene_file():
+    assert cli.parse_args(["s.json"]).adaptive is None  # unset: the scene file decides
+    assert cli.parse_args(["s.json", "--adaptive"]).adaptive is True
+    saved = config.AA_SAMPLES, config.ADAPTIVE_AA
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            scene = dict(SCENE, objects=SCENE["objects"][1:], width=8, height=6,
+                         render=dict(SCENE["render"], adaptive=True, aa=2))
+            scene_path = os.path.join(tmp, "scene.json")
+            with open(scene_path, "w") as f:
+                json.dump(scene, f)
+            for flags, adaptive in (([], True), (["--no-adaptive"], False)):
+                assert cli.main([scene_path, "-o", os.path.join(tmp, "out.png")] + flags) == 0
+                with open(os.path.join(tmp, "out.json")) as f:
+                    assert json.load(f)["adaptive_aa"] is adaptive, flags
+    finally:
+        config.AA_SAMPLES, config.ADAPTIVE_AA = saved
+
+
+def test_partial_material_gets_defaults():
+    specs = cli.resolve_specs(SCENE, "/scenes")
+    assert specs[0]["path"] == "/scenes/bunny.obj"
+    sphere = specs[1]["material"]
+    assert sphere["shininess"] == 8 and sphere["reflectivity"] == 0.0
+    assert "ambient" in sphere and "specular" in sphere
+
+
+def test_cli_does_not_import_qt():
+    code = "import sys, renderer.cli; sys.exit('PyQt5' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,151 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pickle
+import numpy as np
+import config
+from utils.vector import Vector3D
+from core.bvh import BVHNode, FlatBVH
+from core.objects.sphere import Sphere
+from core.ray import Ray
+from utils.obj_loader import OBJLoader
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def _spheres(n, seed=5):
+    rng = np.random.default_rng(seed)
+    return [Sphere(Vector3D(*p.tolist(), 1), float(r), MAT)
+            for p, r in zip(rng.uniform(-5, 5, (n, 3)), rng.uniform(0.1, 0.6, n))]
+
+
+def _rays(n, seed=6):
+    rng = np.random.default_rng(seed)
+    rays = []
+    for _ in range(n):
+        o = rng.uniform(-12, 12, 3)
+        d = rng.uniform(-5, 5, 3) - o
+        if rng.random() < 0.2:
+            d[rng.integers(3)] = 0.0  # axis-parallel components
+        rays.append(Ray(Vector3D(*o.tolist(), 1), Vector3D(*d.tolist(), 0)))
+    return rays
+
+
+def test_flat_layout_is_depth_first():
+    spheres = _spheres(40)
+    flat = FlatBVH.build(spheres, method="sah", leaf_size=3)
+    assert flat.prim_count[0] == 40
+    assert sorted(map(id, flat.primitives)) == sorted(map(id, spheres))
+    for i in range(flat.node_count()):
+        r = flat.right[i]
+        if r >= 0:
+            # children cover the parent's contiguous primitive range
+            assert flat.prim_start[i + 1] == flat.prim_start[i]
+            assert flat.prim_start[r] == flat.prim_start[i] + flat.prim_count[i + 1]
+            assert flat.prim_count[i] == flat.prim_count[i + 1] + flat.prim_count[r]
+
+
+def test_flat_matches_tree():
+    spheres = _spheres(80)
+    for kwargs in ({"method": "median"}, {"method": "sah", "leaf_size": 4}):
+        tree = BVHNode.build(spheres, **kwargs)
+        flat = FlatBVH.from_tree(tree)
+        for ray in _rays(300):
+            hit_tree = tree.intersect_full(ray)
+            hit_flat = flat.intersect_full(ray)
+            assert (hit_tree is None) == (hit_flat is None)
+            if hit_tree is not None:
+                assert abs(hit_tree.t - hit_flat.t) < 1e-9
+                assert hit_tree.obj is hit_flat.obj
+
+
+def test_direct_build_matches_flattened_tree():
+    spheres = _spheres(120, seed=9)
+    for kwargs in ({"method": "median"}, {"method": "sah"}, {"method": "sah", "leaf_size": 4}):
+        direct = FlatBVH.build(spheres, **kwargs)
+        flattened = FlatBVH.from_tree(BVHNode.build(spheres, **kwargs))
+        assert np.array_equal(direct.bounds_min, flattened.bounds_min)
+        assert np.array_equal(direct.bounds_max, flattened.bounds_max)
+        assert np.array_equal(direct.right, flattened.right)
+        assert np.array_equal(direct.prim_count, flattened.prim_count)
+        assert [id(p) for p in direct.primitives] == [id(p) for p in flattened.primitives]
+        assert [spheres[i] for i in direct.prim_index] == direct.primitives
+
+
+def test_flat_pickle_roundtrip():
+    flat = FlatBVH.build(_spheres(30))
+    ray = _rays(1)[0]
+    flat.intersect_full(ray)  # populate the traversal cache
+    clone = pickle.loads(pickle.dumps(flat))
+    assert clone._nodes is None
+    assert np.array_equal(clone.bounds_min, flat.bounds_min)
+    for ray in _rays(50):
+        assert clone.intersect(ray) == flat.intersect(ray)
+
+
+def test_flat_build_trivial_inputs():
+    assert FlatBVH.build([]) is None
+    s = _spheres(1)[0]
+    assert FlatBVH.build([s]) is s
+
+
+def _traverse_both(bvh, rays):
+    """(closest hit, occluded, bvh_nodes) for each ray, at width 2 then 4."""
+    old = config.BVH_WIDTH
+    results = []
+    try:
+        for width in (2, 4):
+            config.BVH_WIDTH = width
+            config.trace_stats["bvh_nodes"] = 0
+            out = [(bvh.intersect_full(ray), bvh.occluded(ray, 8.0)) for ray in rays]
+            results.append((out, config.trace_stats["bvh_nodes"]))
+    finally:
+        config.BVH_WIDTH = old
+    return results
+
+
+def test_wide_traversal_matches_binary():
+    spheres = _spheres(150, seed=3)
+    for kwargs in ({"method": "median"}, {"method": "sah", "leaf_size": 4}):
+        flat = FlatBVH.build(spheres, **kwargs)
+        (binary, _), (wide, _) = _traverse_both(flat, _rays(300))
+        for (a, occ_a), (b, occ_b) in zip(binary, wide):
+            assert (a is None) == (b is None) and occ_a == occ_b
+            if a is not None:
+                assert a.t == b.t and a.obj is b.obj
+        # Every primitive slot is reachable from exactly one wide leaf
+        slots = sorted((c[7], c[8]) for node in flat._wide for c in node if c[6] < 0)
+        assert sum(count for _, count in slots) == len(spheres)
+        assert all(len(node) <= 4 for node in flat._wide)
+
+
+def test_wide_mesh_bvh_visits_fewer_nodes():
+    mesh = OBJLoader.load(BUNNY, MAT, 20.0)
+    lo, hi = mesh.get_bounding_box()
+    rng = np.random.default_rng(1)
+    rays = []
+    for _ in range(200):
+        target = rng.uniform((lo.x, lo.y, lo.z), (hi.x, hi.y, hi.z))
+        origin = target + rng.normal(size=3) * 20
+        rays.append(Ray(Vector3D(*origin.tolist(), 1), Vector3D(*(target - origin).tolist(), 0)))
+    (binary, nodes_binary), (wide, nodes_wide) = _traverse_both(mesh, rays)
+    for (a, occ_a), (b, occ_b) in zip(binary, wide):
+        assert (a is None) == (b is None) and occ_a == occ_b
+        if a is not None:
+            assert (a.prim_id, a.t) == (b.prim_id, b.t)
+    assert nodes_wide < 0.7 * nodes_binary
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
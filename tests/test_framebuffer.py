@@ -0,0 +1,64 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import multiprocessing
+import pickle
+import numpy as np
+from renderer.framebuffer import SharedFramebuffer
+from renderer.ui.scene_builder import build_scene, make_material
+from renderer.headless import render_image
+from renderer.raytracer import init_worker
+from renderer.tiles import make_tiles, render_tiles
+
+SPECS = [
+    {"type": "sphere", "position": (-1.0, 0.5, -1), "radius": 1.0,
+     "material": make_material((0.8, 0.2, 0.2), 0.3)},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.2)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+
+
+def test_attach_by_name_shares_memory():
+    fb = SharedFramebuffer(6, 4)
+    try:
+        assert fb.array.shape == (4, 6, 3) and not fb.array.any()
+        other = pickle.loads(pickle.dumps(fb))
+        assert not other.owner and other.name == fb.name
+        other.write((1, 1, 3, 2), np.full((1, 2, 3), 200, dtype=np.uint8))
+        assert (fb.array[1, 1:3] == 200).all() and fb.array.sum() == 200 * 6
+        other.release()
+    finally:
+        fb.release()
+    fb.release()  # second release is a no-op
+
+
+def test_workers_write_into_shared_framebuffer():
+    width, height = 40, 30
+    camera, objects, lights = build_scene(width, height, SPECS, LIGHTS)
+    expected = render_image(width, height, camera, objects, lights)
+    fb = SharedFramebuffer(width, height)
+    try:
+        with multiprocessing.Pool(2, initializer=init_worker,
+                                  initargs=(width, height, camera, objects, lights,
+                                            "scalar", fb)) as pool:
+            dirty = np.zeros((height, width), dtype=int)
+            for (x0, y0, x1, y1), pixels, _ in render_tiles(pool, make_tiles(width, height, 8)):
+                assert pixels is None  # nothing pickled back but the rectangle
+                dirty[y0:y1, x0:x1] += 1
+        assert (dirty == 1).all()
+        assert np.array_equal(fb.array, expected)
+    finally:
+        fb.release()
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
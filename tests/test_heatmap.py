@@ -0,0 +1,81 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+import numpy as np
+from PIL import Image
+from renderer import heatmap
+from renderer.headless import render_image
+from renderer.ui.scene_builder import build_scene, make_material
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+SPECS = [
+    {"type": "obj", "path": BUNNY, "scale": 10.0, "position": (0, -1, 0),
+     "material": make_material((0.8, 0.7, 0.6), 0.2)},
+    {"type": "sphere", "position": (1.5, 0, 0), "radius": 0.5,
+     "material": make_material((0.2, 0.2, 0.8), 0.0)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+W, H = 32, 24
+
+
+def _render(engine, workers=1, cost_maps=None):
+    camera, objects, lights = build_scene(W, H, SPECS, LIGHTS, (0, 2, 6), (0, 0.5, 0))
+    stats = {}
+    img = render_image(W, H, camera, objects, lights, engine, workers, tile_size=8,
+                       stats=stats, cost_maps=cost_maps)
+    return img, stats
+
+
+def test_cost_maps_sum_to_the_counters():
+    for engine in ("scalar", "packet"):
+        maps = {}
+        plain, _ = _render(engine)
+        img, stats = _render(engine, cost_maps=maps)
+        # measuring does not change the image; the scalar costs are the render's own
+        assert np.array_equal(img, plain)
+        assert set(maps) == {"bvh_nodes", "primitive_tests", "tile_time"}
+        assert maps["bvh_nodes"].shape == (H, W) and "pixel_costs" not in stats
+        if engine == "scalar":
+            assert maps["bvh_nodes"].sum() == stats["bvh_nodes"]
+            assert maps["primitive_tests"].sum() == stats["primitive_tests"]
+        assert np.isclose(maps["tile_time"].sum(), stats["tile_time"])
+        # the bunny costs more than the background
+        assert maps["primitive_tests"][H // 2, W // 2] > maps["primitive_tests"][0, 0]
+
+
+def test_pool_workers_measure_costs():
+    single, pooled = {}, {}
+    _render("scalar", cost_maps=single)
+    _render("scalar", workers=2, cost_maps=pooled)
+    for key in ("bvh_nodes", "primitive_tests"):
+        assert np.array_equal(single[key], pooled[key]), key
+
+
+def test_false_color_ramp_and_files():
+    values = np.array([[0.0, 1.0], [2.0, 1000.0]])
+    colors = heatmap.false_color(values, percentile=50)
+    assert colors.shape == (2, 2, 3) and colors.dtype == np.uint8
+    assert tuple(colors[0, 0]) == (0, 0, 0)
+    # everything at or above the percentile saturates to white
+    assert tuple(colors[1, 1]) == (255, 255, 255)
+    assert heatmap.false_color(np.zeros((2, 2))).max() == 0
+    with tempfile.TemporaryDirectory() as tmp:
+        maps = {key: np.arange(12.0).reshape(3, 4) for key in heatmap.SUFFIXES}
+        paths = heatmap.save_heatmaps(maps, os.path.join(tmp, "out.png"))
+        assert [os.path.basename(p) for p in paths] == ["out_nodes.png", "out_prims.png",
+                                                        "out_time.png"]
+        assert np.asarray(Image.open(paths[0])).shape == (3, 4, 3)
+        assert heatmap.summary(maps)["bvh_nodes"] == {"max": 11.0, "mean": 5.5}
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
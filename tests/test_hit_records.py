@@ -0,0 +1,120 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import numpy as np
+from utils.vector import Vector3D
+from utils.obj_loader import OBJLoader
+from core.hit import HitRecord
+from core.objects.mesh import Mesh
+from core.objects.sphere import Sphere
+from core.objects.plane import Plane
+from core.objects.triangle import Triangle
+from core.ray import Ray
+from renderer.ui.scene_builder import build_scene, make_material
+from renderer.raytracer import trace_ray
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def _smooth_mesh():
+    mesh = Mesh(MAT, name="Smooth")
+    mesh.add_triangle(Vector3D(-1, -1, 0, 1), Vector3D(1, -1, 0, 1), Vector3D(0, 1, 0, 1),
+                      Vector3D(-1, 0, 1, 0).normalize(), Vector3D(1, 0, 1, 0).normalize(),
+                      Vector3D(0, 0, 1, 0))
+    mesh.add_triangle(Vector3D(1, -1, 0, 1), Vector3D(3, -1, 0, 1), Vector3D(2, 1, 0, 1))
+    mesh.build_bvh()
+    return mesh
+
+
+def test_records_for_each_primitive():
+    ray = Ray(Vector3D(0, 0, 5, 1), Vector3D(0, 0, -1, 0))
+    s = Sphere(Vector3D(0, 0, 0, 1), 1.0, MAT)
+    p = Plane(Vector3D(0, 0, -2, 1), Vector3D(0, 0, 1, 0), MAT)
+    tri = Triangle(Vector3D(-1, -1, 0, 1), Vector3D(1, -1, 0, 1), Vector3D(0, 1, 0, 1), MAT)
+    for obj, t in ((s, 4.0), (p, 7.0), (tri, 5.0)):
+        hit = obj.intersect_full(ray)
+        assert isinstance(hit, HitRecord) and hit.obj is obj and abs(hit.t - t) < 1e-9
+    miss = Ray(Vector3D(10, 10, 5, 1), Vector3D(0, 0, -1, 0))
+    assert s.intersect_full(miss) is None and tri.intersect_full(miss) is None
+
+
+def test_mesh_record_names_triangle_and_barycentrics():
+    mesh = _smooth_mesh()
+    hit = mesh.intersect_full(Ray(Vector3D(2, -0.5, 5, 1), Vector3D(0, 0, -1, 0)))
+    assert hit.obj is mesh and hit.prim_id == 1
+    hit = mesh.intersect_full(Ray(Vector3D(0.5, -0.5, 5, 1), Vector3D(0, 0, -1, 0)))
+    assert hit.prim_id == 0
+    assert abs(hit.u - 0.625) < 1e-9 and abs(hit.v - 0.25) < 1e-9
+
+
+def test_shadow_query_does_not_disturb_primary_normal():
+    mesh = _smooth_mesh()
+    primary = mesh.intersect_full(Ray(Vector3D(-0.5, -0.5, 5, 1), Vector3D(0, 0, -1, 0)))
+    point = Vector3D(-0.5, -0.5, 0, 1)
+    before = mesh.get_normal_at_intersection(point, primary)
+    # A second query on another part of the same triangle must not leak into the first record
+    mesh.intersect_full(Ray(Vector3D(0.7, -0.9, 5, 1), Vector3D(0, 0, -1, 0)))
+    mesh.occluded(Ray(Vector3D(0.0, 0.5, 5, 1), Vector3D(0, 0, -1, 0)), 100.0)
+    after = mesh.get_normal_at_intersection(point, primary)
+    assert (before.x, before.y, before.z) == (after.x, after.y, after.z)
+    assert before.x < 0  # interpolated towards n0 (-x side)
+
+
+def test_trace_ray_is_thread_safe():
+    specs = [{"type": "obj", "path": os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj"),
+              "scale": 30.0, "position": (0, -1, 0), "material": make_material((0.8, 0.7, 0.6), 0.2)},
+             {"type": "sphere", "position": (2, 0, 0), "radius": 1.0, "material": make_material((1, 0, 0), 0.3)},
+             {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0), "material": make_material((0.5, 0.5, 0.5), 0.2)}]
+    lights = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+    coords = [(x, y) for y in range(18) for x in range(24)]
+
+    def render(scene, order):
+        camera, objects, lights = scene
+        out = {}
+        for x, y in order:
+            ray = camera.get_ray((x + 0.5) / 24 * 2 - 1, 1 - (y + 0.5) / 18 * 2)
+            out[(x, y)] = tuple(int(c) for c in trace_ray(ray, objects, lights))
+        return out
+
+    reference = render(build_scene(24, 18, specs, lights), coords)
+    # A separate, cold scene: its BVH traversal views are built lazily by
+    # whichever thread gets there first, while the others are traversing
+    scene = build_scene(24, 18, specs, lights)
+    results = [None] * 8
+    errors = []
+
+    def worker(i):
+        shift = i * 37  # each thread walks the pixels in a different order
+        try:
+            results[i] = render(scene, coords[shift:] + coords[:shift])
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, errors
+    for r in results:
+        assert r == reference
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,114 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pickle
+import numpy as np
+from utils.vector import Vector3D
+from utils.obj_loader import OBJLoader
+from core.objects.mesh import Mesh, MeshBVH
+from core.ray import Ray
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+
+
+def _rays_at(mesh, n, seed=3):
+    """Rays from a shell around the mesh aimed at random points inside its box."""
+    rng = np.random.default_rng(seed)
+    lo, hi = mesh.get_bounding_box()
+    lo, hi = np.array([lo.x, lo.y, lo.z]), np.array([hi.x, hi.y, hi.z])
+    center, radius = (lo + hi) / 2, np.linalg.norm(hi - lo)
+    rays = []
+    for _ in range(n):
+        o = center + rng.normal(size=3) * radius
+        d = rng.uniform(lo, hi) - o
+        rays.append(Ray(Vector3D(*o.tolist(), 1), Vector3D(*d.tolist(), 0)))
+    return rays
+
+
+def test_obj_loader_shares_vertices():
+    mesh = OBJLoader.load(BUNNY, MAT)
+    t = mesh.get_triangle_count()
+    assert mesh.faces.shape == (t, 3) and mesh.faces.dtype == np.int32
+    assert len(mesh.vertices) < t  # each vertex is stored once, not per face
+    for name in ("edge1", "edge2", "face_normals"):
+        arr = getattr(mesh, name)
+        assert arr.shape == (t, 3) and arr.dtype == np.float64 and arr.flags.c_contiguous
+    assert isinstance(mesh._bvh, MeshBVH)
+    assert mesh._bvh.primitives is None
+
+
+def test_array_mesh_matches_triangles():
+    mesh = OBJLoader.load(BUNNY, MAT, scale=10.0)
+    triangles = mesh.triangles
+    for ray in _rays_at(mesh, 40):
+        hit = mesh.intersect_full(ray)
+        ref = None
+        for tri in triangles:
+            h = tri.intersect_full(ray)
+            if h is not None and (ref is None or h.t < ref.t):
+                ref = h
+        assert (hit is None) == (ref is None)
+        if hit is None:
+            continue
+        assert hit.obj is mesh and hit.prim_id == ref.prim_id
+        assert abs(hit.t - ref.t) < 1e-12
+        p = ray.origin + ray.direction * hit.t
+        n_mesh = mesh.get_normal_at_intersection(p, hit)
+        n_tri = triangles[hit.prim_id].get_normal_at_intersection(p, ref)
+        assert abs(n_mesh.x - n_tri.x) + abs(n_mesh.y - n_tri.y) + abs(n_mesh.z - n_tri.z) < 1e-12
+        assert mesh.occluded(ray, hit.t + 1e-6) and not mesh.occluded(ray, hit.t * 0.5)
+
+
+def test_smooth_normals_from_add_triangle():
+    mesh = Mesh(MAT)
+    up, side = Vector3D(0, 0, 1, 0), Vector3D(1, 0, 0, 0)
+    mesh.add_triangle(Vector3D(0, 0, 0, 1), Vector3D(1, 0, 0, 1), Vector3D(0, 1, 0, 1), up, side, up)
+    mesh.add_triangle(Vector3D(0, 0, -1, 1), Vector3D(1, 0, -1, 1), Vector3D(0, 1, -1, 1))
+    assert mesh.get_triangle_count() == 2
+    ray = Ray(Vector3D(0.25, 0.25, 5, 1), Vector3D(0, 0, -1, 0))
+    hit = mesh.intersect_full(ray)
+    assert hit.prim_id == 0
+    n = mesh.get_normal_at_intersection(None, hit)
+    assert n.x > 0 and n.z > 0  # blended toward the x-facing vertex normal
+    flat = mesh.intersect_full(Ray(Vector3D(0.25, 0.25, -0.5, 1), Vector3D(0, 0, -1, 0)))
+    assert flat.prim_id == 1
+    n = mesh.get_normal_at_intersection(None, flat)
+    assert (n.x, n.y, n.z) == (0, 0, 1)
+
+
+def test_mesh_pickle_drops_caches():
+    mesh = OBJLoader.create_cube(MAT, Vector3D(0, 0, -3, 1), 1.0)
+    ray = Ray(Vector3D(0.1, 0.2, 0, 1), Vector3D(0, 0, -1, 0))
+    hit = mesh.intersect_full(ray)
+    clone = pickle.loads(pickle.dumps(mesh))
+    assert clone._tri_data is None and clone._bvh._nodes is None
+    assert clone._bvh.mesh is clone
+    assert clone.intersect_full(ray)[:3] == (hit.t, clone, hit.prim_id)
+
+
+def test_with_material_copy_is_independent():
+    mesh = OBJLoader.create_cube(MAT, Vector3D(0, 0, 0, 1), 1.0)
+    copy = mesh.with_material(dict(MAT, diffuse=(0, 0, 1)), "Blue")
+    assert copy.vertices is mesh.vertices and copy.material is not mesh.material
+    copy.add_triangle(Vector3D(5, 0, 0, 1), Vector3D(6, 0, 0, 1), Vector3D(5, 1, 0, 1))
+    copy.build_bvh()
+    assert copy.get_triangle_count() == 13
+    assert mesh.get_triangle_count() == 12 and mesh._bvh is not None
+    ray = Ray(Vector3D(5.2, 0.2, 5, 1), Vector3D(0, 0, -1, 0))
+    assert mesh.intersect(ray) is None and abs(copy.intersect(ray) - 5.0) < 1e-9
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,112 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pickle
+
+import numpy as np
+import config
+from utils.vector import Vector3D
+from utils.matrix import Matrix3D
+from utils.obj_loader import OBJLoader
+from core.ray import Ray
+from core.objects.instance import Instance
+from renderer.ui.scene_builder import build_object, build_scene, make_material
+from renderer.headless import render_image
+from renderer.packet import PacketScene, trace_packet
+from renderer.raytracer import trace_ray
+
+RED = make_material((0.8, 0.2, 0.2), 0.0)
+BLUE = make_material((0.2, 0.2, 0.8), 0.3)
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+SPECS = [
+    {"type": "cube", "center": (-1.2, 0.3, 0), "size": 0.8, "material": RED,
+     "rotation": (20, 35, 0)},
+    {"type": "cube", "center": (1.2, 0.3, 0), "size": 0.8, "material": BLUE},
+    {"type": "cube", "center": (0, 0.4, -1.5), "size": 0.8, "material": RED},
+    {"type": "tetra", "center": (0, -0.2, 1.2), "size": 0.5, "material": BLUE,
+     "rotation": (0, 0, 90)},
+    {"type": "sphere", "position": (0, 1.5, -0.5), "radius": 0.5, "material": BLUE},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0), "material": RED},
+]
+
+
+def test_matrix_transforms_points_and_directions():
+    m = Matrix3D.translation(1, 2, 3) @ Matrix3D.rotation(0, 90, 0) @ Matrix3D.scaling(2)
+    p = m @ Vector3D(1, 0, 0, 1)
+    d = m @ Vector3D(1, 0, 0, 0)
+    assert np.allclose([p.x, p.y, p.z, p.w], [1, 2, 5, 1])
+    assert np.allclose([d.x, d.y, d.z, d.w], [0, 0, 2, 0])
+    back = m.inverse() @ p
+    assert np.allclose([back.x, back.y, back.z], [1, 0, 0])
+
+
+def test_instance_matches_baked_mesh():
+    center = Vector3D(0.5, -0.2, 0.3, 1)
+    baked = OBJLoader.create_cube(RED, center, 1.0)
+    inst = Instance(OBJLoader.create_cube(RED, Vector3D(0, 0, 0, 1), 1.0),
+                    Matrix3D.translation(0.5, -0.2, 0.3))
+    lo, hi = inst.get_bounding_box()
+    assert np.allclose([lo.x, lo.y, lo.z, hi.x, hi.y, hi.z], [0, -0.7, -0.2, 1, 0.3, 0.8])
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        target = Vector3D(*rng.uniform(-0.4, 0.4, 3).tolist(), 1) + center
+        origin = Vector3D(*rng.uniform(-4, 4, 3).tolist(), 1)
+        ray = Ray(origin, target - origin)
+        a, b = baked.intersect_full(ray), inst.intersect_full(ray)
+        assert b.obj is inst and abs(a.t - b.t) < 1e-9
+        na = baked.get_normal_at_intersection(None, a)
+        nb = inst.get_normal_at_intersection(None, b)
+        assert np.allclose([na.x, na.y, na.z], [nb.x, nb.y, nb.z])
+        assert baked.occluded(ray, a.t + 1e-6) and inst.occluded(ray, a.t + 1e-6)
+        assert not inst.occluded(ray, a.t - 1e-6)
+
+
+def test_repeated_geometry_shares_one_mesh():
+    specs = [{"type": "cube", "center": (i, 0, 0), "size": 0.5, "material": RED}
+             for i in range(200)]
+    _, objects, _ = build_scene(40, 30, specs, LIGHTS)
+    instances = objects[0].primitives
+    assert all(isinstance(obj, Instance) for obj in instances)
+    assert len({id(obj.mesh) for obj in instances}) == 1
+    # Pickling (as for worker processes) keeps one copy of the mesh
+    one = len(pickle.dumps(instances[:1]))
+    loaded = pickle.loads(pickle.dumps(instances))
+    assert len({id(obj.mesh) for obj in loaded}) == 1
+    assert len(pickle.dumps(instances)) < one + 200 * 600
+    # A single spec still bakes its position into a plain Mesh
+    assert not isinstance(build_object(specs[0]), Instance)
+
+
+def test_packet_engine_matches_scalar_for_instances():
+    camera, objects, lights = build_scene(40, 30, SPECS, LIGHTS)
+    scene = PacketScene(objects, lights)
+    rng = np.random.default_rng(2)
+    u, v = rng.uniform(-1, 1, 80), rng.uniform(-1, 1, 80)
+    origins, directions = camera.get_rays(u, v)
+    hits = scene.intersect(origins, directions)
+    assert (hits.inst >= 0).any()
+    colors = trace_packet(scene, origins, directions)
+    for i in range(80):
+        ref = np.array(trace_ray(camera.get_ray(u[i], v[i]), objects, lights), dtype=np.int64)
+        assert np.abs(colors[i].astype(np.int64) - ref).max() <= 2, (i, colors[i], ref)
+
+    old = config.AA_SAMPLES
+    config.AA_SAMPLES = 1
+    try:
+        scalar = render_image(32, 24, camera, objects, lights, engine="scalar").astype(np.int64)
+        fast = render_image(32, 24, camera, objects, lights, engine="packet").astype(np.int64)
+    finally:
+        config.AA_SAMPLES = old
+    assert np.abs(scalar - fast).max() <= 2
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
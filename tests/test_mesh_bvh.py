@@ -49,10 +49,10 @@ def test_normal_after_bvh_hit():
     from core.ray import Ray
     cube = OBJLoader.create_cube(MAT, Vector3D(0, 0, -3, 1), 2.0)
     ray = Ray(Vector3D(0, 0, 5, 1), Vector3D(0, 0, -1, 0))
-    t = cube.intersect(ray)
-    assert t is not None
-    hit = Vector3D(0, 0, 5 - t, 1)
-    n = cube.get_normal_at_intersection(hit)
+    record = cube.intersect_full(ray)
+    assert record is not None and record.obj is cube
+    hit = Vector3D(0, 0, 5 - record.t, 1)
+    n = cube.get_normal_at_intersection(hit, record)
     assert abs(n.x) < 1e-6 and abs(n.y) < 1e-6
     assert abs(abs(n.z) - 1.0) < 1e-6
 
@@ -68,13 +68,13 @@ def test_empty_mesh_returns_none():
 
 def test_single_triangle_mesh():
     from core.objects.mesh import Mesh
-    from core.bvh import BVHNode
+    from core.bvh import BVHNode, FlatBVH
     from core.ray import Ray
     mesh = Mesh(MAT, name="OneTri")
     mesh.add_triangle(Vector3D(-1, -1, -3, 1), Vector3D(1, -1, -3, 1),
                       Vector3D(0, 1, -3, 1))
     mesh.build_bvh()
-    assert not isinstance(mesh._bvh, BVHNode)
+    assert not isinstance(mesh._bvh, (BVHNode, FlatBVH))
     ray = Ray(Vector3D(0, 0, 5, 1), Vector3D(0, 0, -1, 0))
     t = mesh.intersect(ray)
     assert t is not None and abs(t - 8.0) < 1e-6
@@ -82,9 +82,38 @@ def test_single_triangle_mesh():
 
 def test_create_cube_builds_bvh():
     from utils.obj_loader import OBJLoader
-    from core.bvh import BVHNode
+    from core.bvh import FlatBVH
     cube = OBJLoader.create_cube(MAT, Vector3D(0, 0, -3, 1), 2.0)
-    assert isinstance(cube._bvh, BVHNode)
+    assert isinstance(cube._bvh, FlatBVH)
+
+
+def test_multi_triangle_leaves_match_single():
+    import numpy as np
+    from utils.obj_loader import OBJLoader
+    from core.ray import Ray
+    bunny = OBJLoader.load(os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj"),
+                           MAT, 20.0)
+    lo, hi = bunny.get_bounding_box()
+    rng = np.random.default_rng(7)
+    rays = []
+    for _ in range(150):
+        target = rng.uniform((lo.x, lo.y, lo.z), (hi.x, hi.y, hi.z))
+        origin = target + rng.normal(size=3) * 20
+        rays.append(Ray(Vector3D(*origin.tolist(), 1), Vector3D(*(target - origin).tolist(), 0)))
+    bunny.build_bvh(leaf_size=1)
+    single = [(bunny.intersect_full(ray), bunny.occluded(ray, 20.0)) for ray in rays]
+    for leaf_size in (4, 16):
+        bunny.build_bvh(leaf_size=leaf_size)
+        bvh = bunny._bvh
+        leaves = bvh.right < 0
+        assert bvh.prim_count[leaves].max() <= leaf_size
+        assert bvh.node_count() < len(bunny.faces)
+        for ray, (a, occ) in zip(rays, single):
+            b = bunny.intersect_full(ray)
+            assert bunny.occluded(ray, 20.0) == occ
+            assert (a is None) == (b is None)
+            if a is not None:
+                assert (a.prim_id, a.t, a.u, a.v) == (b.prim_id, b.t, b.u, b.v)
 
 
 def _run_all():
@@ -0,0 +1,83 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+import numpy as np
+import config
+from utils import mesh_cache
+from utils.obj_loader import OBJLoader
+from utils.vector import Vector3D
+from core.ray import Ray
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+
+
+def _with_cache(fn):
+    saved = config.MESH_CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        config.MESH_CACHE_DIR = tmp
+        try:
+            return fn(tmp)
+        finally:
+            config.MESH_CACHE_DIR = saved
+
+
+def test_cached_mesh_is_memory_mapped_and_identical():
+    def run(tmp):
+        parsed = OBJLoader.load(BUNNY, MAT, 10.0)
+        assert len(os.listdir(tmp)) == 1
+        cached = OBJLoader.load(BUNNY, dict(MAT, reflectivity=0.5), 10.0)
+        assert isinstance(cached.vertices, np.memmap) and not cached.vertices.flags.writeable
+        assert cached.content_hash() == parsed.content_hash()
+        assert cached.material["reflectivity"] == 0.5 and cached.name == "bunny.obj"
+        ray = Ray(Vector3D(0, 0.5, 5, 1), Vector3D(0, 0, -1, 0))
+        a, b = parsed.intersect_full(ray), cached.intersect_full(ray)
+        assert (a.t, a.prim_id) == (b.t, b.prim_id)
+        # other scale / position / BVH builder -> other entries
+        OBJLoader.load(BUNNY, MAT, 5.0)
+        OBJLoader.load(BUNNY, MAT, 10.0, Vector3D(1, 0, 0, 1))
+        saved = config.BVH_METHOD
+        config.BVH_METHOD = "sah"
+        try:
+            OBJLoader.load(BUNNY, MAT, 10.0)
+        finally:
+            config.BVH_METHOD = saved
+        assert len(os.listdir(tmp)) == 4
+    _with_cache(run)
+
+
+def test_changed_or_corrupt_source_is_reparsed():
+    def run(tmp):
+        src = os.path.join(tmp, "tri.obj")
+        with open(src, "w") as f:
+            f.write("v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\nf 1 2 3\nf 2 4 3\n")
+        assert OBJLoader.load(src, MAT).get_triangle_count() == 2
+        with open(src, "a") as f:
+            f.write("f 1 2 4\n")
+        key = mesh_cache.cache_key(src, 1.0, Vector3D(0, 0, 0, 1))
+        assert mesh_cache.load(key, MAT) is None
+        assert OBJLoader.load(src, MAT).get_triangle_count() == 3
+        assert mesh_cache.load(key, MAT).get_triangle_count() == 3
+        # a truncated entry is a miss, not an error
+        path = mesh_cache.cache_path(key)
+        with open(path, "r+b") as f:
+            f.truncate(20)
+        assert mesh_cache.load(key, MAT) is None
+        assert OBJLoader.load(src, MAT).get_triangle_count() == 3
+    _with_cache(run)
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
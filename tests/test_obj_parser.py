@@ -0,0 +1,139 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import gzip
+import io
+import tempfile
+import numpy as np
+from utils.obj_parser import load_obj, parse_obj
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+
+MIXED = b"""# every face layout, polygons and relative indices
+v 0 0 0
+v 1.5 0 0 1.0
+v 1 1 0
+v 0 1 0\r
+vn 0 0 1
+vn 0 0 2
+vt 0.5 0.5
+  f 1 2 3
+f 1/1 3/1 4/1
+f 1/1/1 2/1/2 3/1/1 4/1/2
+f 1//1 2//2 3//1
+f -4 -3 -2 -1
+v 2 2 2
+f -1//-2 1//-1 2//1
+f 1/1/1 2 3
+f 1 2
+f 4/1/1 3//2 2/1/2 1//1 3/1/
+"""
+
+
+def _reference(data):
+    """The line-by-line loop OBJLoader.load used to run, with relative
+    (negative) indices resolved against the records read so far."""
+    vertices, normals, tris, tri_normals, faces = [], [], [], [], 0
+    for line in data.decode().splitlines():
+        parts = line.strip().split()
+        if not parts or parts[0].startswith("#"):
+            continue
+        if parts[0] == "v":
+            vertices.append(tuple(float(p) for p in parts[1:4]))
+        elif parts[0] == "vn":
+            normals.append(tuple(float(p) for p in parts[1:4]))
+        elif parts[0] == "f":
+            fv, fn = [], []
+            for corner in parts[1:]:
+                idx = corner.split("/")
+                v = int(idx[0])
+                fv.append(v - 1 if v > 0 else len(vertices) + v)
+                if len(idx) >= 3 and idx[2]:
+                    n = int(idx[2])
+                    fn.append(n - 1 if n > 0 else len(normals) + n)
+            if len(fv) < 3:
+                continue
+            for i in range(1, len(fv) - 1):
+                tris.append((fv[0], fv[i], fv[i + 1]))
+                smooth = normals and len(fn) == len(fv)
+                tri_normals.append((fn[0], fn[i], fn[i + 1]) if smooth else (-1, -1, -1))
+            faces += 1
+    return (np.array(vertices).reshape(-1, 3), np.array(normals).reshape(-1, 3),
+            np.array(tris).reshape(-1, 3), np.array(tri_normals).reshape(-1, 3), faces)
+
+
+def _check(data, chunk_size=None, got=None):
+    got = got or parse_obj(io.BytesIO(data), chunk_size)
+    want = _reference(data)
+    for g, w in zip(got[:4], want[:4]):
+        assert g.shape == w.shape and np.array_equal(g, w)
+    assert got[2].dtype == np.int32 and got[3].dtype == np.int32
+    assert got[4] == want[4]
+    return got
+
+
+def test_bulk_parser_matches_reference_loop():
+    with open(BUNNY, "rb") as f:
+        data = f.read()
+    vertices, normals, tris, tri_normals, faces = _check(data)
+    assert (len(vertices), len(tris), faces) == (2503, 4968, 4968)
+    assert len(normals) == 0 and (tri_normals == -1).all()
+
+
+def test_face_layouts_polygons_and_relative_indices():
+    vertices, normals, tris, tri_normals, faces = _check(MIXED)
+    assert faces == 8 and len(tris) == 12
+    assert vertices[1].tolist() == [1.5, 0, 0]  # w dropped
+    # relative indices resolve against the records before the face
+    assert tris[5].tolist() == [0, 1, 2] and tris[7].tolist() == [4, 0, 1]
+    assert tri_normals[7].tolist() == [0, 1, 0]
+    # only faces with a normal at every corner are smooth
+    assert tri_normals[2:5].tolist() == [[0, 1, 0], [0, 0, 1], [0, 1, 0]]
+    assert (tri_normals[:2] == -1).all() and (tri_normals[8:] == -1).all()
+
+
+def test_trailing_comments_and_extra_tokens():
+    # Inline comments and vertex colors send _floats3 down its per-line path
+    data = (b"v 0 0 0 # origin\nv 1 0 0 0.9 0.1 0.1\nv 0 1 0\n"
+            b"vn 0 0 1 # up\nf 1//1 2//1 3//1\n")
+    vertices, normals, tris, tri_normals, faces = _check(data)
+    assert vertices.tolist() == [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    assert normals.tolist() == [[0, 0, 1]] and faces == 1
+    _check(b"v 0 0 0 # a\nv 1 0 0\nv 0 1 0\nf 1 2 3", 8)
+
+
+def test_chunks_split_mid_line():
+    with open(BUNNY, "rb") as f:
+        data = f.read()
+    for chunk_size in (7, 1000, 65536):
+        _check(MIXED, chunk_size)
+        _check(data, chunk_size * 10)
+    # no trailing newline, empty file
+    _check(b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3", 5)
+    assert parse_obj(io.BytesIO(b""))[4] == 0
+
+
+def test_parallel_byte_ranges_and_gzip():
+    with open(BUNNY, "rb") as f:
+        data = f.read() + b"\n" + MIXED  # relative indices in the last chunk
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.obj")
+        with open(path, "wb") as f:
+            f.write(data)
+        with gzip.open(path + ".gz", "wb") as f:
+            f.write(data)
+        for p in (path, path + ".gz"):
+            _check(data, got=load_obj(p, workers=2, chunk_size=4096))
+            _check(data, got=load_obj(p, workers=1, chunk_size=4096))
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,64 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from utils.vector import Vector3D
+from utils.obj_loader import OBJLoader
+from core.bvh import BVHNode, FlatBVH
+from core.objects.sphere import Sphere
+from core.objects.plane import Plane
+from core.objects.triangle import Triangle
+from core.ray import Ray
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def _scene_objects():
+    rng = np.random.default_rng(7)
+    objs = [Sphere(Vector3D(*p.tolist(), 1), 0.5, MAT) for p in rng.uniform(-4, 4, (20, 3))]
+    objs.append(OBJLoader.create_cube(MAT, Vector3D(1, 1, 1, 1), 1.5))
+    objs.append(OBJLoader.create_tetrahedron(MAT, Vector3D(-2, 0, 2, 1), 0.7))
+    return objs
+
+
+def _rays(n, seed=8):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        o = rng.uniform(-8, 8, 3)
+        d = rng.uniform(-3, 3, 3) - o
+        yield Ray(Vector3D(*o.tolist(), 1), Vector3D(*d.tolist(), 0)), float(rng.uniform(0.5, 15))
+
+
+def test_occluded_matches_closest_hit():
+    objs = _scene_objects()
+    structures = [BVHNode.build(objs), FlatBVH.build(objs), FlatBVH.build(objs, method="sah", leaf_size=4)]
+    for ray, t_max in _rays(300):
+        t = structures[0].intersect(ray)
+        expected = t is not None and t < t_max
+        for bvh in structures:
+            assert bvh.occluded(ray, t_max) == expected
+        for obj in objs:
+            t = obj.intersect(ray)
+            assert obj.occluded(ray, t_max) == (t is not None and t < t_max)
+
+
+def test_plane_occluded_respects_t_max():
+    plane = Plane(Vector3D(0, -1, 0, 1), Vector3D(0, 1, 0, 0), MAT)
+    ray = Ray(Vector3D(0, 1, 0, 1), Vector3D(0, -1, 0, 0))
+    assert plane.occluded(ray, 2.5)
+    assert not plane.occluded(ray, 2.0)
+    assert not plane.occluded(Ray(Vector3D(0, 1, 0, 1), Vector3D(0, 1, 0, 0)), 100)
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
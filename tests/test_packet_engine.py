@@ -0,0 +1,82 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import config
+from utils.vector import Vector3D
+from renderer.ui.scene_builder import build_scene, make_material
+from renderer.headless import render_image
+from renderer.packet import PacketScene, trace_packet
+from renderer.raytracer import trace_ray
+from core.ray import Ray
+
+GLASS = dict(make_material((0.9, 0.9, 0.9), 0.1), transparency=0.8, refractive_index=1.5)
+
+SPECS = [
+    {"type": "sphere", "position": (-1.2, 0.5, -1), "radius": 1.0,
+     "material": make_material((0.8, 0.2, 0.2), 0.3)},
+    {"type": "sphere", "position": (1.2, 0.5, -0.5), "radius": 0.8, "material": GLASS},
+    {"type": "cube", "center": (0.5, -0.3, 1.5), "size": 0.8,
+     "material": make_material((0.2, 0.8, 0.2), 0.0)},
+    {"type": "tetra", "center": (-1.5, 0.0, 1.5), "size": 0.4,
+     "material": make_material((0.2, 0.2, 0.8), 0.5)},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.2)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0},
+          {"position": (-4, 3, 4), "color": (1, 0.5, 0.5), "intensity": 0.6}]
+
+
+def test_get_rays_matches_get_ray():
+    camera, _, _ = build_scene(40, 30, [], LIGHTS)
+    u = np.array([-0.9, 0.0, 0.37])
+    v = np.array([0.5, -0.2, 0.99])
+    origins, directions = camera.get_rays(u, v)
+    for i in range(3):
+        ray = camera.get_ray(u[i], v[i])
+        assert np.allclose(directions[i], [ray.direction.x, ray.direction.y, ray.direction.z])
+        assert np.allclose(origins[i], [ray.origin.x, ray.origin.y, ray.origin.z])
+
+
+def test_trace_packet_matches_trace_ray():
+    camera, objects, lights = build_scene(40, 30, SPECS, LIGHTS)
+    scene = PacketScene(objects, lights)
+    rng = np.random.default_rng(1)
+    u, v = rng.uniform(-1, 1, 50), rng.uniform(-1, 1, 50)
+    origins, directions = camera.get_rays(u, v)
+    colors = trace_packet(scene, origins, directions)
+    for i in range(50):
+        ref = np.array(trace_ray(camera.get_ray(u[i], v[i]), objects, lights), dtype=np.int64)
+        assert np.abs(colors[i].astype(np.int64) - ref).max() <= 2, (i, colors[i], ref)
+
+
+def test_packet_image_matches_scalar_image():
+    old = config.AA_SAMPLES
+    config.AA_SAMPLES = 2
+    try:
+        camera, objects, lights = build_scene(32, 24, SPECS, LIGHTS)
+        scalar = render_image(32, 24, camera, objects, lights, engine="scalar").astype(np.int64)
+        fast = render_image(32, 24, camera, objects, lights, engine="packet").astype(np.int64)
+    finally:
+        config.AA_SAMPLES = old
+    diff = np.abs(scalar - fast)
+    assert diff.max() <= 2
+    assert diff.mean() < 0.1
+
+
+def test_packet_empty_scene_is_black():
+    camera, objects, lights = build_scene(8, 6, [], LIGHTS)
+    img = render_image(8, 6, camera, objects, lights, engine="packet")
+    assert img.shape == (6, 8, 3) and not img.any()
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,89 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import config
+from renderer.ui.scene_builder import build_scene, make_material
+from renderer.headless import render_image
+from renderer.progressive import ProgressiveFrame, pass_pixels, pass_steps
+from renderer.raytracer import init_worker, render_preview_task, render_refine_task
+from renderer.tiles import make_tiles
+
+SPECS = [
+    {"type": "sphere", "position": (-1.0, 0.5, -1), "radius": 1.0,
+     "material": make_material((0.8, 0.2, 0.2), 0.3)},
+    {"type": "cube", "center": (1.0, -0.3, 0.5), "size": 0.8,
+     "material": make_material((0.2, 0.8, 0.2), 0.0)},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.2)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+
+
+def test_passes_trace_each_pixel_once():
+    assert pass_steps(8) == [8, 4, 2, 1]
+    assert pass_steps(1) == [1]
+    coverage = np.zeros((23, 37), dtype=int)
+    steps = pass_steps(8)
+    for step in steps:
+        for tile in make_tiles(37, 23, 7, "spiral"):
+            ys, xs = pass_pixels(tile, step, steps[0])
+            coverage[ys, xs] += 1
+    assert (coverage == 1).all()
+
+
+def _progressive(width, height, camera, objects, lights, engine, check_preview=None):
+    # The RenderThread loop, run in-process on the worker task functions
+    init_worker(width, height, camera, objects, lights, engine)
+    frame = ProgressiveFrame(width, height)
+    tiles = make_tiles(width, height, 8)
+    steps = pass_steps(8)
+    for step in steps:
+        for tile in tiles:
+            _, _, colors, _ = render_preview_task((tile, step, steps[0]))
+            frame.add_preview(tile, step, steps[0], colors)
+        if check_preview:
+            check_preview(step, frame.image)
+    if frame.aa > 1:
+        for tile in tiles:
+            frame.add_refinement(*render_refine_task(tile)[:2])
+    return frame.image
+
+
+def test_progressive_matches_regular_render():
+    width, height = 40, 30
+    camera, objects, lights = build_scene(width, height, SPECS, LIGHTS)
+    saved = config.AA_SAMPLES
+    try:
+        for aa in (1, 2):
+            config.AA_SAMPLES = aa
+            for engine in ("scalar", "packet"):
+                expected = render_image(width, height, camera, objects, lights, engine=engine)
+                img = _progressive(width, height, camera, objects, lights, engine)
+                assert np.array_equal(img, expected), (aa, engine)
+    finally:
+        config.AA_SAMPLES = saved
+
+
+def test_coarse_preview_is_blocky():
+    width, height = 40, 30
+    camera, objects, lights = build_scene(width, height, SPECS, LIGHTS)
+
+    def check(step, image):
+        if step == 8:
+            # every pixel shows the sample of its 8x8 block's corner
+            assert np.array_equal(image, image[::8, ::8].repeat(8, 0).repeat(8, 1)[:height, :width])
+
+    _progressive(width, height, camera, objects, lights, "packet", check)
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,78 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import math
+import numpy as np
+import config
+from utils.vector import Vector3D
+from core.bvh import BVHNode, FlatBVH
+from core.camera import Camera
+from core.objects.sphere import Sphere
+from core.ray import Ray
+from renderer.raytracer import closest_hit
+
+MAT = {"ambient": (0.1, 0.1, 0.1), "diffuse": (0.7, 0.2, 0.2),
+       "specular": (1, 1, 1), "shininess": 32, "reflectivity": 0.0,
+       "transparency": 0.0, "refractive_index": 1.0}
+
+
+def _row(n):
+    """n unit spheres along -z, centers at z = -3, -6, ..."""
+    return [Sphere(Vector3D(0, 0, -3.0 * (i + 1), 1), 1.0, MAT) for i in range(n)]
+
+
+def test_ray_precomputes_inverse_and_sign():
+    ray = Ray(Vector3D(0, 0, 0, 1), Vector3D(0, -3, 4, 0))
+    assert np.allclose([ray.direction.y, ray.direction.z], [-0.6, 0.8])
+    assert ray.inv_dir[0] == 1e300 and ray.inv_dir[1] == 1.0 / ray.direction.y
+    assert ray.sign == (0, 1, 0)
+    assert ray.t_min == 0.0 and ray.t_max == math.inf
+    # normalize=False keeps the direction as given
+    raw = Ray(Vector3D(0, 0, 0, 1), Vector3D(0, 0, 2, 0), normalize=False)
+    assert raw.direction.z == 2 and raw.inv_dir[2] == 0.5
+    camera = Camera(Vector3D(0, 0, 5, 1), Vector3D(0, 0, 0, 1), Vector3D(0, 1, 0, 0), 60, 4 / 3)
+    d = camera.get_ray(0.3, -0.2).direction
+    assert abs(d.length() - 1.0) < 1e-12
+
+
+def test_traversal_respects_ray_interval():
+    spheres = _row(8)
+    for bvh in (BVHNode.build(spheres), FlatBVH.build(spheres), FlatBVH.build(spheres, leaf_size=3)):
+        ray = Ray(Vector3D(0, 0, 1, 1), Vector3D(0, 0, -1, 0))
+        assert abs(bvh.intersect(ray) - 3.0) < 1e-9
+        assert ray.t_max == math.inf  # narrowed during the query only
+        # Nodes left before t_min are skipped; nothing is accepted past t_max
+        far = Ray(Vector3D(0, 0, 1, 1), Vector3D(0, 0, -1, 0), t_min=11.5)
+        assert abs(bvh.intersect(far) - 12.0) < 1e-9
+        assert FlatBVH.build(spheres).intersect(Ray(Vector3D(0, 0, 1, 1), Vector3D(0, 0, -1, 0),
+                                                    t_max=2.5)) is None
+
+
+def test_closest_hit_narrows_across_objects():
+    near, far = _row(1), FlatBVH.build(_row(20)[1:])
+    ray = Ray(Vector3D(0, 0, 1, 1), Vector3D(0, 0, -1, 0))
+    config.trace_stats["aabb_tests"] = 0
+    hit = closest_hit(ray, near + [far])
+    assert hit.obj is near[0] and ray.t_max == math.inf
+    # The far BVH starts at t = 6 > 3: only its root box is tested
+    assert config.trace_stats["aabb_tests"] == 1
+    rng = np.random.default_rng(2)
+    spheres = [Sphere(Vector3D(*p.tolist(), 1), 0.4, MAT) for p in rng.uniform(-4, 4, (60, 3))]
+    split = [FlatBVH.build(spheres[:30]), FlatBVH.build(spheres[30:])]
+    for _ in range(100):
+        ray = Ray(Vector3D(*rng.uniform(-9, 9, 3).tolist(), 1),
+                  Vector3D(*rng.uniform(-1, 1, 3).tolist(), 0))
+        a, b = closest_hit(ray, spheres), closest_hit(ray, split)
+        assert (a is None) == (b is None) and (a is None or a.obj is b.obj)
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -0,0 +1,84 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import multiprocessing
+import numpy as np
+from renderer.framebuffer import SharedFramebuffer
+from renderer.raytracer import render_tile_task
+from renderer.headless import render_image
+from renderer.service import RenderService, _init_service_worker, _service_task, _worker_state
+from renderer.tiles import make_tiles
+from renderer.ui.scene_builder import build_scene, make_material
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+W, H = 32, 24
+
+
+def _specs(color=(0.8, 0.7, 0.6)):
+    return [
+        {"type": "obj", "path": BUNNY, "scale": 10.0, "position": (0, -1, 0),
+         "material": make_material(color, 0.2)},
+        {"type": "sphere", "position": (1.5, 0.0, 0), "radius": 0.5,
+         "material": make_material((0.2, 0.2, 0.8), 0.0)},
+    ]
+
+
+def _render(service, scene, framebuffer=None):
+    img = np.zeros((H, W, 3), dtype=np.uint8)
+    for (x0, y0, x1, y1), pixels, _ in service.render_tiles(make_tiles(W, H, 8), framebuffer):
+        if pixels is not None:
+            img[y0:y1, x0:x1] = pixels
+    return framebuffer.array.copy() if framebuffer is not None else img
+
+
+def test_service_reuses_resident_meshes():
+    camera, objects, lights = build_scene(W, H, _specs(), LIGHTS)
+    with RenderService(processes=1) as service:
+        assert service.set_scene(W, H, camera, objects, lights)
+        assert np.array_equal(_render(service, None), render_image(W, H, camera, objects, lights))
+        assert not service.set_scene(W, H, camera, objects, lights)  # nothing changed
+        assert service.stats == {"scene_uploads": 1, "mesh_uploads": 1}
+
+        # New camera and a recolored bunny: the scene is re-sent, the mesh is not
+        camera2, objects2, lights2 = build_scene(W, H, _specs((0.1, 0.9, 0.1)), LIGHTS,
+                                                 camera_pos=(1, 2, 6))
+        assert service.set_scene(W, H, camera2, objects2, lights2)
+        assert service.stats == {"scene_uploads": 2, "mesh_uploads": 1}
+        fb = SharedFramebuffer(W, H)
+        try:
+            img = _render(service, None, fb)
+        finally:
+            fb.release()
+        assert np.array_equal(img, render_image(W, H, camera2, objects2, lights2))
+        _, resident, mesh_loads = service._pool.apply(_worker_state)
+        assert len(resident) == 1 and mesh_loads == 1
+
+
+def test_stale_tiles_are_skipped():
+    # Tasks of a cancelled render (older generation) return without loading a scene
+    generation = multiprocessing.Value("i", 3, lock=False)
+    _init_service_worker(generation, "/nonexistent")
+    assert _service_task(("/nonexistent/scene.pkl", None, 2, render_tile_task, (0, 0, 4, 4))) == ((0, 0, 4, 4), None)
+
+
+def test_render_after_cancel():
+    camera, objects, lights = build_scene(W, H, _specs(), LIGHTS)
+    with RenderService(processes=1) as service:
+        service.set_scene(W, H, camera, objects, lights, engine="packet")
+        service.render_tiles(make_tiles(W, H, 4))
+        service.cancel()
+        assert np.array_equal(_render(service, None),
+                              render_image(W, H, camera, objects, lights, engine="packet"))
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
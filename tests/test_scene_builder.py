@@ -5,7 +5,7 @@ from renderer.ui.scene_builder import build_object, make_material, build_scene
 from core.objects.sphere import Sphere
 from core.objects.plane import Plane
 from core.objects.mesh import Mesh
-from core.bvh import BVHNode
+from core.bvh import FlatBVH
 
 
 def test_make_material_has_all_keys():
@@ -91,7 +91,7 @@ def test_build_scene_only_sphere():
     specs = [{"type": "sphere", "position": (0, 0, -3), "radius": 1.0,
               "material": make_material((1, 0, 0), 0.0)}]
     camera, objects, lights = build_scene(400, 300, specs, _LIGHTS)
-    # single finite object: BVHNode.build returns the bare object as leaf
+    # single finite object: FlatBVH.build returns the bare object as leaf
     assert len(objects) == 1
     assert isinstance(objects[0], Sphere)
 
@@ -106,9 +106,9 @@ def test_build_scene_mixed():
          "material": make_material((0.5, 0.5, 0.5), 0.0)},
     ]
     camera, objects, lights = build_scene(400, 300, specs, _LIGHTS)
-    # two finite objects -> a BVHNode; one plane -> separate
+    # two finite objects -> a FlatBVH; one plane -> separate
     assert len(objects) == 2
-    assert isinstance(objects[0], BVHNode)
+    assert isinstance(objects[0], FlatBVH)
     assert isinstance(objects[1], Plane)
 
 
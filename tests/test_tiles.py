@@ -0,0 +1,76 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import multiprocessing
+import numpy as np
+from renderer.ui.scene_builder import build_scene, make_material
+from renderer.headless import render_image
+from renderer.raytracer import init_worker
+from renderer.tiles import make_tiles, render_tiles
+
+SPECS = [
+    {"type": "sphere", "position": (-1.0, 0.5, -1), "radius": 1.0,
+     "material": make_material((0.8, 0.2, 0.2), 0.3)},
+    {"type": "cube", "center": (1.0, -0.3, 0.5), "size": 0.8,
+     "material": make_material((0.2, 0.8, 0.2), 0.0)},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.2)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0}]
+
+
+def test_tiles_cover_frame_once():
+    for order in ("rows", "spiral"):
+        for size in (1, 7, 16, 100):
+            coverage = np.zeros((23, 37), dtype=int)
+            for x0, y0, x1, y1 in make_tiles(37, 23, size, order):
+                assert x1 - x0 <= size and y1 - y0 <= size
+                coverage[y0:y1, x0:x1] += 1
+            assert (coverage == 1).all()
+
+
+def test_spiral_starts_at_center():
+    tiles = make_tiles(160, 96, 16, "spiral")
+    x0, y0, x1, y1 = tiles[0]
+    assert x0 <= 80 <= x1 and y0 <= 48 <= y1
+    # distance from the center never decreases by more than one ring
+    centers = [((a + c) / 2 - 80, (b + d) / 2 - 48) for a, b, c, d in tiles]
+    rings = [max(abs(cx), abs(cy)) // 16 for cx, cy in centers]
+    assert rings == sorted(rings)
+    assert make_tiles(160, 96, 16, "rows")[0] == (0, 0, 16, 16)
+
+
+def test_unknown_order_rejected():
+    try:
+        make_tiles(10, 10, 4, "random")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_pool_tiles_match_headless():
+    width, height = 40, 30
+    camera, objects, lights = build_scene(width, height, SPECS, LIGHTS)
+    for engine in ("scalar", "packet"):
+        expected = render_image(width, height, camera, objects, lights, engine=engine)
+        img = np.zeros_like(expected)
+        with multiprocessing.Pool(2, initializer=init_worker,
+                                  initargs=(width, height, camera, objects, lights, engine)) as pool:
+            for (x0, y0, x1, y1), pixels, counters in render_tiles(pool, make_tiles(width, height, 8)):
+                assert pixels.dtype == np.uint8 and pixels.shape == (y1 - y0, x1 - x0, 3)
+                assert counters["samples"] == (x1 - x0) * (y1 - y0)
+                img[y0:y1, x0:x1] = pixels
+        assert np.array_equal(img, expected)
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
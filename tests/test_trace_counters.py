@@ -0,0 +1,88 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from renderer.headless import render_image
+from renderer.raytracer import init_worker, render_tile_task
+from renderer.ui.scene_builder import build_scene, make_material
+
+BUNNY = os.path.join(os.path.dirname(__file__), "..", "models", "bunny.obj")
+GLASS = dict(make_material((0.9, 0.9, 0.9), 0.1), transparency=0.8, refractive_index=1.5)
+SPECS = [
+    {"type": "obj", "path": BUNNY, "scale": 10.0, "position": (0, -1, 0),
+     "material": make_material((0.8, 0.7, 0.6), 0.2)},
+    {"type": "sphere", "position": (1.5, 0, 0), "radius": 0.5, "material": GLASS},
+    {"type": "plane", "point": (0, -1, 0), "normal": (0, 1, 0),
+     "material": make_material((0.6, 0.6, 0.6), 0.3)},
+]
+LIGHTS = [{"position": (3, 5, 2), "color": (1, 1, 1), "intensity": 1.0},
+          {"position": (-3, 4, 4), "color": (1, 1, 1), "intensity": 0.5}]
+W, H = 32, 24
+
+
+def _counters(engine, workers=1):
+    camera, objects, lights = build_scene(W, H, SPECS, LIGHTS, (0, 2, 6), (0, 0.5, 0))
+    stats = {}
+    render_image(W, H, camera, objects, lights, engine, workers, tile_size=8, stats=stats)
+    assert stats.pop("tile_time") > 0  # wall time, not reproducible
+    return stats
+
+
+def test_engines_count_the_same_rays():
+    scalar, packet = _counters("scalar"), _counters("packet")
+    for key in config.RAY_COUNTERS:
+        assert scalar[key] == packet[key], key
+    assert scalar["primary_rays"] == W * H
+    assert scalar["reflection_rays"] > 0 and scalar["refraction_rays"] > 0
+    # one shadow ray per light at every hit that was shaded
+    assert scalar["shadow_rays"] % len(LIGHTS) == 0
+    for stats in (scalar, packet):
+        assert 0 < stats["bvh_nodes"] <= stats["aabb_tests"] and stats["primitive_tests"] > 0
+
+
+def test_depth_limit_stops_counting():
+    saved = config.MAX_DEPTH
+    try:
+        config.MAX_DEPTH = 1
+        stats = _counters("scalar")
+    finally:
+        config.MAX_DEPTH = saved
+    assert stats["reflection_rays"] == 0 and stats["refraction_rays"] == 0
+    assert stats["primary_rays"] == W * H
+
+
+def test_engines_count_the_same_rays_with_adaptive_aa():
+    saved = config.AA_SAMPLES, config.ADAPTIVE_AA, config.MAX_DEPTH
+    try:
+        config.AA_SAMPLES, config.ADAPTIVE_AA = 3, True
+        for depth in (saved[2], 0):
+            config.MAX_DEPTH = depth
+            scalar, packet = _counters("scalar"), _counters("packet")
+            for key in config.RAY_COUNTERS + ("samples",):
+                assert scalar[key] == packet[key], (depth, key)
+            # Without any bounces no ray is traced, not even the primary one
+            assert (scalar["primary_rays"] == 0) == (depth == 0)
+    finally:
+        config.AA_SAMPLES, config.ADAPTIVE_AA, config.MAX_DEPTH = saved
+
+
+def test_tiles_report_their_own_work():
+    camera, objects, lights = build_scene(W, H, SPECS, LIGHTS, (0, 2, 6), (0, 0.5, 0))
+    init_worker(W, H, camera, objects, lights, "scalar")
+    _, _, first = render_tile_task((0, 0, 8, 8))
+    _, _, again = render_tile_task((0, 0, 8, 8))
+    del first["tile_time"], again["tile_time"]
+    assert first == again and first["primary_rays"] == 64
+    assert _counters("scalar", workers=2) == _counters("scalar")
+
+
+def _run_all():
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for fn in fns:
+        fn()
+        print(f"PASS {fn.__name__}")
+    print(f"\n{len(fns)} tests passed")
+
+
+if __name__ == "__main__":
+    _run_all()
@@ -1,9 +1,21 @@
 from utils.vector import Vector3D
 from typing import Union
-from math import sin, cos
+from math import sin, cos, radians
+
+import numpy as np
+
+
+def _dot4(a: 'Vector3D', b: 'Vector3D') -> float:
+    """Dot product over all four components (Vector3D.dot ignores w)."""
+    return a.x * b.x + a.y * b.y + a.z * b.z + a.w * b.w
 
 
 class Matrix3D:
+    """4x4 homogeneous transform stored as four row vectors.
+
+    m @ v transforms a point (w = 1, translated) or a direction (w = 0).
+    """
+
     def __init__(self, row1: 'Vector3D', row2: 'Vector3D', row3: 'Vector3D', row4: 'Vector3D') -> None:
         self.columns = [row1, row2, row3, row4]
 
@@ -24,13 +36,13 @@ class Matrix3D:
 
     def __matmul__(self, other: Union['Vector3D', 'Matrix3D']) -> Union['Vector3D', 'Matrix3D']:
         if type(other) is Vector3D:
-            return Vector3D(self.columns[0].dot(other),
-                            self.columns[1].dot(other),
-                            self.columns[2].dot(other),
-                            self.columns[3].dot(other))
+            return Vector3D(_dot4(self.columns[0], other),
+                            _dot4(self.columns[1], other),
+                            _dot4(self.columns[2], other),
+                            _dot4(self.columns[3], other))
 
         other_m = other.transpose()
-        return Matrix3D(*[Vector3D(*[row.dot(other_m_row) for other_m_row in other_m]) for row in self.columns])
+        return Matrix3D(*[Vector3D(*[_dot4(row, other_m_row) for other_m_row in other_m]) for row in self.columns])
 
     def transpose(self) -> 'Matrix3D':
         return Matrix3D(
@@ -71,6 +83,39 @@ class Matrix3D:
                         Vector3D(0, 0, 1, 0),
                         Vector3D(0, 0, 0, 1))
 
+    @staticmethod
+    def translation(x, y, z):
+        return Matrix3D(Vector3D(1, 0, 0, x),
+                        Vector3D(0, 1, 0, y),
+                        Vector3D(0, 0, 1, z),
+                        Vector3D(0, 0, 0, 1))
+
+    @staticmethod
+    def scaling(x, y=None, z=None):
+        y = x if y is None else y
+        z = x if z is None else z
+        return Matrix3D(Vector3D(x, 0, 0, 0),
+                        Vector3D(0, y, 0, 0),
+                        Vector3D(0, 0, z, 0),
+                        Vector3D(0, 0, 0, 1))
+
+    @staticmethod
+    def rotation(x_degrees=0.0, y_degrees=0.0, z_degrees=0.0):
+        """Rotation about x, then y, then z (angles in degrees)."""
+        return (Matrix3D.rotation_z(radians(z_degrees)) @ Matrix3D.rotation_y(radians(y_degrees))
+                @ Matrix3D.rotation_x(radians(x_degrees)))
+
+    def to_array(self) -> np.ndarray:
+        """The matrix as a (4, 4) float64 array (rows)."""
+        return np.array([[r.x, r.y, r.z, r.w] for r in self.columns], dtype=np.float64)
+
+    @staticmethod
+    def from_array(a) -> 'Matrix3D':
+        return Matrix3D(*[Vector3D(*map(float, row)) for row in np.asarray(a, dtype=np.float64)])
+
+    def inverse(self) -> 'Matrix3D':
+        return Matrix3D.from_array(np.linalg.inv(self.to_array()))
+
     def __getitem__(self, index: int) -> 'Vector3D':
         return self.columns[index]
 
@@ -0,0 +1,101 @@
+"""On-disk cache of loaded OBJ meshes.
+
+Parsing an OBJ file and building its BVH takes far longer than reading the
+resulting arrays back. OBJLoader.load therefore stores every mesh it builds
+under config.MESH_CACHE_DIR, keyed by:
+
+- the SHA-1 of the OBJ file's bytes, so editing the file invalidates it
+- the scale and position baked into the vertices
+- the BVH builder settings (config.BVH_METHOD, BVH_BINS, MESH_LEAF_SIZE)
+
+Each entry is one <key>.mesh file: a magic line, the length of a JSON
+header, the header (name, dtype, shape and offset of every Mesh.arrays
+array) and then the raw arrays, each 64-byte aligned. Loading memory-maps
+the arrays read-only instead of copying them.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import config
+from core.objects.mesh import Mesh
+
+MAGIC = b"RTMESH1\n"
+ALIGN = 64
+
+
+def cache_key(filepath: str, scale: float, position) -> str:
+    """Hex key of an OBJ file loaded with this scale, position and BVH setup."""
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    settings = (MAGIC.decode().strip(), float(scale), float(position.x), float(position.y),
+                float(position.z), config.BVH_METHOD, config.BVH_BINS, config.MESH_LEAF_SIZE)
+    h.update(repr(settings).encode())
+    return h.hexdigest()
+
+
+def cache_path(key: str, cache_dir: str = None) -> str:
+    return os.path.join(cache_dir or config.MESH_CACHE_DIR, key + ".mesh")
+
+
+def store(key: str, mesh: Mesh, cache_dir: str = None) -> str:
+    """Write mesh's arrays (and BVH) as the entry for key; returns its path.
+
+    The file is written under a temporary name and renamed into place, so
+    concurrent loaders never see a partial entry.
+    """
+    path = cache_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {name: np.ascontiguousarray(a) for name, a in mesh.arrays().items()}
+    header, offset = {}, 0
+    for name, a in arrays.items():
+        header[name] = {"dtype": a.dtype.str, "shape": a.shape, "offset": offset}
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    text = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 8 + len(text)) // ALIGN) * ALIGN
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", start) + text)
+            for name, a in arrays.items():
+                f.seek(start + header[name]["offset"])
+                f.write(a.tobytes())
+            f.truncate(start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def load(key: str, material: dict, name: str = "Mesh", cache_dir: str = None):
+    """The cached mesh for key with the given material, or None on a miss.
+
+    Unreadable entries (truncated, older format) count as misses and are
+    overwritten by the next store.
+    """
+    path = cache_path(key, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            start, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(start - len(MAGIC) - 8).rstrip(b"\0"))
+        arrays = {}
+        for array_name, info in header.items():
+            shape = tuple(info["shape"])
+            if 0 in shape:
+                arrays[array_name] = np.zeros(shape, dtype=info["dtype"])
+            else:
+                arrays[array_name] = np.memmap(path, dtype=info["dtype"], mode="r",
+                                               offset=start + info["offset"], shape=shape)
+        return Mesh.from_arrays(material, arrays, name)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
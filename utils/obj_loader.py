@@ -1,112 +1,54 @@
 from typing import List, Tuple
+
+import numpy as np
+
+import config
+from utils import mesh_cache
+from utils.obj_parser import load_obj
 from utils.vector import Vector3D
-from core.objects.mesh import Mesh
+from core.objects.mesh import Mesh, _normalize_rows
 
 
 class OBJLoader:
     @staticmethod
     def load(filepath: str, material: dict, scale: float = 1.0, 
              position: Vector3D = None) -> Mesh:
-        vertices = []
-        normals = []
-        faces = []
-        
         if position is None:
             position = Vector3D(0, 0, 0, 1)
         
         print(f"Loading OBJ file: {filepath}")
         
         try:
-            with open(filepath, 'r') as file:
-                for line in file:
-                    line = line.strip()
-                    
-                    # Skip empty lines and comments
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    parts = line.split()
-                    if not parts:
-                        continue
-                    
-                    # Parse vertex positions
-                    if parts[0] == 'v':
-                        x = float(parts[1]) * scale + position.x
-                        y = float(parts[2]) * scale + position.y
-                        z = float(parts[3]) * scale + position.z
-                        vertices.append(Vector3D(x, y, z, 1))
-                    
-                    # Parse vertex normals
-                    elif parts[0] == 'vn':
-                        x = float(parts[1])
-                        y = float(parts[2])
-                        z = float(parts[3])
-                        normals.append(Vector3D(x, y, z, 0).normalize())
-                    
-                    # Parse faces
-                    elif parts[0] == 'f':
-                        face_vertices = []
-                        face_normals = []
-                        
-                        for i in range(1, len(parts)):
-                            # Face format can be: v, v/vt, v/vt/vn, or v//vn
-                            indices = parts[i].split('/')
-                            
-                            # Vertex index (OBJ uses 1-based indexing)
-                            v_idx = int(indices[0]) - 1
-                            face_vertices.append(v_idx)
-                            
-                            # Normal index (if present)
-                            if len(indices) >= 3 and indices[2]:
-                                n_idx = int(indices[2]) - 1
-                                face_normals.append(n_idx)
-                        
-                        # Store face
-                        if len(face_vertices) >= 3:
-                            # For now, we store vertex indices only
-                            # Normal indices are handled separately if available
-                            faces.append((face_vertices, face_normals if face_normals else None))
-            
-            print(f"Loaded: {len(vertices)} vertices, {len(normals)} normals, {len(faces)} faces")
+            # Reuse the parsed arrays and BVH of an unchanged file
+            key = None
+            if config.MESH_CACHE_DIR:
+                key = mesh_cache.cache_key(filepath, scale, position)
+                mesh = mesh_cache.load(key, material, filepath.split('/')[-1])
+                if mesh is not None:
+                    print(f"Loaded from mesh cache: {mesh.get_triangle_count()} triangles")
+                    return mesh
+
+            # Streamed in chunks (in parallel for large files); .obj.gz is decompressed
+            vertices, normals, tris, tri_normals, faces = load_obj(filepath)
+            vertices *= scale
+            vertices += np.array([position.x, position.y, position.z])
+            normals = _normalize_rows(normals)
             
-            # Create mesh
-            mesh = Mesh(material, name=filepath.split('/')[-1])
+            print(f"Loaded: {len(vertices)} vertices, {len(normals)} normals, {faces} faces")
             
-            # Build mesh from loaded data
-            for face_data in faces:
-                face_vertices, face_normals = face_data
-                
-                if len(face_vertices) == 3:
-                    v0 = vertices[face_vertices[0]]
-                    v1 = vertices[face_vertices[1]]
-                    v2 = vertices[face_vertices[2]]
-                    
-                    # Use vertex normals if available
-                    if face_normals and len(face_normals) == 3 and normals:
-                        n0 = normals[face_normals[0]]
-                        n1 = normals[face_normals[1]]
-                        n2 = normals[face_normals[2]]
-                        mesh.add_triangle(v0, v1, v2, n0, n1, n2)
-                    else:
-                        mesh.add_triangle(v0, v1, v2)
-                
-                # Triangulate faces with more than 3 vertices (fan triangulation)
-                elif len(face_vertices) > 3:
-                    v0 = vertices[face_vertices[0]]
-                    for i in range(1, len(face_vertices) - 1):
-                        v1 = vertices[face_vertices[i]]
-                        v2 = vertices[face_vertices[i + 1]]
-                        
-                        if face_normals and len(face_normals) > i + 1 and normals:
-                            n0 = normals[face_normals[0]]
-                            n1 = normals[face_normals[i]]
-                            n2 = normals[face_normals[i + 1]]
-                            mesh.add_triangle(v0, v1, v2, n0, n1, n2)
-                        else:
-                            mesh.add_triangle(v0, v1, v2)
+            # The parsed arrays become the mesh's own, without copies
+            mesh = Mesh.from_arrays(material, {"vertices": vertices, "faces": tris,
+                                               "normals": normals,
+                                               "face_normal_ids": tri_normals},
+                                    filepath.split('/')[-1])
             
             print(f"Mesh created with {mesh.get_triangle_count()} triangles")
             mesh.build_bvh()
+            if key is not None:
+                try:
+                    mesh_cache.store(key, mesh)
+                except OSError as e:
+                    print(f"Could not write mesh cache: {e}")
             return mesh
             
         except FileNotFoundError:
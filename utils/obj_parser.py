@@ -0,0 +1,326 @@
+"""Bulk OBJ parsing into NumPy arrays (used by OBJLoader.load).
+
+Instead of splitting every line in Python, the file is read in large
+chunks (cut at a line end) and each chunk is handled a record type at a
+time:
+
+- line kinds (`v`, `vn`, `f`, other) are told apart by NumPy from their
+  first bytes, and the lines of each kind are joined and converted to
+  numbers with a single np.fromstring call
+- face corners are split on whitespace in bulk and the corners per face
+  are counted with NumPy; when every corner has the same layout (`v`,
+  `v/vt`, `v/vt/vn` or `v//vn`) their indices are converted in one call
+  as well, and mixed layouts fall back to a per-corner loop
+- polygons are fan-triangulated with index arithmetic
+
+Faces never span chunks, so every chunk is triangulated on its own and
+only its compact arrays are kept: peak memory stays close to the final
+mesh arrays. Negative (relative) indices are resolved within the chunk
+and shifted by the records of earlier chunks when the chunks are joined,
+which also lets load_obj parse the byte ranges of a large file on a
+process pool. Files ending in .gz are decompressed while streaming.
+
+The output matches the line-by-line reference loop exactly: the same
+vertices, triangles (in file order) and per-triangle normal indices.
+"""
+import collections
+import gzip
+import multiprocessing
+import os
+import re
+import warnings
+
+import numpy as np
+
+import config
+
+# Bytes per chunk; each chunk is cut at a line end. Small chunks keep the
+# parsing scratch arrays small without costing throughput.
+CHUNK_SIZE = 1 << 20
+# Files at least this large (on disk) are parsed on a process pool
+PARALLEL_SIZE = 1 << 26
+
+# Line kinds
+OTHER, VERTEX, NORMAL, FACE = 0, 1, 2, 3
+
+_LEADING_SPACE = re.compile(rb"^[ \t]+", re.M)
+
+
+def load_obj(path, workers=None, chunk_size=None):
+    """Parse the OBJ file at path (gzip-compressed if it ends in .gz).
+
+    Files of PARALLEL_SIZE bytes or more are parsed on a pool of workers
+    processes (config.OBJ_LOAD_WORKERS, default: CPU count) when workers
+    is not given: each worker reads and parses byte ranges of a plain
+    file, or decompressed chunks of a gzip file. At most two chunks per
+    worker are in flight, so memory stays bounded. Returns what parse_obj
+    returns.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    compressed = path.endswith(".gz")
+    if workers is None:
+        workers = 1
+        if os.path.getsize(path) >= PARALLEL_SIZE:
+            workers = config.OBJ_LOAD_WORKERS or multiprocessing.cpu_count()
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        with (gzip.open if compressed else open)(path, "rb") as file:
+            return parse_obj(file, chunk_size)
+
+    with multiprocessing.Pool(workers) as pool:
+        if compressed:
+            with gzip.open(path, "rb") as file:
+                return _join(_ordered(pool, _parse_chunk, _chunks(file, chunk_size),
+                                      2 * workers))
+        tasks = ((path, start, end) for start, end in _ranges(path, chunk_size))
+        return _join(_ordered(pool, _parse_range, tasks, 2 * workers))
+
+
+def parse_obj(file, chunk_size=None):
+    """Parse an OBJ file opened in binary mode, one chunk at a time.
+
+    Returns (vertices, normals, tris, tri_normals, faces): (V, 3) float64
+    positions and (N, 3) float64 normals as written in the file, (T, 3)
+    int32 0-based vertex indices per triangle, (T, 3) int32 normal indices
+    (-1 for triangles whose face does not give a normal at every corner)
+    and the number of faces with at least three corners.
+    """
+    return _join(map(_parse_chunk, _chunks(file, chunk_size or CHUNK_SIZE)))
+
+
+def _chunks(file, chunk_size):
+    """Chunks of about chunk_size bytes read from file, each ending with a
+    line end."""
+    rest = b""
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            rest += data
+            continue
+        yield rest + data[:end]
+        rest = data[end:]
+    if rest:
+        yield rest + b"\n"
+
+
+def _ranges(path, chunk_size):
+    """(start, end) byte ranges of about chunk_size covering the file at
+    path, split after line ends."""
+    size = os.path.getsize(path)
+    ranges, start = [], 0
+    with open(path, "rb") as file:
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _parse_range(task):
+    """Pool task: parse bytes start:end of the file at path."""
+    path, start, end = task
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return _parse_chunk(data if data.endswith(b"\n") else data + b"\n")
+
+
+def _ordered(pool, func, tasks, window):
+    """pool results of func over tasks, in task order, with at most window
+    tasks submitted ahead of the consumer."""
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _parse_chunk(data):
+    """Records of one chunk (ending with a line end), triangulated.
+
+    Returns [vertices, normals, tris, tri_normals, faces, relative_v,
+    relative_n]: tris and tri_normals index the chunk's own records where
+    relative_v / relative_n (masks over them, or None) are set, and are
+    otherwise absolute. tri_normals are given wherever every corner of
+    the face names a normal.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    first = buf[starts]
+    if ((first == 32) | (first == 9)).any():
+        # Indented records: strip the indentation and start over
+        return _parse_chunk(_LEADING_SPACE.sub(b"", data))
+    peek = np.frombuffer(data + b"\0\0", dtype=np.uint8)
+    second, third = peek[starts + 1], peek[starts + 2]
+    kind = np.full(len(starts), OTHER, dtype=np.uint8)
+    blank = (second == 32) | (second == 9)
+    kind[(first == ord("v")) & blank] = VERTEX
+    kind[(first == ord("v")) & (second == ord("n")) & ((third == 32) | (third == 9))] = NORMAL
+    kind[(first == ord("f")) & blank] = FACE
+
+    # Blank out the keywords so each kind's lines join into one text of numbers
+    text = buf.copy()
+    text[starts[kind != OTHER]] = 32
+    text[starts[kind == NORMAL] + 1] = 32
+    lines = [np.flatnonzero(kind == k) for k in (VERTEX, NORMAL, FACE)]
+    of_kind = None
+    if any(len(l) and l[-1] - l[0] + 1 != len(l) for l in lines):
+        of_kind = np.repeat(kind, ends - starts + 1)
+    vertices, normals, faces = (_lines_of(text, starts, ends, l, of_kind, k)
+                                for k, l in zip((VERTEX, NORMAL, FACE), lines))
+    vertices = _floats3(vertices, len(lines[0]))
+    normals = _floats3(normals, len(lines[1]))
+    counts, corner_v, corner_n = _corners(faces)
+
+    has_n = corner_n != 0
+    relative_v = relative_n = None
+    if (corner_v < 0).any() or (corner_n < 0).any():
+        # Relative indices count back from the records before their face
+        relative_v, relative_n = corner_v < 0, corner_n < 0
+        face_lines = np.repeat(lines[2], counts)
+        corner_v = np.where(relative_v, corner_v + 1 + np.searchsorted(lines[0], face_lines),
+                            corner_v)
+        corner_n = np.where(relative_n, corner_n + 1 + np.searchsorted(lines[1], face_lines),
+                            corner_n)
+    return [vertices, normals, *_triangulate(counts, corner_v - 1, corner_n - 1, has_n,
+                                             relative_v, relative_n)]
+
+
+def _lines_of(text, starts, ends, lines, of_kind, kind):
+    """The bytes of the given lines of text, line ends included. Records of
+    one kind are usually contiguous, which needs no mask."""
+    if not len(lines):
+        return text[:0]
+    if of_kind is None:
+        return text[starts[lines[0]]:ends[lines[-1]] + 1]
+    return text[of_kind == kind]
+
+
+def _floats3(text, lines):
+    """(lines, 3) float64 array of the first three numbers of each line of
+    text (a uint8 array)."""
+    if not lines:
+        return np.zeros((0, 3))
+    values = _numbers(text.tobytes(), np.float64)
+    if values.size == 3 * lines:
+        return values.reshape(-1, 3)
+    # Extra components (w, vertex colors): take the first three per line
+    return np.array([line.split()[:3] for line in text.tobytes().splitlines()],
+                    dtype=np.float64).reshape(-1, 3)
+
+
+def _numbers(text, dtype):
+    """Whitespace-separated numbers of text. A token that is not a number
+    (an inline comment, say) gives a short array instead: NumPy 1.x stops
+    at it and 2.x raises, which maps to an empty array. Callers check the
+    count and fall back to per-line parsing."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=dtype, sep=" ")
+        except ValueError:
+            return np.zeros(0, dtype=dtype)
+
+
+def _corners(text):
+    """Corners of the face lines in text (a uint8 array, one face per line):
+    (corners per face, OBJ vertex indices, OBJ normal indices with 0 where a
+    corner has none)."""
+    space = text <= 32
+    corner_starts = np.flatnonzero(~space[1:] & space[:-1]) + 1
+    if len(text) and not space[0]:
+        corner_starts = np.concatenate(([0], corner_starts))
+    n = len(corner_starts)
+    counts = np.diff(np.searchsorted(corner_starts, np.flatnonzero(text == 10)), prepend=0)
+
+    # Slashes per corner decide the layout: v, v/vt, v/vt/vn or v//vn
+    slash_pos = np.flatnonzero(text == 47)
+    slashes = np.diff(np.searchsorted(slash_pos, corner_starts), append=len(slash_pos))
+    layout = int(slashes[0]) if n else 0
+    joined = text.tobytes()
+    if n and (slashes == layout).all():
+        numbers = joined.replace(b"//", b"/0/").replace(b"/", b" ") if layout else joined
+        fields = layout + 1
+        values = _numbers(numbers, np.int64)
+        if values.size == fields * n:
+            values = values.reshape(n, fields)
+            normal = values[:, 2] if fields == 3 else np.zeros(n, dtype=np.int64)
+            return counts, values[:, 0], normal
+    # Mixed layouts (or empty fields): per corner
+    corner_v = np.zeros(n, dtype=np.int64)
+    corner_n = np.zeros(n, dtype=np.int64)
+    for k, corner in enumerate(joined.split()):
+        parts = corner.split(b"/")
+        corner_v[k] = int(parts[0])
+        if len(parts) >= 3 and parts[2]:
+            corner_n[k] = int(parts[2])
+    return counts, corner_v, corner_n
+
+
+def _triangulate(counts, corner_v, corner_n, has_n, relative_v, relative_n):
+    """Fan-triangulate faces of counts corners: [tris, tri_normals, faces,
+    relative_v, relative_n] with the relative masks carried over to the
+    triangle corners. has_n marks the corners that name a normal."""
+    # Drop faces with fewer than three corners
+    keep = counts >= 3
+    if not keep.all():
+        corner_keep = np.repeat(keep, counts)
+        corner_v, corner_n, counts = corner_v[corner_keep], corner_n[corner_keep], counts[keep]
+        has_n = has_n[corner_keep]
+        if relative_v is not None:
+            relative_v, relative_n = relative_v[corner_keep], relative_n[corner_keep]
+
+    # Triangle i of a face with corners c0..ck-1 is (c0, c(i+1), c(i+2))
+    first = np.cumsum(counts) - counts
+    per_face = counts - 2
+    face = np.repeat(np.arange(len(counts)), per_face)
+    i = np.arange(len(face)) - np.repeat(np.cumsum(per_face) - per_face, per_face)
+    c0 = first[face]
+    c1 = c0 + i + 1
+    corners = np.stack((c0, c1, c1 + 1), axis=1)
+    tris = corner_v[corners].astype(np.int32)
+
+    # Smooth where every corner of the face names a normal
+    tri_normals = np.full(tris.shape, -1, dtype=np.int32)
+    smooth = np.zeros(len(tris), dtype=bool)
+    if len(counts) and has_n.any():
+        smooth = np.logical_and.reduceat(has_n, first)[face]
+        tri_normals[smooth] = corner_n[corners[smooth]]
+    if relative_v is not None:
+        relative_v = relative_v[corners]
+        relative_n = relative_n[corners] & smooth[:, None]
+    return [tris, tri_normals, len(counts), relative_v, relative_n]
+
+
+def _join(chunks):
+    """Join parsed chunks in file order into parse_obj's result, freeing
+    each chunk's arrays once they are copied."""
+    parts = []
+    v_base = n_base = 0
+    for chunk in chunks:
+        vertices, normals, tris, tri_normals, faces, relative_v, relative_n = chunk
+        if relative_v is not None:
+            tris[relative_v] += v_base
+            tri_normals[relative_n] += n_base
+        v_base += len(vertices)
+        n_base += len(normals)
+        parts.append(chunk[:5])
+
+    result = []
+    for k, empty in enumerate((np.zeros((0, 3)), np.zeros((0, 3)),
+                               np.zeros((0, 3), dtype=np.int32),
+                               np.zeros((0, 3), dtype=np.int32))):
+        result.append(np.concatenate([part[k] for part in parts]) if parts else empty)
+        for part in parts:
+            part[k] = None
+    if n_base == 0:
+        # Normal indices without any normals in the file: flat shading
+        result[3][:] = -1
+    return (*result, sum(part[4] for part in parts))